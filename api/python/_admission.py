@@ -0,0 +1,139 @@
+"""
+Admission control for the TindAi Python backend services.
+
+Each agent gets a token bucket per endpoint, so one agent looping on swipe
+or messages is throttled with 429 without touching anyone else's budget.
+A process-wide cap on in-flight admitted requests sheds load with 503
+before the Supabase connection pool saturates. Both answer with
+Retry-After.
+
+Limits are `rate/burst` (tokens per second / bucket size), set per endpoint
+with RATE_LIMIT_<ENDPOINT>, e.g. RATE_LIMIT_SWIPE=2/20. "off" disables one.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import _metrics
+from _shared import SUPABASE_POOL_SIZE, send_json
+
+DEFAULT_LIMITS = {
+    "swipe": "2/20",
+    "messages.read": "5/30",
+    "messages.send": "2/50",  # burst fits one full batch (messages.MAX_BATCH_SIZE)
+    "matching": "1/10",
+}
+MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", str(SUPABASE_POOL_SIZE * 2)))
+MAX_BUCKETS = 50_000
+
+REJECTED = _metrics.Counter(
+    "tindai_admission_rejected_total", "Requests turned away by admission control.",
+    ("endpoint", "reason"),
+)
+
+
+def _parse_limit(spec: str) -> Optional[Tuple[float, float]]:
+    if spec.strip().lower() in ("", "0", "off", "none"):
+        return None
+    rate, _, burst = spec.partition("/")
+    rate = float(rate)
+    return rate, float(burst) if burst else max(1.0, rate)
+
+
+def limit_for(endpoint: str) -> Optional[Tuple[float, float]]:
+    """(rate, burst) for `endpoint`, or None when it is unlimited."""
+    env_name = "RATE_LIMIT_" + endpoint.upper().replace(".", "_")
+    return _parse_limit(os.environ.get(env_name, DEFAULT_LIMITS.get(endpoint, "off")))
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by (endpoint, agent id); idle buckets are evicted oldest first."""
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._limits = {}
+        self._buckets: OrderedDict = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def _limit(self, endpoint: str):
+        if endpoint not in self._limits:
+            self._limits[endpoint] = limit_for(endpoint)
+        return self._limits[endpoint]
+
+    def take(self, endpoint: str, agent_id: str, cost: float = 1.0) -> float:
+        """
+        Spend `cost` tokens. Returns 0 if allowed, else seconds until it would
+        be, or math.inf when `cost` exceeds the bucket size and never will be.
+        """
+        limit = self._limit(endpoint)
+        if limit is None:
+            return 0.0
+        rate, burst = limit
+        if cost > burst:
+            return math.inf
+        now = time.monotonic()
+        key = (endpoint, agent_id)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / rate if rate > 0 else 60.0
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._limits.clear()
+
+
+limiter = TokenBucketLimiter()
+_in_flight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+
+
+def _reject(handler, status: int, message: str, retry_after: int):
+    # retry_after is repeated in the body because the gateway relays bodies, not headers.
+    send_json(
+        handler, {"success": False, "error": message, "retry_after": retry_after}, status,
+        {"Retry-After": str(retry_after)},
+    )
+
+
+def admit(handler, endpoint: str, agent_id: str, cost: float = 1.0, hold_slot: bool = True) -> bool:
+    """
+    Admit a request from `agent_id`, or answer it with 429/503 and return
+    False. An admitted request holds one of the MAX_IN_FLIGHT slots until it
+    finishes; pass hold_slot=False for requests that mostly wait (long-polls).
+    The slot is taken first, so a request shed with 503 spends no tokens.
+    """
+    if hold_slot and not _in_flight.acquire(blocking=False):
+        REJECTED.inc(endpoint, "overloaded")
+        _reject(handler, 503, "Service overloaded, retry shortly", 1)
+        return False
+    wait = limiter.take(endpoint, agent_id, cost)
+    if wait:
+        if hold_slot:
+            _in_flight.release()
+        if wait == math.inf:
+            REJECTED.inc(endpoint, "too_large")
+            send_json(handler, {
+                "success": False,
+                "error": f"Request exceeds the rate limit burst of {limiter._limit(endpoint)[1]:g}; split it up",
+            }, 413)
+            return False
+        REJECTED.inc(endpoint, "rate_limited")
+        _reject(handler, 429, "Too many requests", max(1, math.ceil(wait)))
+        return False
+    if hold_slot:
+        handler.on_finish(_in_flight.release)
+    return True
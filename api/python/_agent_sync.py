@@ -0,0 +1,145 @@
+"""
+In-memory indexes over the agents table, kept in step with it on a warm
+instance (the ANN index in _ann and the MinHash LSH index in _minhash).
+
+The first refresh builds the index on a background thread, and callers
+fall back to exact work until it is ready. After that it catches up with
+agents created or changed since its watermark (agents.updated_at, kept by
+migration 016) at most every `refresh_interval` seconds. Every
+`full_sync_interval` seconds a background sync also reads the ids of the
+whole table and drops agents that were deleted. Table reads happen outside
+the index lock, so lookups never wait for the network.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+CATCH_UP_OVERLAP = 30.0  # seconds before the watermark re-read on each catch-up
+BATCH_SIZE = 1000
+
+
+class AgentTableSync:
+    """
+    Base class of the indexes. Subclasses implement update(row), remove(id)
+    and indexed_ids(); `fields` are the agents columns update() needs, plus
+    updated_at.
+    """
+
+    name = "agent index"
+
+    def __init__(self, fields: str, refresh_interval: float, full_sync_interval: float):
+        self.fields = fields
+        self.refresh_interval = refresh_interval
+        self.full_sync_interval = full_sync_interval
+        self._watermark = None    # updated_at of the newest row caught up with
+        self._refresh_lock = threading.Lock()  # one catch-up or sync at a time
+        self._refreshed_at = 0.0
+        self._synced_at = 0.0
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        """Whether the first background sync has caught the index up with the table."""
+        return self._ready
+
+    def update(self, row: dict):
+        raise NotImplementedError
+
+    def remove(self, agent_id: str):
+        raise NotImplementedError
+
+    def indexed_ids(self) -> set:
+        raise NotImplementedError
+
+    def _before_sync(self):
+        """Called on the sync thread before each full sync (e.g. to load a saved index)."""
+
+    def _after_refresh(self):
+        """Called after each catch-up and full sync (e.g. to save the index)."""
+
+    def refresh(self, supabase, force: bool = False):
+        """
+        Catch up with changed agents, at most every refresh_interval seconds.
+        Never waits on another refresh. The first call, and the first one
+        after each full_sync_interval, starts a background sync instead and
+        returns straight away.
+        """
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        self._refreshed_at = now
+        if not self._ready or now - self._synced_at >= self.full_sync_interval:
+            name = self.name.replace(" ", "-") + "-sync"
+            threading.Thread(target=self._sync, args=(supabase,), name=name, daemon=True).start()
+            return
+        try:
+            self._catch_up(supabase)
+            self._after_refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _sync(self, supabase):
+        """Catch up, then drop agents no longer in the table (holds _refresh_lock)."""
+        try:
+            self._before_sync()
+            known = self.indexed_ids()
+            seen = self._catch_up(supabase)
+            self._ready = True
+            # Only ids indexed before the reads started: agents added meanwhile were never missing.
+            gone = known - (seen if seen is not None else self._read_ids(supabase))
+            for agent_id in gone:
+                self.remove(agent_id)
+            self._synced_at = time.monotonic()
+            self._after_refresh()
+        except Exception as e:
+            print(f"{self.name} sync error: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _catch_up(self, supabase) -> Optional[set]:
+        """
+        Index the agents changed since the watermark, reading batch by batch
+        outside the index lock. Without a watermark this reads the whole
+        table and returns every id seen; otherwise None.
+        """
+        # updated_at is stamped when a transaction starts, so a row can
+        # commit behind the watermark: re-read an overlap window (rows
+        # that did not change are skipped by update()).
+        since = None
+        if self._watermark:
+            since = (datetime.fromisoformat(self._watermark) - timedelta(seconds=CATCH_UP_OVERLAP)).isoformat()
+        seen = set() if since is None else None
+        position = None
+        while True:
+            query = supabase.table("agents").select(self.fields)
+            if since:
+                query = query.gte("updated_at", since)
+            if position:
+                updated_at, row_id = position
+                query = query.or_(f'updated_at.gt."{updated_at}",and(updated_at.eq."{updated_at}",id.gt.{row_id})')
+            rows = query.order("updated_at").order("id").limit(BATCH_SIZE).execute().data or []
+            for row in rows:
+                self.update(row)
+            if seen is not None:
+                seen.update(row["id"] for row in rows)
+            if rows:
+                position = (rows[-1]["updated_at"], rows[-1]["id"])
+                self._watermark = rows[-1]["updated_at"]
+            if len(rows) < BATCH_SIZE:
+                return seen
+
+    def _read_ids(self, supabase) -> set:
+        """Every agent id in the table, by keyset on id."""
+        ids, last = set(), None
+        while True:
+            query = supabase.table("agents").select("id")
+            if last:
+                query = query.gt("id", last)
+            rows = query.order("id").limit(BATCH_SIZE).execute().data or []
+            ids.update(row["id"] for row in rows)
+            if len(rows) < BATCH_SIZE:
+                return ids
+            last = rows[-1]["id"]
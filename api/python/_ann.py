@@ -0,0 +1,271 @@
+"""
+Approximate nearest-neighbour retrieval of suggestion candidates.
+
+Scoring every agent against every query stops scaling long before the
+agents table does. With mode=ann the matching service instead asks this
+index for a shortlist of likely-compatible agents and rescores only those
+with calculate_compatibility.
+
+Each agent is encoded as a sparse vector: one feature per interest, a
+one-hot mood, a log-scale karma bucket and its bio tokens hashed into
+BIO_FEATURES buckets. The query side is asymmetric: its mood features are
+weighted by how well each mood pairs with the querying agent's (the caller
+supplies that), and the neighbouring karma buckets get half weight.
+
+The index is random-projection LSH: TABLES hash tables, each keyed by the
+signs of BITS random projections of the vector. A lookup probes the
+query's bucket and every bucket one bit away in each table and ranks the
+agents found by how often (and how closely) they collide.
+
+The index is kept on the warm instance and saved to ANN_INDEX_PATH, so a
+cold start reloads it instead of re-encoding everyone. Loading (or building)
+runs on a background thread and the matching service ranks exactly until
+the index is ready; it then follows the agents table as described in
+_agent_sync, and agents.py updates it directly on profile writes.
+benchmarks/ann_recall.py reports recall@k against exhaustive ranking.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from _agent_sync import AgentTableSync
+from _minhash import bio_tokens
+
+TABLES = int(os.environ.get("ANN_TABLES", "20"))
+BITS = int(os.environ.get("ANN_BITS", "12"))
+BIO_FEATURES = 64
+KARMA_BUCKETS = 8
+INDEX_PATH = os.environ.get("ANN_INDEX_PATH", "/tmp/tindai-ann-index.json")
+MIN_AGENTS = int(os.environ.get("ANN_MIN_AGENTS", "2000"))
+REFRESH_INTERVAL = 5.0   # seconds between catch-up reads
+FULL_SYNC_INTERVAL = float(os.environ.get("ANN_FULL_SYNC_SECONDS", "600"))
+SAVE_INTERVAL = 60.0     # seconds between saves to disk
+FIELDS = "id, bio, interests, current_mood, karma, updated_at"
+_SEED = 0x41AA
+_FORMAT_VERSION = 1
+
+# Relative weights of the feature groups, after the compatibility weights.
+INTEREST_WEIGHT = 50.0
+MOOD_WEIGHT = 20.0
+KARMA_WEIGHT = 15.0
+BIO_WEIGHT = 15.0
+
+_projection_cache = {}
+
+
+def _projection(feature: str) -> List[float]:
+    """The TABLES * BITS random hyperplane components for one feature, seeded by its name."""
+    row = _projection_cache.get(feature)
+    if row is None:
+        rng = random.Random(zlib.crc32(feature.encode()) ^ _SEED)
+        row = _projection_cache.setdefault(feature, [rng.gauss(0.0, 1.0) for _ in range(TABLES * BITS)])
+    return row
+
+
+def karma_bucket(karma) -> int:
+    """0 for no karma, then one bucket per doubling."""
+    return min(KARMA_BUCKETS - 1, int(math.log2(karma)) + 1) if (karma or 0) > 0 else 0
+
+
+def _bio_features(bio: Optional[str]) -> Dict[str, float]:
+    tokens = bio_tokens(bio)
+    if not tokens:
+        return {}
+    features = defaultdict(float)
+    for token in tokens:
+        features[f"b{zlib.crc32(token.encode()) % BIO_FEATURES}"] += BIO_WEIGHT / math.sqrt(len(tokens))
+    return features
+
+
+def _interest_features(interests) -> Dict[str, float]:
+    interests = set(interests or [])
+    return {f"i:{name}": INTEREST_WEIGHT / math.sqrt(len(interests)) for name in interests}
+
+
+def encode(agent: dict) -> Dict[str, float]:
+    """The stored (document) vector of an agent."""
+    features = _interest_features(agent.get("interests"))
+    if agent.get("current_mood"):
+        features[f"m:{agent['current_mood']}"] = MOOD_WEIGHT
+    features[f"k{karma_bucket(agent.get('karma'))}"] = KARMA_WEIGHT
+    features.update(_bio_features(agent.get("bio")))
+    return features
+
+
+def encode_query(agent: dict, mood_points: Callable[[str], float], moods: Iterable[str]) -> Dict[str, float]:
+    """The query vector of an agent: moods weighted by mood_points(other mood), out of 20."""
+    features = _interest_features(agent.get("interests"))
+    for mood in moods:
+        # Every pairing earns at least 10 of the 20 points; only the excess ranks.
+        features[f"m:{mood}"] = MOOD_WEIGHT * max(0.0, mood_points(mood) - 10) / 10
+    bucket = karma_bucket(agent.get("karma"))
+    for neighbour, weight in ((bucket - 1, 0.5), (bucket, 1.0), (bucket + 1, 0.5)):
+        if 0 <= neighbour < KARMA_BUCKETS:
+            features[f"k{neighbour}"] = KARMA_WEIGHT * weight
+    features.update(_bio_features(agent.get("bio")))
+    return features
+
+
+def hash_codes(features: Dict[str, float]) -> List[int]:
+    """One BITS-bit code per table: the signs of the vector's random projections."""
+    totals = [0.0] * (TABLES * BITS)
+    for feature, weight in features.items():
+        totals = [t + weight * r for t, r in zip(totals, _projection(feature))]
+    codes = []
+    for table in range(TABLES):
+        code = 0
+        for bit, value in enumerate(totals[table * BITS:(table + 1) * BITS]):
+            if value > 0:
+                code |= 1 << bit
+        codes.append(code)
+    return codes
+
+
+def _fingerprint(agent: dict) -> int:
+    """Checksum of what the encoding depends on, to skip rows that have not changed."""
+    parts = sorted(agent.get("interests") or []) + [
+        agent.get("current_mood") or "", str(karma_bucket(agent.get("karma"))), agent.get("bio") or "",
+    ]
+    return zlib.crc32("\x1f".join(parts).encode())
+
+
+class AnnIndex(AgentTableSync):
+    name = "ANN index"
+
+    def __init__(self, path: Optional[str] = INDEX_PATH):
+        super().__init__(FIELDS, REFRESH_INTERVAL, FULL_SYNC_INTERVAL)
+        self.path = path
+        self._lock = threading.RLock()
+        self._tables = [defaultdict(set) for _ in range(TABLES)]
+        self._codes = {}          # agent id -> [code per table]
+        self._fingerprints = {}   # agent id -> _fingerprint of the encoded row
+        self._moods = set()
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    # ─── Building ─────────────────────────────────────────────────
+
+    def update(self, agent: dict):
+        """Add or re-encode one agent (no-op if nothing it is encoded from changed)."""
+        fingerprint = _fingerprint(agent)
+        if self._fingerprints.get(agent["id"]) == fingerprint:
+            return
+        codes = hash_codes(encode(agent))
+        with self._lock:
+            if self._fingerprints.get(agent["id"]) == fingerprint:
+                return
+            self._discard(agent["id"])
+            self._codes[agent["id"]] = codes
+            self._fingerprints[agent["id"]] = fingerprint
+            for table, code in zip(self._tables, codes):
+                table[code].add(agent["id"])
+            if agent.get("current_mood"):
+                self._moods.add(agent["current_mood"])
+            self._dirty = True
+
+    def remove(self, agent_id: str):
+        with self._lock:
+            self._discard(agent_id)
+            self._fingerprints.pop(agent_id, None)
+            self._dirty = True
+
+    def _discard(self, agent_id: str):
+        old = self._codes.pop(agent_id, None)
+        if old is not None:
+            for table, code in zip(self._tables, old):
+                table[code].discard(agent_id)
+
+    def indexed_ids(self) -> set:
+        with self._lock:
+            return set(self._codes)
+
+    def _before_sync(self):
+        if not self._loaded:
+            self._loaded = True
+            self.load()
+
+    def _after_refresh(self):
+        self._save_if_due()
+
+    def _save_if_due(self):
+        if self._dirty and time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    # ─── Querying ─────────────────────────────────────────────────
+
+    def shortlist(self, agent: dict, size: int, exclude: Iterable[str], mood_points: Callable[[str], float]) -> List[str]:
+        """
+        Up to `size` agent ids most likely to score well against `agent`,
+        best first: an exact bucket collision counts 2, a one-bit-away one 1.
+        """
+        exclude = set(exclude)
+        with self._lock:
+            codes = hash_codes(encode_query(agent, mood_points, sorted(self._moods)))
+            scores = defaultdict(int)
+            for table, code in zip(self._tables, codes):
+                for agent_id in table.get(code, ()):
+                    scores[agent_id] += 2
+                for bit in range(BITS):
+                    for agent_id in table.get(code ^ (1 << bit), ()):
+                        scores[agent_id] += 1
+        ranked = sorted((i for i in scores if i not in exclude), key=scores.__getitem__, reverse=True)
+        return ranked[:size]
+
+    # ─── Persistence ──────────────────────────────────────────────
+
+    def save(self):
+        """Write the codes and watermark to `path` (atomically, via a temp file)."""
+        if not self.path:
+            return
+        with self._lock:
+            state = {
+                "version": _FORMAT_VERSION, "tables": TABLES, "bits": BITS, "bio_features": BIO_FEATURES,
+                "watermark": self._watermark, "moods": sorted(self._moods),
+                "agents": {i: [self._codes[i], self._fingerprints[i]] for i in self._codes},
+            }
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"ANN index save error: {e}")
+
+    def load(self) -> bool:
+        """Restore a saved index built with the same parameters. Returns whether one was loaded."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"ANN index load error: {e}")
+            return False
+        if (state.get("version"), state.get("tables"), state.get("bits"), state.get("bio_features")) != (
+                _FORMAT_VERSION, TABLES, BITS, BIO_FEATURES):
+            return False
+        with self._lock:
+            for agent_id, (codes, fingerprint) in state["agents"].items():
+                self._codes[agent_id] = codes
+                self._fingerprints[agent_id] = fingerprint
+                for table, code in zip(self._tables, codes):
+                    table[code].add(agent_id)
+            self._moods.update(state.get("moods") or [])
+            self._watermark = state.get("watermark")
+        return True
+
+
+# Shared by every handler in the process (one per warm instance).
+ann_index = AnnIndex()
@@ -0,0 +1,121 @@
+"""
+Asyncio support for the TindAi Python backend services.
+
+The handlers stay synchronous; endpoints with independent queries can hand a
+coroutine to run(), which executes it on one background event loop per
+process. That loop owns an AsyncPostgrestClient on its own keep-alive pool
+(_pool.build_async_http_client, counted in pool_stats() with the sync one),
+so connections are reused across requests, and gather() fans queries out
+under a per-request concurrency limit.
+
+Handlers use their async variants when PYTHON_ASYNC_HANDLERS is set (see
+_shared.async_handlers_enabled).
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from typing import Any, Awaitable, Optional
+
+import _pool
+import _resilience
+import _tracing
+from _shared import (
+    SUPABASE_POOL_SIZE, SUPABASE_KEEPALIVE_SECONDS, SUPABASE_TIMEOUT_SECONDS,
+    SUPABASE_CONNECT_TIMEOUT_SECONDS, postgrest_settings,
+)
+
+FANOUT_LIMIT = int(os.environ.get("ASYNC_FANOUT_LIMIT", "8"))
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_client = None
+_trace = contextvars.ContextVar("trace", default=None)
+_fanout = contextvars.ContextVar("fanout", default=None)
+
+
+class _ResilientAsyncTransport:
+    """
+    Async counterpart of _resilience.ResilientTransport: the request deadline
+    and circuit breaker for every call (reads are not hedged).
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def handle_async_request(self, request):
+        import httpx
+        _resilience.before_call(request, SUPABASE_TIMEOUT_SECONDS)
+        try:
+            response = await self.inner.handle_async_request(request)
+        except httpx.TransportError as e:
+            replacement = _resilience.call_failed(e)
+            if replacement is e:
+                raise
+            raise replacement from e
+        _resilience.breaker.record(response.status_code < 500)
+        return response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def _record_call(request, response, elapsed: float):
+    _tracing.record_http(request, response, elapsed * 1000, trace=_trace.get())
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is not None:
+        return _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-db", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def get_async_supabase():
+    """The loop's AsyncPostgrestClient. Only call from coroutines passed to run()."""
+    global _client
+    if _client is None:
+        from postgrest import AsyncPostgrestClient
+        rest_url, headers = postgrest_settings()
+        http_client = _pool.build_async_http_client(
+            SUPABASE_POOL_SIZE, SUPABASE_KEEPALIVE_SECONDS, SUPABASE_TIMEOUT_SECONDS, SUPABASE_CONNECT_TIMEOUT_SECONDS,
+            wrap=_ResilientAsyncTransport, on_call=_record_call,
+        )
+        _client = AsyncPostgrestClient(rest_url, headers=headers, http_client=http_client)
+    return _client
+
+
+async def _scoped(coro: Awaitable, trace, deadline, limit: int):
+    _trace.set(trace)
+    _resilience.use_deadline(deadline)
+    _fanout.set(asyncio.Semaphore(limit))
+    return await coro
+
+
+def run(coro: Awaitable, limit: int = FANOUT_LIMIT) -> Any:
+    """
+    Run `coro` on the background loop and wait for its result. Queries it
+    makes are recorded into the calling request's trace and bounded by its
+    deadline, and gather() inside it keeps at most `limit` of them in flight.
+    """
+    scoped = _scoped(coro, _tracing.current(), _resilience.get_deadline(), limit)
+    future = asyncio.run_coroutine_threadsafe(scoped, _event_loop())
+    return future.result()
+
+
+async def _limited(aw: Awaitable):
+    semaphore = _fanout.get()
+    if semaphore is None:
+        return await aw
+    async with semaphore:
+        return await aw
+
+
+async def gather(*aws: Awaitable) -> list:
+    """asyncio.gather under the current request's concurrency limit."""
+    return await asyncio.gather(*(_limited(aw) for aw in aws))
@@ -0,0 +1,258 @@
+"""
+In-process cache primitives for the TindAi Python services and the Flask
+backend: TTL and stale-while-revalidate caches and single-flight reads,
+with their hit counts exported at /metrics. The backend ships a verbatim
+copy (backend/tests/test_shared_modules.py keeps them identical); the
+services' cache instances live in _service_cache.
+
+Entries only live as long as a warm instance, so anything cached here must
+either be safe to serve slightly stale or be re-validated by the caller.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import _metrics
+
+_caches = {}
+_flights = {}
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after being set.
+
+    `maxsize` bounds the number of entries or, given `weigh`, their total
+    weigh(value) as measured when each was set. `on_evict(value)` is called
+    (under the cache lock, so it must not block) for every value dropped:
+    expired, evicted, replaced, popped or cleared.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0,
+                 weigh: Optional[Callable[[Any], int]] = None, on_evict: Optional[Callable[[Any], None]] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._weigh = weigh
+        self._on_evict = on_evict
+        self._weight = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def _dropped(self, entry: tuple):
+        self._weight -= entry[2]
+        if self._on_evict is not None:
+            self._on_evict(entry[1])
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._dropped(self._data.pop(key))
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        """Store `value` (or re-weigh and renew it, if it is already the cached value)."""
+        weight = self._weigh(value) if self._weigh else 1
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._weight -= old[2]
+                if old[1] is not value and self._on_evict is not None:
+                    self._on_evict(old[1])
+            self._data[key] = (time.monotonic() + self.ttl, value, weight)
+            self._weight += weight
+            while self._data and self._weight > self.maxsize:
+                self._dropped(self._data.popitem(last=False)[1])
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self._dropped(entry)
+
+    def clear(self):
+        with self._lock:
+            while self._data:
+                self._dropped(self._data.popitem()[1])
+
+    def values(self) -> list:
+        """Unexpired values, least recently used first (does not count as a lookup)."""
+        now = time.monotonic()
+        with self._lock:
+            return [entry[1] for entry in self._data.values() if entry[0] > now]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Cache for values that are expensive to build and fine to serve a little
+    stale. Entries are fresh for `fresh_for` seconds, then served stale for up
+    to `stale_for` more while one background thread rebuilds them.
+    invalidate() marks every entry (or the ones matching a predicate) stale so
+    the next read of each triggers a rebuild.
+    """
+
+    def __init__(self, name: str, fresh_for: float, stale_for: float, maxsize: int = 128):
+        self.name = name
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.maxsize = maxsize
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._refreshing: set = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                built_at, generation, value = entry
+                age = now - built_at
+                if age < self.fresh_for and generation == self._generation:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if age < self.fresh_for + self.stale_for:
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(target=self._refresh, args=(key, build), daemon=True).start()
+                    return value
+            self.misses += 1
+        return self._store(key, build)
+
+    def invalidate(self, where: Optional[Callable[[Any], bool]] = None):
+        """Mark every entry stale, or only those whose value satisfies `where`."""
+        with self._lock:
+            if where is None:
+                self._generation += 1
+                return
+            for key, (built_at, generation, value) in self._data.items():
+                if where(value):
+                    self._data[key] = (built_at, -1, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _store(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        with self._lock:
+            generation = self._generation
+        value = build()
+        with self._lock:
+            self._data[key] = (time.monotonic(), generation, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+    def _refresh(self, key: Hashable, build: Callable[[], Any]):
+        try:
+            self._store(key, build)
+        except Exception as e:
+            print(f"Cache refresh error for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical reads: while one thread computes the value
+    for a key, others asking for the same key wait for it and share the
+    result (or the exception) instead of repeating the queries. Nothing is
+    kept once the computation finishes.
+    """
+
+    class _Call:
+        __slots__ = ("done", "result", "error")
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self, name: str):
+        self.name = name
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+        _flights[name] = self
+
+    def do(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = compute()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def fingerprint(endpoint: str, **params) -> tuple:
+    """Normalized single-flight key: the endpoint plus its params in a fixed order."""
+    return (endpoint,) + tuple(sorted(params.items()))
+
+
+def _render_cache_metrics():
+    yield "# HELP tindai_cache_requests_total Cache lookups by cache and result."
+    yield "# TYPE tindai_cache_requests_total counter"
+    for name, cache in sorted(_caches.items()):
+        results = {"hit": cache.hits, "miss": cache.misses}
+        if hasattr(cache, "stale_hits"):
+            results["stale"] = cache.stale_hits
+        for result, count in results.items():
+            yield f'tindai_cache_requests_total{{cache="{name}",result="{result}"}} {count}'
+    yield "# HELP tindai_cache_hit_ratio Share of lookups served from the cache."
+    yield "# TYPE tindai_cache_hit_ratio gauge"
+    for name, cache in sorted(_caches.items()):
+        served = cache.hits + getattr(cache, "stale_hits", 0)
+        total = served + cache.misses
+        yield f'tindai_cache_hit_ratio{{cache="{name}"}} {served / total if total else 0:g}'
+
+
+def _render_flight_metrics():
+    yield "# HELP tindai_singleflight_requests_total Reads that ran the query (leader) or shared one in flight (coalesced)."
+    yield "# TYPE tindai_singleflight_requests_total counter"
+    for name, flight in sorted(_flights.items()):
+        yield f'tindai_singleflight_requests_total{{flight="{name}",result="leader"}} {flight.leaders}'
+        yield f'tindai_singleflight_requests_total{{flight="{name}",result="coalesced"}} {flight.coalesced}'
+
+
+_metrics.register_collector(_render_cache_metrics)
+_metrics.register_collector(_render_flight_metrics)
@@ -0,0 +1,173 @@
+"""
+MinHash sketches of agent bios, for approximate bio similarity.
+
+The bio term of calculate_compatibility counts shared bio tokens, which
+needs both bios tokenized for every pair scored. Instead, each bio is
+tokenized once when it is written (agents.py POST/PATCH) and stored as a
+NUM_PERM-value MinHash signature plus its token count. Two signatures
+estimate the Jaccard similarity of the token sets, and from that and the
+two counts, the number of shared tokens.
+
+The LSH index splits each signature into BANDS bands of ROWS values and
+buckets agents by band, so a lookup only reaches agents whose bios are
+likely to overlap (at least one whole band agrees), and estimates their
+similarity from the full signatures. It follows the agents table in the
+background (_agent_sync), so requests neither read signatures nor re-check
+every candidate. Pairs below about J = 0.1 are mostly missed and score no
+bio points; the matching service rescores its top ranks exactly to make up
+for it. benchmarks/minhash_bio.py measures the error against the exact
+scorer.
+"""
+import os
+import random
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from _agent_sync import AgentTableSync
+
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+REFRESH_INTERVAL = 5.0   # seconds between catch-up reads
+FULL_SYNC_INTERVAL = float(os.environ.get("MINHASH_FULL_SYNC_SECONDS", "600"))
+_PRIME = (1 << 31) - 1  # values stay within a Postgres INTEGER
+_SEED = 0x7164A1
+
+STOP_WORDS = {"the", "a", "an", "is", "are", "i", "and", "or", "to", "for", "of", "in", "on"}
+SIGNATURE_FIELDS = ("bio_signature", "bio_token_count")
+# Rows written before migration 015 have no signature and are sketched from their bio.
+FIELDS = "id, bio, " + ", ".join(SIGNATURE_FIELDS) + ", updated_at"
+
+_rng = random.Random(_SEED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def bio_tokens(bio: Optional[str]) -> Set[str]:
+    """The token set the bio term compares: lowercase words longer than two letters, minus stop words."""
+    return {w for w in (bio or "").lower().split() if w not in STOP_WORDS and len(w) > 2}
+
+
+def signature(tokens: Iterable[str]) -> Optional[List[int]]:
+    """MinHash signature of a token set, or None for an empty one."""
+    hashed = [zlib.crc32(t.encode()) for t in tokens]
+    if not hashed:
+        return None
+    return [min((a * x + b) % _PRIME for x in hashed) for a, b in _PERMUTATIONS]
+
+
+def bio_fields(bio: Optional[str]) -> dict:
+    """Columns to write next to a bio: its signature and token count."""
+    tokens = bio_tokens(bio)
+    return {"bio_signature": signature(tokens), "bio_token_count": len(tokens)}
+
+
+def agreements(sig1: List[int], sig2: List[int]) -> int:
+    """MinHash positions on which two signatures agree."""
+    return sum(1 for x, y in zip(sig1, sig2) if x == y)
+
+
+def estimate_jaccard(sig1: List[int], sig2: List[int]) -> float:
+    return agreements(sig1, sig2) / NUM_PERM
+
+
+def estimate_shared(agreeing: int, count1: int, count2: int) -> int:
+    """Shared tokens estimated from agreeing MinHashes: |A ∩ B| = J (|A| + |B|) / (1 + J)."""
+    j = agreeing / NUM_PERM
+    return round(j * (count1 + count2) / (1 + j))
+
+
+def bio_points(shared: int) -> int:
+    """The bio term of calculate_compatibility for a number of shared tokens."""
+    return min(shared * 3, 15)
+
+
+def _bands(sig: List[int]):
+    """Bucket keys of a signature: (band, the band's ROWS values)."""
+    return [(band, tuple(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def entry(agent: dict) -> Tuple[Optional[List[int]], int]:
+    """(signature, token count) for an agent row, from its columns or computed from its bio."""
+    sig = agent.get("bio_signature")
+    if sig is not None:
+        return sig, agent.get("bio_token_count") or 0
+    fields = bio_fields(agent.get("bio"))
+    return fields["bio_signature"], fields["bio_token_count"]
+
+
+class LSHIndex(AgentTableSync):
+    """Agent ids bucketed by signature band, with each agent's signature and token count."""
+
+    name = "MinHash index"
+
+    def __init__(self):
+        super().__init__(FIELDS, REFRESH_INTERVAL, FULL_SYNC_INTERVAL)
+        self._buckets = defaultdict(set)
+        self._entries = {}  # agent id -> (signature, token count)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, agent: dict):
+        """Add or re-bucket one agent (no-op if its signature is unchanged)."""
+        sig, count = entry(agent)
+        with self._lock:
+            old = self._entries.get(agent["id"])
+            if old == (sig, count):
+                return
+            self._discard(agent["id"])
+            if sig is not None:
+                self._entries[agent["id"]] = (sig, count)
+                for key in _bands(sig):
+                    self._buckets[key].add(agent["id"])
+
+    def remove(self, agent_id: str):
+        with self._lock:
+            self._discard(agent_id)
+
+    def _discard(self, agent_id: str):
+        old = self._entries.pop(agent_id, None)
+        if old is not None:
+            for key in _bands(old[0]):
+                bucket = self._buckets[key]
+                bucket.discard(agent_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def indexed_ids(self) -> set:
+        with self._lock:
+            return set(self._entries)
+
+    def neighbours(self, sig: List[int], among: Set[str]) -> Dict[str, Tuple[List[int], int]]:
+        """{agent id: (signature, token count)} for the agents in `among` sharing a band with `sig`."""
+        found = set()
+        with self._lock:
+            for key in _bands(sig):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    found |= bucket & among
+            return {agent_id: self._entries[agent_id] for agent_id in found}
+
+    def approximate_bio_points(self, agent: dict, candidates: List[dict]) -> Dict[str, int]:
+        """
+        Approximate bio term against each candidate, from the MinHash
+        estimate. Returns {candidate id: points}; absent ids score 0.
+        """
+        sig, count = entry(agent)
+        if sig is None:
+            return {}
+        among = {c["id"] for c in candidates}
+        among.discard(agent["id"])
+        points = {}
+        for other_id, (other_sig, other_count) in self.neighbours(sig, among).items():
+            shared = estimate_shared(agreements(sig, other_sig), count, other_count)
+            if shared:
+                points[other_id] = bio_points(shared)
+        return points
+
+
+# Shared by every handler in the process (one per warm instance).
+bio_index = LSHIndex()
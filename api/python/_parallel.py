@@ -0,0 +1,143 @@
+"""
+Multi-core ranking of large candidate sets for the matching service.
+
+Scoring is pure Python, so one request ranks on one core however many the
+host has. Above PARALLEL_MIN_CANDIDATES candidates, rank_suggestions hands
+the work to a persistent pool of worker processes instead:
+
+- the candidates are pickled once per request, partition by partition, into
+  a single shared memory block, so workers read their slice without a copy
+  through the pool's pipes;
+- each worker scores its partition with calculate_compatibility and sends
+  back only its local top k, keyed by (score, position in the list);
+- the parent merges the partial lists, which gives exactly the order of a
+  sequential stable sort.
+
+Workers are spawned (not forked, the services run threads) on first use
+and kept. Where the platform has no shared memory or cannot start
+processes (AWS Lambda has no /dev/shm), the first failure is logged and
+ranking stays sequential for the life of the process.
+benchmarks/parallel_scoring.py measures scaling across cores.
+"""
+import heapq
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import shared_memory
+from typing import Iterable, List, Optional, Tuple
+
+WORKERS = int(os.environ.get("PARALLEL_WORKERS") or os.cpu_count() or 1)
+MIN_CANDIDATES = int(os.environ.get("PARALLEL_MIN_CANDIDATES", "20000"))
+PARTITIONS_PER_WORKER = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+_disabled = WORKERS < 2 or MIN_CANDIDATES <= 0
+
+
+def enabled_for(candidates: int) -> bool:
+    """Whether a ranking over `candidates` rows should run on the pool."""
+    return not _disabled and candidates >= MIN_CANDIDATES
+
+
+def _init_worker():
+    # Workers import the matching module for the scorer; keep them from
+    # opening Supabase connections they will never use.
+    os.environ["SUPABASE_WARMUP"] = "false"
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+            )
+        return _pool
+
+
+def warm():
+    """Start every worker and import the scorer in each, ahead of the first ranking."""
+    if not _disabled:
+        list(_get_pool().map(_warm_worker, range(WORKERS)))
+
+
+def _warm_worker(_):
+    import matching  # noqa: F401
+    return os.getpid()
+
+
+def _score_partition(name: str, start: int, length: int, first_index: int, agent: dict,
+                     exclude: frozenset, k: int) -> Tuple[int, List[tuple]]:
+    """(candidates scored, local top k as (-score, index, row)) for one partition."""
+    from matching import calculate_compatibility
+    # Spawned workers share the parent's resource tracker, so attaching does
+    # not hand the block to a tracker that would unlink it on worker exit.
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        rows = pickle.loads(shm.buf[start:start + length])
+    finally:
+        shm.close()
+    scored = []
+    for index, (candidate, bio_score) in enumerate(rows, first_index):
+        if candidate["id"] in exclude:
+            continue
+        scored.append((-calculate_compatibility(agent, candidate, bio_score), index, candidate))
+    return len(scored), heapq.nsmallest(k, scored, key=lambda s: (s[0], s[1]))
+
+
+def rank(agent: dict, candidates: list, exclude: Iterable[str], k: int,
+         bio_scores: Optional[dict] = None) -> Optional[Tuple[List[tuple], int]]:
+    """
+    The k best candidates as (score, row) plus how many were scored, or None
+    if the pool is unavailable (the caller then ranks sequentially).
+    bio_scores maps candidate ids to a precomputed bio term (approximate
+    bio mode); absent ids score 0.
+    """
+    global _disabled
+    if _disabled:
+        return None
+    exclude = frozenset(exclude)
+    partitions = WORKERS * PARTITIONS_PER_WORKER
+    size = -(-len(candidates) // partitions)
+    blobs = []
+    for first in range(0, len(candidates), size):
+        part = candidates[first:first + size]
+        if bio_scores is None:
+            rows = [(c, None) for c in part]
+        else:
+            rows = [(c, bio_scores.get(c["id"], 0)) for c in part]
+        blobs.append((first, pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(len(b) for _, b in blobs)))
+    except OSError as e:
+        print(f"Parallel ranking disabled, no shared memory: {e}")
+        _disabled = True
+        return None
+    try:
+        tasks, offset = [], 0
+        for first, blob in blobs:
+            shm.buf[offset:offset + len(blob)] = blob
+            tasks.append((offset, len(blob), first))
+            offset += len(blob)
+        try:
+            pool = _get_pool()
+            futures = [pool.submit(_score_partition, shm.name, o, n, first, agent, exclude, k)
+                       for o, n, first in tasks]
+            results = [f.result() for f in futures]
+        except (OSError, RuntimeError) as e:
+            # BrokenProcessPool is a RuntimeError; OSError covers platforms that cannot spawn.
+            print(f"Parallel ranking disabled: {e}")
+            _disabled = True
+            return None
+    finally:
+        shm.close()
+        shm.unlink()
+
+    total = sum(count for count, _ in results)
+    merged = heapq.merge(*(top for _, top in results), key=lambda s: (s[0], s[1]))
+    return [(-neg_score, row) for neg_score, _, row in islice(merged, k)], total
@@ -0,0 +1,178 @@
+"""
+Pooled HTTP client for Supabase, used by the Python services and the Flask
+backend. The backend deploys on its own and ships a verbatim copy of this
+module and of _metrics and _tracing (backend/tests/test_shared_modules.py
+keeps them identical).
+
+One keep-alive connection pool per process (HTTP/2 when h2 is installed),
+wrapped in a transport that keeps the request counters behind pool_stats(),
+records the Supabase call metrics (_metrics) and reports each call, with
+its duration, to an optional callback. The async client (_async) gets its
+own pool through the same bookkeeping, so pool_stats() covers both. Pool
+size and timeouts come from the caller's configuration (SUPABASE_POOL_SIZE
+and friends). Imports httpx, so the services only import it when they build
+their client.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+import httpx
+
+import _metrics
+from _tracing import describe
+
+_transport = None
+_async_transport = None
+_pool_size = 0
+_counters = {"requests": 0, "in_flight": 0, "errors": 0}
+_counters_lock = threading.Lock()
+
+# (request, response or None, seconds) for every call through the pool.
+OnCall = Callable[[httpx.Request, Optional[httpx.Response], float], None]
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _TrackedCall:
+    """
+    Bookkeeping for one call through either transport: the request counters,
+    the Supabase call metrics and the `on_call` report.
+    """
+
+    def __init__(self, request: httpx.Request, on_call: Optional[OnCall]):
+        self.request = request
+        self.on_call = on_call
+        self.response = None
+
+    def __enter__(self):
+        with _counters_lock:
+            _counters["requests"] += 1
+            _counters["in_flight"] += 1
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        failed = exc_type is not None or self.response.status_code >= 500
+        with _counters_lock:
+            _counters["in_flight"] -= 1
+            _counters["errors"] += failed
+        elapsed = time.perf_counter() - self.started
+        table, operation = describe(self.request)
+        _metrics.SUPABASE_CALLS.inc(table, operation)
+        _metrics.SUPABASE_LATENCY.observe(elapsed, table)
+        if self.on_call is not None:
+            self.on_call(self.request, self.response, elapsed)
+        return False
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """Wraps the pooled transport to keep request counters and metrics and report each call to `on_call`."""
+
+    def __init__(self, inner: httpx.BaseTransport, on_call: Optional[OnCall] = None):
+        self.inner = inner
+        self.on_call = on_call
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with _TrackedCall(request, self.on_call) as call:
+            call.response = self.inner.handle_request(request)
+        return call.response
+
+    def close(self):
+        self.inner.close()
+
+
+class InstrumentedAsyncTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of InstrumentedTransport, sharing its counters and metrics."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, on_call: Optional[OnCall] = None):
+        self.inner = inner
+        self.on_call = on_call
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with _TrackedCall(request, self.on_call) as call:
+            call.response = await self.inner.handle_async_request(request)
+        return call.response
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def _limits(pool_size: int, keepalive_seconds: float) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=keepalive_seconds,
+    )
+
+
+def build_http_client(pool_size: int, keepalive_seconds: float, timeout_seconds: float,
+                      connect_timeout_seconds: float,
+                      wrap: Optional[Callable[[httpx.BaseTransport], httpx.BaseTransport]] = None,
+                      on_call: Optional[OnCall] = None) -> httpx.Client:
+    """
+    The process's pooled client. `wrap` layers a transport (e.g. deadlines
+    and the circuit breaker) between the counters and the connection pool.
+    """
+    global _transport, _pool_size
+    _pool_size = pool_size
+    _transport = httpx.HTTPTransport(
+        http2=http2_available(), limits=_limits(pool_size, keepalive_seconds), retries=1,
+    )
+    inner = wrap(_transport) if wrap else _transport
+    return httpx.Client(
+        transport=InstrumentedTransport(inner, on_call),
+        timeout=httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds),
+        follow_redirects=True,
+    )
+
+
+def build_async_http_client(pool_size: int, keepalive_seconds: float, timeout_seconds: float,
+                            connect_timeout_seconds: float,
+                            wrap: Optional[Callable[[httpx.AsyncBaseTransport], httpx.AsyncBaseTransport]] = None,
+                            on_call: Optional[OnCall] = None) -> httpx.AsyncClient:
+    """The process's pooled async client; as build_http_client, on its own connection pool."""
+    global _async_transport, _pool_size
+    _pool_size = pool_size
+    _async_transport = httpx.AsyncHTTPTransport(
+        http2=http2_available(), limits=_limits(pool_size, keepalive_seconds), retries=1,
+    )
+    inner = wrap(_async_transport) if wrap else _async_transport
+    return httpx.AsyncClient(
+        transport=InstrumentedAsyncTransport(inner, on_call),
+        timeout=httpx.Timeout(timeout_seconds, connect=connect_timeout_seconds),
+        follow_redirects=True,
+    )
+
+
+def pool_stats() -> dict:
+    """Request counters and connection pool occupancy for the shared clients."""
+    with _counters_lock:
+        stats = dict(_counters)
+    connections = [
+        connection
+        for transport in (_transport, _async_transport)
+        for connection in getattr(getattr(transport, "_pool", None), "connections", None) or []
+    ]
+    stats.update({
+        "pool_size": _pool_size,
+        "http2": http2_available(),
+        "connections": len(connections),
+        "idle_connections": sum(1 for c in connections if c.is_idle()),
+    })
+    return stats
+
+
+def render_pool_metrics():
+    stats = pool_stats()
+    yield "# TYPE tindai_supabase_pool_connections gauge"
+    yield f'tindai_supabase_pool_connections{{state="open"}} {stats["connections"]}'
+    yield f'tindai_supabase_pool_connections{{state="idle"}} {stats["idle_connections"]}'
+    yield "# TYPE tindai_supabase_in_flight gauge"
+    yield f"tindai_supabase_in_flight {stats['in_flight']}"
@@ -0,0 +1,294 @@
+"""
+Deadlines, hedged reads and a circuit breaker for Supabase calls.
+
+Every request gets a deadline (REQUEST_DEADLINE_SECONDS) when it is parsed.
+Each PostgREST call made on its behalf is given the time that is left as
+its timeout, so a handler making a chain of calls is bounded by the
+deadline instead of by the sum of per-call timeouts, and calls after the
+deadline fail immediately.
+
+With SUPABASE_HEDGE enabled, a read still waiting after the table's recent
+p95 latency is sent a second time and whichever answer arrives first wins.
+
+The circuit breaker opens after CIRCUIT_FAILURE_THRESHOLD consecutive
+failures (timeouts, connection errors, 5xx) and fails calls fast for
+CIRCUIT_RESET_SECONDS, then lets a single trial call through.
+
+The failures raised here subclass BackendUnavailable; send_server_error in
+_shared answers them with 503 and Retry-After.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import _metrics
+
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "8"))
+HEDGE_ENABLED = os.environ.get("SUPABASE_HEDGE", "").lower() in ("1", "true")
+HEDGE_PERCENTILE = float(os.environ.get("SUPABASE_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_DELAY_SECONDS = 0.02
+HEDGE_MIN_SAMPLES = 20
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "10"))
+
+HEDGES = _metrics.Counter(
+    "tindai_supabase_hedges_total", "Hedged reads, by table and which attempt answered first.",
+    ("table", "winner"),
+)
+SHORT_CIRCUITS = _metrics.Counter(
+    "tindai_supabase_short_circuits_total", "Calls failed fast, by reason.",
+    ("reason",),
+)
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class BackendUnavailable(Exception):
+    """The database could not be reached in time; the request should be retried later."""
+
+    retry_after = 1
+
+
+class DeadlineExceeded(BackendUnavailable):
+    pass
+
+
+class CircuitOpenError(BackendUnavailable):
+    def __init__(self, retry_after: float):
+        super().__init__("Supabase circuit open")
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+# ─── Deadlines ────────────────────────────────────────────────────
+
+def set_deadline(seconds: Optional[float]):
+    """Give the current request `seconds` from now, or no deadline with None."""
+    _deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+
+def get_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def use_deadline(deadline: Optional[float]):
+    """Adopt a deadline captured on another thread (see _async.run)."""
+    _deadline.set(deadline)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None if it has none."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def apply_deadline(request, default_timeout: float):
+    """
+    Cap `request`'s timeouts at the time left on the deadline, or raise
+    DeadlineExceeded if it has already passed.
+    """
+    left = remaining()
+    if left is None:
+        return
+    if left <= 0:
+        SHORT_CIRCUITS.inc("deadline")
+        raise DeadlineExceeded("Request deadline exceeded before the query was sent")
+    budget = min(left, default_timeout)
+    timeouts = dict(request.extensions.get("timeout") or {})
+    for phase in ("connect", "read", "write", "pool"):
+        current = timeouts.get(phase)
+        timeouts[phase] = budget if current is None else min(current, budget)
+    request.extensions["timeout"] = timeouts
+
+
+# ─── Circuit breaker ──────────────────────────────────────────────
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_after: float = CIRCUIT_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        with self._lock:
+            if self.state == "closed":
+                return
+            waited = time.monotonic() - self._opened_at
+            if self.state == "open" and waited >= self.reset_after:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            SHORT_CIRCUITS.inc("circuit_open")
+            raise CircuitOpenError(max(0.0, self.reset_after - waited))
+
+    def record_cancelled(self):
+        """A call that ended without telling us anything about the backend."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, ok: bool):
+        with self._lock:
+            self._trial_in_flight = False
+            if ok:
+                self._failures = 0
+                self.state = "closed"
+                return
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.threshold:
+                if self.state != "open":
+                    print(f"Supabase circuit opened after {self._failures} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+breaker = CircuitBreaker()
+
+
+def _render_breaker_metrics():
+    yield "# TYPE tindai_supabase_circuit_open gauge"
+    yield f"tindai_supabase_circuit_open {0 if breaker.state == 'closed' else 1}"
+
+
+_metrics.register_collector(_render_breaker_metrics)
+
+
+def before_call(request, default_timeout: float):
+    """Apply the deadline and the breaker to a call about to go out."""
+    apply_deadline(request, default_timeout)
+    breaker.before_call()
+
+
+def call_failed(error: Exception) -> Exception:
+    """
+    Handle a transport failure and return the exception to raise. A timeout
+    caused by the request's own deadline running out becomes
+    DeadlineExceeded and does not count against the breaker.
+    """
+    import httpx
+    left = remaining()
+    if isinstance(error, httpx.TimeoutException) and left is not None and left <= 0:
+        breaker.record_cancelled()
+        return DeadlineExceeded("Request deadline exceeded waiting for Supabase")
+    breaker.record(False)
+    return error
+
+
+# ─── Hedged reads ─────────────────────────────────────────────────
+
+class LatencyWindow:
+    """Recent read latencies for one table, kept sorted for percentile lookups."""
+
+    def __init__(self, size: int = 200):
+        self._recent = deque(maxlen=size)
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                old = self._recent[0]
+                del self._sorted[bisect.bisect_left(self._sorted, old)]
+            self._recent.append(seconds)
+            bisect.insort(self._sorted, seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if len(self._sorted) < HEDGE_MIN_SAMPLES:
+                return None
+            return self._sorted[min(len(self._sorted) - 1, int(len(self._sorted) * p))]
+
+
+class ResilientTransport:
+    """
+    Wraps the pooled transport: applies the request deadline and the circuit
+    breaker to every call, and hedges slow reads when SUPABASE_HEDGE is on.
+    """
+
+    def __init__(self, inner, default_timeout: float, describe, hedge: bool = HEDGE_ENABLED, workers: int = 8):
+        self.inner = inner
+        self.default_timeout = default_timeout
+        self.describe = describe
+        self.hedge = hedge
+        self._latency = {}
+        self._pool = None
+        if hedge:
+            from concurrent.futures import ThreadPoolExecutor  # only when hedging (off the import path)
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="supabase-hedge")
+
+    def handle_request(self, request):
+        import httpx
+        before_call(request, self.default_timeout)
+        try:
+            if self.hedge and request.method == "GET":
+                response = self._hedged(request)
+            else:
+                response = self.inner.handle_request(request)
+        except httpx.TransportError as e:
+            replacement = call_failed(e)
+            if replacement is e:
+                raise
+            raise replacement from e
+        breaker.record(response.status_code < 500)
+        return response
+
+    def _window(self, table: str) -> LatencyWindow:
+        window = self._latency.get(table)
+        if window is None:
+            window = self._latency.setdefault(table, LatencyWindow())
+        return window
+
+    def _timed(self, request, window: LatencyWindow):
+        started = time.perf_counter()
+        response = self.inner.handle_request(request)
+        window.add(time.perf_counter() - started)
+        return response
+
+    def _hedged(self, request):
+        from concurrent.futures import FIRST_COMPLETED, wait
+        table, _ = self.describe(request)
+        window = self._window(table)
+        delay = window.percentile(HEDGE_PERCENTILE)
+        left = remaining()
+        if delay is None or (left is not None and left <= delay):
+            return self._timed(request, window)
+
+        primary = self._pool.submit(self._timed, request, window)
+        done, _ = wait([primary], timeout=max(delay, HEDGE_MIN_DELAY_SECONDS))
+        if done:
+            return primary.result()
+
+        backup = self._pool.submit(self._timed, request, window)
+        done, _ = wait([primary, backup], return_when=FIRST_COMPLETED)
+        winner = primary if primary in done else backup
+        loser = backup if winner is primary else primary
+        if winner.exception() is not None:
+            # The other attempt may still succeed; fall back to it.
+            winner, loser = loser, winner
+        loser.add_done_callback(_close_response)
+        HEDGES.inc(table, "primary" if winner is primary else "hedge")
+        return winner.result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self.inner.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
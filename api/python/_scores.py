@@ -0,0 +1,261 @@
+"""
+Component score cache for suggestion rankings.
+
+A compatibility score is the sum of independent terms (matching.SCORE_TERMS),
+each reading one profile field of both agents. For each agent whose
+suggestions were ranked recently, this cache keeps every candidate's terms
+and the ranking they sort into. The next ranking compares the candidate
+rows it is given with the ones the terms were computed from, and only
+recomputes the terms that read a changed field: a mood flip costs a table
+lookup per affected pair instead of tokenizing both bios again. Moved
+candidates are re-inserted into the sorted ranking rather than re-sorting it.
+
+Candidate rows are stored once per process and shared by every ranking
+that holds them (most rankings hold most agents). The cache is bounded by
+its total number of candidate entries, SCORE_CACHE_ENTRIES, evicting least
+recently used rankings; only exact-mode rankings of up to
+SCORE_CACHE_MAX_CANDIDATES candidates are cached (larger sets go to the
+_parallel process pool instead). The defaults, 32 rankings of 5000, keep
+the cache well inside a function's memory.
+
+agents.py pushes profile edits into every cached ranking as they are made
+(profile_changed); changes written elsewhere (karma, other services) are
+picked up by the comparison on the next read.
+"""
+import bisect
+import os
+import threading
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+from _cache import TTLCache
+
+MAX_ENTRIES = int(os.environ.get("SCORE_CACHE_ENTRIES", "160000"))
+TTL = float(os.environ.get("SCORE_CACHE_SECONDS", "600"))
+MAX_CANDIDATES = int(os.environ.get("SCORE_CACHE_MAX_CANDIDATES", "5000"))
+# Above this share of moved candidates, one sort beats moving them one by one.
+RESORT_FRACTION = 0.125
+
+Terms = Sequence[Tuple[Tuple[str, ...], Callable[[dict, dict], float]]]
+
+
+class _SharedRows:
+    """Candidate rows by id, one copy for all rankings, kept while at least one ranking holds the candidate."""
+
+    def __init__(self):
+        self._rows = {}  # candidate id -> [row, rankings holding it]
+        self._lock = threading.Lock()
+
+    def share(self, rows: List[dict]) -> List[dict]:
+        """`rows`, with each one equal to the stored row replaced by it. The others become the stored rows."""
+        shared = []
+        with self._lock:
+            for row in rows:
+                slot = self._rows.get(row["id"])
+                if slot is not None:
+                    if slot[0] == row:
+                        row = slot[0]
+                    else:
+                        slot[0] = row
+                shared.append(row)
+        return shared
+
+    def hold(self, rows: Iterable[dict]):
+        with self._lock:
+            for row in rows:
+                slot = self._rows.get(row["id"])
+                if slot is None:
+                    self._rows[row["id"]] = [row, 1]
+                else:
+                    slot[1] += 1
+
+    def release(self, ids: Iterable[str]):
+        with self._lock:
+            for row_id in ids:
+                slot = self._rows.get(row_id)
+                if slot is not None:
+                    slot[1] -= 1
+                    if slot[1] <= 0:
+                        del self._rows[row_id]
+
+    def merge(self, row: dict) -> Optional[dict]:
+        """Apply a partial edit to the stored row. Returns the new row, or None if no ranking holds it."""
+        with self._lock:
+            slot = self._rows.get(row["id"])
+            if slot is None:
+                return None
+            slot[0] = {**slot[0], **{k: v for k, v in row.items() if k in slot[0]}}
+            return slot[0]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class _Ranking:
+    """One agent's candidates: their terms, the rows they were scored from, and the sorted ranking."""
+
+    def __init__(self, agent: dict, terms: Terms, total: Callable[[Iterable[float]], int]):
+        self.terms = terms
+        self.total = total
+        self.agent = agent
+        self.entries = {}  # candidate id -> [terms, row, sort key]
+        self.order = []    # (-score, seq, candidate id), best first
+        self.seq = 0       # first-seen position, the tie-break of the sequential sort
+        self.lock = threading.Lock()
+        self.evicted = False  # dropped from the cache; its rows are (or are about to be) released
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _stale_terms(self, old: dict, new: dict) -> List[int]:
+        return [i for i, (fields, _) in enumerate(self.terms) if any(old.get(f) != new.get(f) for f in fields)]
+
+    def _key(self, values: list, seq: int) -> tuple:
+        return (-self.total(values), seq)
+
+    def set_agent(self, agent: dict):
+        """Take a new snapshot of the ranked agent, recomputing the terms that read changed fields."""
+        stale = self._stale_terms(self.agent, agent)
+        self.agent = agent
+        if not stale:
+            return
+        for candidate_id, entry in self.entries.items():
+            values, row, key = entry
+            for i in stale:
+                values[i] = self.terms[i][1](agent, row)
+            entry[2] = self._key(values, key[1])
+        self.order = sorted(entry[2] + (candidate_id,) for candidate_id, entry in self.entries.items())
+
+    def set_candidate(self, row: dict) -> bool:
+        """Add or refresh one candidate row. Returns whether its position may have changed."""
+        entry = self.entries.get(row["id"])
+        if entry is None:
+            values = [term(self.agent, row) for _, term in self.terms]
+            self.entries[row["id"]] = [values, row, self._key(values, self.seq)]
+            self.seq += 1
+            return True
+        values, old, key = entry
+        if row is old:
+            return False
+        entry[1] = row
+        stale = self._stale_terms(old, row)
+        if not stale:
+            return False
+        for i in stale:
+            values[i] = self.terms[i][1](self.agent, row)
+        entry[2] = self._key(values, key[1])
+        if entry[2] != key:
+            self._remove_key(key)
+        return entry[2] != key
+
+    def _remove_key(self, key: tuple):
+        index = bisect.bisect_left(self.order, key)
+        if index < len(self.order) and self.order[index][:2] == key:
+            del self.order[index]
+
+    def sync(self, candidates: List[dict], rows: _SharedRows):
+        """Bring the ranking in line with the (shared) candidate rows of this read."""
+        moved, seen, added = [], set(), []
+        for row in candidates:
+            seen.add(row["id"])
+            if row["id"] not in self.entries:
+                added.append(row)
+            if self.set_candidate(row):
+                moved.append(row["id"])
+        gone = [candidate_id for candidate_id in self.entries if candidate_id not in seen]
+        for candidate_id in gone:
+            self._remove_key(self.entries.pop(candidate_id)[2])
+        rows.hold(added)
+        rows.release(gone)
+        self._place(moved)
+
+    def release(self, rows: _SharedRows):
+        """Let go of every candidate (the ranking was evicted)."""
+        rows.release(self.entries)
+        self.entries, self.order = {}, []
+
+    def _place(self, moved: List[str]):
+        if len(moved) > RESORT_FRACTION * len(self.entries):
+            self.order = sorted(entry[2] + (candidate_id,) for candidate_id, entry in self.entries.items())
+            return
+        for candidate_id in moved:
+            bisect.insort(self.order, self.entries[candidate_id][2] + (candidate_id,))
+
+    def page(self, exclude: set, limit: int, offset: int) -> Tuple[List[dict], int]:
+        """One page of (row, score), best first, skipping `exclude`; plus the number ranked."""
+        total = len(self.order) - sum(1 for candidate_id in exclude if candidate_id in self.entries)
+        rows, skipped = [], 0
+        for neg_score, _, candidate_id in self.order:
+            if len(rows) == limit:
+                break
+            if candidate_id in exclude:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            rows.append({**self.entries[candidate_id][1], "compatibility_score": -neg_score})
+        return rows, total
+
+
+class ScoreCache:
+    def __init__(self, name: str):
+        self._rows = _SharedRows()
+        self._evicted = []  # rankings dropped by the cache, released after the next rank()
+        self._rankings = TTLCache(name, maxsize=MAX_ENTRIES, ttl=TTL, weigh=len, on_evict=self._on_evict)
+        self._lock = threading.Lock()
+
+    def eligible(self, candidates: int) -> bool:
+        return MAX_ENTRIES > 0 and candidates <= min(MAX_CANDIDATES, MAX_ENTRIES)
+
+    def _on_evict(self, ranking: _Ranking):
+        # Called under the TTLCache lock: only flag it here.
+        ranking.evicted = True
+        self._evicted.append(ranking)
+
+    def _release_evicted(self):
+        while self._evicted:
+            try:
+                ranking = self._evicted.pop()
+            except IndexError:
+                return
+            with ranking.lock:
+                ranking.release(self._rows)
+
+    def rank(self, agent: dict, candidates: List[dict], exclude: set, limit: int, offset: int,
+             terms: Terms, total: Callable[[Iterable[float]], int]) -> Tuple[List[dict], int]:
+        """A page of `agent`'s ranking over `candidates`, reusing every term still valid."""
+        candidates = self._rows.share(candidates)
+        while True:
+            with self._lock:
+                ranking = self._rankings.get(agent["id"])
+                if ranking is None or ranking.evicted:
+                    ranking = _Ranking(agent, terms, total)
+                    self._rankings.set(agent["id"], ranking)
+            with ranking.lock:
+                if ranking.evicted:
+                    continue
+                ranking.set_agent(agent)
+                ranking.sync(candidates, self._rows)
+                page = ranking.page(exclude, limit, offset)
+                # Re-weigh it by its candidates, evicting older rankings past MAX_ENTRIES.
+                self._rankings.set(agent["id"], ranking)
+            self._release_evicted()
+            return page
+
+    def profile_changed(self, row: dict):
+        """
+        Apply a profile edit to every cached ranking: as the ranked agent
+        and as a candidate. `row` may hold any subset of the profile columns.
+        """
+        shared = self._rows.merge(row)
+        for ranking in self._rankings.values():
+            with ranking.lock:
+                if ranking.evicted:
+                    continue
+                if ranking.agent.get("id") == row["id"]:
+                    ranking.set_agent({**ranking.agent, **row})
+                if shared is not None and row["id"] in ranking.entries and ranking.set_candidate(shared):
+                    ranking._place([row["id"]])
+
+
+# Shared by every handler in the process (one per warm instance).
+score_cache = ScoreCache("suggestion_scores")
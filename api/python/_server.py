@@ -0,0 +1,150 @@
+"""
+Self-hosted server for the TindAi Python backend services.
+
+On Vercel every api/python module is its own function handling one request
+per invocation. This entry point mounts all of them in one long-lived
+process instead: `/api/python/<module>` is routed to that module's `handler`
+class, connections stay open with HTTP/1.1 keep-alive, and a fixed pool of
+worker threads shares the Supabase connection pool, caches and metrics.
+
+    python api/python/_server.py --port 8000 --workers 16
+
+Point the TypeScript gateway at it with PYTHON_BACKEND_URL.
+"""
+import argparse
+import glob
+import importlib
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+if os.path.dirname(os.path.abspath(__file__)) not in sys.path:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from _shared import ServiceHandler, send_error, warm_up
+
+ROUTE_PREFIX = "/api/python/"
+WORKERS = int(os.environ.get("PYTHON_SERVER_WORKERS", "16"))
+KEEPALIVE_SECONDS = float(os.environ.get("PYTHON_SERVER_KEEPALIVE_SECONDS", "15"))
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def discover_handlers() -> dict:
+    """Module name -> handler class for every function module in api/python."""
+    routes = {}
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(here, "*.py"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name.startswith("_"):
+            continue
+        cls = getattr(importlib.import_module(name), "handler", None)
+        if isinstance(cls, type) and issubclass(cls, BaseHTTPRequestHandler):
+            routes[name] = cls
+    return routes
+
+
+class Router(ServiceHandler):
+    """
+    Parses each request on a kept-alive connection and runs it on a fresh
+    instance of the target module's handler class. The body is read up front
+    so a handler that answers without reading it cannot desync the next
+    request on the connection.
+    """
+
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_SECONDS
+    # Headers and body go out in separate writes; don't let Nagle hold the
+    # body back waiting on a delayed ACK from a kept-alive client.
+    disable_nagle_algorithm = True
+    routes: dict = {}
+    _route = None
+
+    def parse_request(self) -> bool:
+        self._route = None
+        if not super().parse_request():
+            return False
+        path = urlparse(self.path).path
+        if path.startswith(ROUTE_PREFIX):
+            self._route = path[len(ROUTE_PREFIX):].strip("/") or None
+        return True
+
+    def endpoint_name(self) -> str:
+        return self._route if self._route in self.routes else "not_found"
+
+    def _dispatch(self):
+        cls = self.routes.get(self._route)
+        if cls is None:
+            send_error(self, 404, "Not found")
+            return
+        method = getattr(cls, "do_" + self.command, None)
+        if method is None:
+            send_error(self, 405, "Method not allowed")
+            return
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.close_connection = True
+            send_error(self, 411, "Content-Length required")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            send_error(self, 413, "Request body too large")
+            return
+        body = self.rfile.read(length) if length else b""
+
+        delegate = cls.__new__(cls)
+        delegate.__dict__.update({k: v for k, v in self.__dict__.items() if k != "_headers_buffer"})
+        delegate.rfile = io.BytesIO(body)
+        delegate.protocol_version = self.protocol_version
+        try:
+            method(delegate)
+        finally:
+            self._status = delegate._status
+            self.close_connection = self.close_connection or delegate.close_connection
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_OPTIONS = _dispatch
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that serves connections on a fixed pool of worker threads."""
+
+    def __init__(self, address, handler_class, workers: int = WORKERS):
+        super().__init__(address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8000, workers: int = WORKERS) -> PooledHTTPServer:
+    Router.routes = discover_handlers()
+    return PooledHTTPServer((host, port), Router, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.workers)
+    warm_up()
+    print(f"Serving {', '.join(sorted(Router.routes))} on http://{args.host}:{args.port}{ROUTE_PREFIX} "
+          f"with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+The caches shared by the TindAi Python services, built on the _cache
+primitives: match membership, pre-serialized feed pages and coalesced reads.
+"""
+from collections import namedtuple
+from typing import Optional
+
+from _cache import SingleFlight, StaleWhileRevalidateCache, TTLCache
+
+# ─── Match membership ─────────────────────────────────────────────
+
+MatchMembership = namedtuple("MatchMembership", "agent1_id agent2_id is_active matched_at")
+
+# Participants never change for a match; only is_active flips on a breakup.
+# Writes into an ended match are rejected by the database, so a stale
+# "active" entry is caught on insert and re-validated there.
+_match_membership = TTLCache("match_membership", maxsize=4096, ttl=60.0)
+
+
+def get_match_membership(supabase, match_id: str, refresh: bool = False) -> Optional[MatchMembership]:
+    """Participants and status of a match, or None if it does not exist."""
+    if not refresh:
+        cached = _match_membership.get(match_id)
+        if cached is not None:
+            return cached
+    result = supabase.table("matches").select(
+        "agent1_id, agent2_id, is_active, matched_at"
+    ).eq("id", match_id).limit(1).execute()
+    if not result.data:
+        _match_membership.pop(match_id)
+        return None
+    row = result.data[0]
+    membership = MatchMembership(row["agent1_id"], row["agent2_id"], bool(row["is_active"]), row.get("matched_at"))
+    _match_membership.set(match_id, membership)
+    return membership
+
+
+def remember_match(match_id: str, row: dict):
+    """Seed the membership cache from a match row fetched elsewhere."""
+    _match_membership.set(match_id, MatchMembership(
+        row["agent1_id"], row["agent2_id"], bool(row["is_active"]), row.get("matched_at"),
+    ))
+
+
+def invalidate_match(match_id: str):
+    _match_membership.pop(match_id)
+
+
+# ─── Public conversation feed ─────────────────────────────────────
+
+# Pre-serialized feed pages keyed by (limit, offset), each stored with the
+# ids of the matches it shows. Every viewer sees the same feed, so a burst
+# of readers costs one rebuild per page.
+feed_pages = StaleWhileRevalidateCache("feed_pages", fresh_for=5.0, stale_for=60.0)
+
+
+def invalidate_feed(match_id: Optional[str] = None):
+    """
+    Call after new matches and breakups (they shift every page), and with
+    the match id after new messages: only the pages showing it go stale.
+    """
+    if match_id is None:
+        feed_pages.invalidate()
+    else:
+        feed_pages.invalidate(lambda page: match_id in page[1])
+
+
+# ─── Coalesced reads ──────────────────────────────────────────────
+
+# Responses that many callers ask for at the same moment: a popular agent's
+# profile, a feed page being rebuilt, an agent's suggestions list.
+profile_reads = SingleFlight("agent_profile")
+feed_builds = SingleFlight("feed_page")
+suggestion_reads = SingleFlight("suggestions")
@@ -5,26 +5,133 @@ These functions are called internally by the TypeScript API gateway.
 import json
 import hmac
 import os
-from typing import Any, Optional
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+import _metrics
+import _resilience
+import _tracing
+from _cursors import decode_cursor, encode_cursor, keyset_filter  # noqa: F401 (re-exported)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SUPABASE_POOL_SIZE = int(os.environ.get("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_KEEPALIVE_SECONDS = float(os.environ.get("SUPABASE_KEEPALIVE_SECONDS", "60"))
+SUPABASE_TIMEOUT_SECONDS = float(os.environ.get("SUPABASE_TIMEOUT_SECONDS", "10"))
+SUPABASE_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("SUPABASE_CONNECT_TIMEOUT_SECONDS", "5"))
 
 _supabase = None
+_http_client = None
+_supabase_lock = threading.Lock()
+
+
+def _record_call(request, response, elapsed: float):
+    _tracing.record_http(request, response, elapsed * 1000)
+
+
+def _build_http_client():
+    """One keep-alive connection pool (see _pool) shared by every Supabase call in the process."""
+    import _pool
+    return _pool.build_http_client(
+        SUPABASE_POOL_SIZE, SUPABASE_KEEPALIVE_SECONDS, SUPABASE_TIMEOUT_SECONDS, SUPABASE_CONNECT_TIMEOUT_SECONDS,
+        wrap=lambda pooled: _resilience.ResilientTransport(pooled, SUPABASE_TIMEOUT_SECONDS, _tracing.describe),
+        on_call=_record_call,
+    )
+
+
+def postgrest_settings() -> Tuple[str, dict]:
+    """REST endpoint and service-role headers for the PostgREST clients."""
+    from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+    url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+    key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+    if not url:
+        raise RuntimeError("SUPABASE_URL or NEXT_PUBLIC_SUPABASE_URL is required")
+    if not key:
+        raise RuntimeError("SUPABASE_SERVICE_ROLE_KEY is required")
+    return f"{url.rstrip('/')}/rest/v1", {
+        **DEFAULT_POSTGREST_CLIENT_HEADERS,
+        "apiKey": key,
+        "Authorization": f"Bearer {key}",
+    }
 
 
 def get_supabase():
-    """Lazy-init Supabase client with service role key."""
-    global _supabase
-    if _supabase is None:
-        from supabase import create_client
-        url = os.environ.get("SUPABASE_URL") or os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
-        key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
-        if not url:
-            raise RuntimeError("SUPABASE_URL or NEXT_PUBLIC_SUPABASE_URL is required")
-        if not key:
-            raise RuntimeError("SUPABASE_SERVICE_ROLE_KEY is required")
-        _supabase = create_client(url, key)
+    """
+    Process-wide database client (service role key) on a pooled HTTP client.
+    Handlers only use the REST API (.table / .rpc), so this is the PostgREST
+    client on its own: importing the full supabase package (auth, storage,
+    realtime) roughly triples cold-start import time.
+    Safe to call from any thread; the first caller builds it.
+    """
+    global _supabase, _http_client
+    if _supabase is not None:
+        return _supabase
+    with _supabase_lock:
+        if _supabase is None:
+            from postgrest import SyncPostgrestClient
+            rest_url, headers = postgrest_settings()
+            _http_client = _build_http_client()
+            _supabase = SyncPostgrestClient(rest_url, headers=headers, http_client=_http_client)
     return _supabase
 
 
+def warm_up():
+    """
+    Build the client and open a pooled connection ahead of the first request,
+    so neither the import nor the TLS handshake lands on it.
+    """
+    try:
+        client = get_supabase()
+        client.session.head(str(client.base_url))
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+
+
+def _start_warm_up():
+    if os.environ.get("SUPABASE_WARMUP", "").lower() in ("1", "true"):
+        threading.Thread(target=warm_up, name="supabase-warm-up", daemon=True).start()
+
+
+# Hot endpoints have asyncio variants (see _async) that fan independent
+# queries out concurrently. Off by default; the sync paths are unchanged.
+_async_handlers = os.environ.get("PYTHON_ASYNC_HANDLERS", "").lower() in ("1", "true")
+
+
+def async_handlers_enabled() -> bool:
+    return _async_handlers
+
+
+def set_async_handlers(enabled: bool):
+    """Switch the hot endpoints between their sync and async variants."""
+    global _async_handlers
+    _async_handlers = enabled
+
+
+def _render_pool_metrics():
+    import _pool
+    return _pool.render_pool_metrics()
+
+
+_metrics.register_collector(_render_pool_metrics)
+
+
+def pool_stats() -> dict:
+    """Request counters and connection pool occupancy for the shared client."""
+    import _pool
+    return _pool.pool_stats()
+
+
 def verify_internal_call(headers) -> bool:
     """
     Verify that this request comes from our own TypeScript API gateway.
@@ -39,28 +146,218 @@ def verify_internal_call(headers) -> bool:
     return hmac.compare_digest(provided, secret)
 
 
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    Base class for the service handlers. Opens a query trace once a request
+    has been parsed and closes it when the request is done.
+    """
+
+    _status = None
+    _started = None
+    _cleanups = ()
+
+    def parse_request(self) -> bool:
+        if not super().parse_request():
+            return False
+        self._started = time.perf_counter()
+        self._status = None
+        self._cleanups = []
+        _resilience.set_deadline(_resilience.REQUEST_DEADLINE_SECONDS)
+        _tracing.begin(self.command, self.path)
+        return True
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def on_finish(self, callback: Callable[[], None]):
+        """Run `callback` once the current request is done, however it ends."""
+        self._cleanups.append(callback)
+
+    def endpoint_name(self) -> str:
+        """Label for this request in the metrics."""
+        return type(self).__module__
+
+    def handle_one_request(self):
+        self._started = None
+        try:
+            super().handle_one_request()
+        finally:
+            for callback in self._cleanups:
+                callback()
+            self._cleanups = ()
+            _resilience.set_deadline(None)
+            _tracing.end()
+            if self._started is not None:
+                endpoint = self.endpoint_name()
+                _metrics.REQUESTS.inc(endpoint, self.command, self._status or 0)
+                _metrics.REQUEST_LATENCY.observe(time.perf_counter() - self._started, endpoint, self.command)
+
+
 UUID_RE = r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$"
 
 
+_UUID_PATTERN = re.compile(UUID_RE, re.IGNORECASE)
+
+
 def is_valid_uuid(value: str) -> bool:
-    import re
-    return bool(re.match(UUID_RE, value, re.IGNORECASE))
+    return bool(_UUID_PATTERN.match(value))
 
 
-def send_json(handler, data: Any, status: int = 200):
-    """Send a JSON response with CORS headers."""
-    handler.send_response(status)
-    handler.send_header("Content-Type", "application/json")
+def _send_cors_headers(handler):
     origin = os.environ.get("CORS_ALLOWED_ORIGIN", "https://tindai.tech")
     handler.send_header("Access-Control-Allow-Origin", origin)
     handler.send_header("Access-Control-Allow-Methods", "GET, POST, PATCH, DELETE, OPTIONS")
     handler.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization, X-Internal-Secret")
+
+
+def _stdlib_dumps(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _orjson_dumps(data: Any) -> bytes:
+    try:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # e.g. integers beyond 64 bits, which the stdlib still handles
+        return _stdlib_dumps(data)
+
+
+_json_encoder: Callable[[Any], bytes] = _orjson_dumps if orjson else _stdlib_dumps
+
+
+def set_json_encoder(encoder: Callable[[Any], bytes]):
+    """Swap the encoder used by send_json. It must return UTF-8 JSON bytes."""
+    global _json_encoder
+    _json_encoder = encoder
+
+
+def json_dumps(data: Any) -> bytes:
+    """Serialize with the active encoder (orjson when installed)."""
+    return _json_encoder(data)
+
+
+COMPRESS_MIN_BYTES = 1024
+
+
+def _pick_encoding(accept_encoding: str) -> Optional[str]:
+    """Choose br or gzip from an Accept-Encoding header, honouring q=0."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name] = q
+    wildcard = weights.get("*", 0.0)
+    if brotli is not None and weights.get("br", wildcard) > 0:
+        return "br"
+    if weights.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def send_json(handler, data: Any, status: int = 200, headers: Optional[dict] = None):
+    """
+    Send a JSON response with CORS headers. Requests sent with
+    X-Trace-Debug: 1 get the request's query trace under "_debug".
+    """
+    trace = _tracing.current()
+    if trace is not None and isinstance(data, dict) and handler.headers is not None \
+            and handler.headers.get("X-Trace-Debug") == "1":
+        data = {**data, "_debug": trace.debug_block()}
+    send_json_bytes(handler, json_dumps(data), status, headers)
+
+
+def send_json_bytes(handler, body: bytes, status: int = 200, headers: Optional[dict] = None):
+    """
+    Send an already-serialized JSON body with CORS headers. Bodies above
+    COMPRESS_MIN_BYTES are compressed when the client accepts br or gzip.
+    """
+    encoding = None
+    if len(body) >= COMPRESS_MIN_BYTES and handler.headers is not None:
+        encoding = _pick_encoding(handler.headers.get("Accept-Encoding", ""))
+        if encoding == "br":
+            body = brotli.compress(body, quality=5)
+        elif encoding == "gzip":
+            import gzip
+            body = gzip.compress(body, compresslevel=5)
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    _send_cors_headers(handler)
+    handler.send_header("Vary", "Accept-Encoding")
+    if encoding:
+        handler.send_header("Content-Encoding", encoding)
+    handler.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    trace = _tracing.current()
+    if trace is not None:
+        handler.send_header("Server-Timing", trace.server_timing())
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+
+def send_ndjson_stream(handler, records: Iterable[dict], status: int = 200):
+    """
+    Stream records as newline-delimited JSON while they are produced.
+    Uses chunked transfer encoding on HTTP/1.1 connections; on HTTP/1.0 the
+    body simply ends when the connection closes.
+    """
+    chunked = handler.request_version == "HTTP/1.1" and handler.protocol_version == "HTTP/1.1"
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/x-ndjson")
+    _send_cors_headers(handler)
+    if chunked:
+        handler.send_header("Transfer-Encoding", "chunked")
+    else:
+        handler.send_header("Connection", "close")
+        handler.close_connection = True
     handler.end_headers()
-    handler.wfile.write(json.dumps(data).encode())
 
+    def write(data: bytes):
+        if chunked:
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        else:
+            handler.wfile.write(data)
 
-def send_error(handler, status: int, message: str):
-    send_json(handler, {"success": False, "error": message}, status)
+    buffer = bytearray()
+    try:
+        for record in records:
+            buffer += json_dumps(record)
+            buffer += b"\n"
+            if len(buffer) >= NDJSON_CHUNK_BYTES:
+                write(bytes(buffer))
+                buffer.clear()
+    except Exception as e:
+        # Headers are already out, so report the failure in-band
+        print(f"NDJSON stream error: {e}")
+        buffer += json_dumps({"type": "error", "error": "Internal server error"}) + b"\n"
+    if buffer:
+        write(bytes(buffer))
+    if chunked:
+        handler.wfile.write(b"0\r\n\r\n")
+    handler.wfile.flush()
+
+
+def send_error(handler, status: int, message: str, headers: Optional[dict] = None):
+    send_json(handler, {"success": False, "error": message}, status, headers)
+
+
+def send_server_error(handler, error: Exception):
+    """500 for unexpected errors; 503 with Retry-After when the database is unavailable."""
+    if isinstance(error, _resilience.BackendUnavailable):
+        send_error(handler, 503, "Service temporarily unavailable", {"Retry-After": str(error.retry_after)})
+    else:
+        send_error(handler, 500, "Internal server error")
 
 
 def read_body(handler) -> dict:
@@ -74,8 +371,9 @@ def read_body(handler) -> dict:
 def handle_options(handler):
     """Handle CORS preflight."""
     handler.send_response(200)
-    origin = os.environ.get("CORS_ALLOWED_ORIGIN", "https://tindai.tech")
-    handler.send_header("Access-Control-Allow-Origin", origin)
-    handler.send_header("Access-Control-Allow-Methods", "GET, POST, PATCH, DELETE, OPTIONS")
-    handler.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization, X-Internal-Secret")
+    _send_cors_headers(handler)
+    handler.send_header("Content-Length", "0")
     handler.end_headers()
+
+
+_start_warm_up()
@@ -3,17 +3,22 @@ TindAi Agent Management - Python Backend Service
 Handles agent registration, profile retrieval, and updates.
 Called internally by the TypeScript API gateway.
 """
-from http.server import BaseHTTPRequestHandler
-import secrets
-import string
+from datetime import datetime, timezone
 from urllib.parse import urlparse, parse_qs
 import sys, os
-sys.path.insert(0, os.path.dirname(__file__))
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.insert(0, os.path.dirname(__file__))
 
 from _shared import (
-    get_supabase, verify_internal_call, is_valid_uuid,
-    send_json, send_error, read_body, handle_options,
+    ServiceHandler, get_supabase, verify_internal_call, is_valid_uuid,
+    send_json, send_error, send_server_error, read_body, handle_options,
+    async_handlers_enabled,
 )
+from _cache import fingerprint
+from _service_cache import profile_reads
+from _minhash import bio_fields, bio_index
+from _ann import ann_index
+from _scores import score_cache
 
 AVAILABLE_INTERESTS = [
     "Art", "Music", "Philosophy", "Sports", "Gaming",
@@ -30,19 +35,77 @@ MOOD_OPTIONS = [
 MAX_BIO_LENGTH = 500
 
 PUBLIC_FIELDS = "id, name, bio, interests, current_mood, karma, twitter_handle, is_verified, created_at, show_wallet, wallet_address, net_worth"
+PARTNER_FIELDS = "id, name, bio, interests, current_mood, karma"
+# Maintained by a trigger on swipes (migration 013).
+SWIPE_COUNT_FIELDS = "swipes_given, likes_received"
 
 
 def generate_api_key() -> str:
+    import secrets
+    import string
     chars = string.ascii_letters + string.digits
     return f"tindai_{''.join(secrets.choice(chars) for _ in range(32))}"
 
 
 def generate_claim_token() -> str:
+    import secrets
+    import string
     chars = string.ascii_letters + string.digits
     return f"tindai_claim_{''.join(secrets.choice(chars) for _ in range(24))}"
 
 
-class handler(BaseHTTPRequestHandler):
+def _profile_payload(a: dict, partner, match_info, swipes_given: int, likes_received: int) -> dict:
+    return {
+        "success": True,
+        "agent": {
+            "id": a["id"], "name": a["name"], "bio": a.get("bio"),
+            "interests": a.get("interests", []), "current_mood": a.get("current_mood"),
+            "karma": a.get("karma"), "is_verified": a.get("is_verified"),
+            "is_premium": a.get("is_premium", False),
+            "show_wallet": a.get("show_wallet", False),
+            "wallet_address": a.get("wallet_address") if a.get("show_wallet") else None,
+            "net_worth": a.get("net_worth") if a.get("show_wallet") else None,
+        },
+        "status": "matched" if partner else "unmatched",
+        "partner": partner,
+        "match": match_info,
+        "stats": {"swipes_given": swipes_given, "likes_received": likes_received},
+    }
+
+
+def _swipe_stats(rows) -> tuple:
+    """(swipes_given, likes_received) from an agent_swipe_counts read; no row means no swipes yet."""
+    row = rows[0] if rows else {}
+    return row.get("swipes_given") or 0, row.get("likes_received") or 0
+
+
+async def my_profile_async(agent_id: str):
+    """Async variant of the own-profile read: the profile, match and stats queries run concurrently."""
+    from _async import gather, get_async_supabase
+    db = get_async_supabase()
+    agent, matches, counts = await gather(
+        db.table("agents").select("*").eq("id", agent_id).limit(1).execute(),
+        db.table("matches").select("*").or_(
+            f"agent1_id.eq.{agent_id},agent2_id.eq.{agent_id}"
+        ).eq("is_active", True).execute(),
+        db.table("agent_swipe_counts").select(SWIPE_COUNT_FIELDS).eq("agent_id", agent_id).limit(1).execute(),
+    )
+    if not agent.data:
+        return None
+
+    partner = None
+    match_info = None
+    if matches.data:
+        m = matches.data[0]
+        pid = m["agent2_id"] if m["agent1_id"] == agent_id else m["agent1_id"]
+        pr = await db.table("agents").select(PARTNER_FIELDS).eq("id", pid).limit(1).execute()
+        partner = pr.data[0] if pr.data else None
+        match_info = {"match_id": m["id"], "matched_at": m.get("matched_at")}
+
+    return _profile_payload(agent.data[0], partner, match_info, *_swipe_stats(counts.data))
+
+
+class handler(ServiceHandler):
     def do_OPTIONS(self):
         handle_options(self)
 
@@ -68,14 +131,13 @@ class handler(BaseHTTPRequestHandler):
                 if not is_valid_uuid(agent_id):
                     send_error(self, 400, "Invalid agent_id")
                     return
-                result = supabase.table("agents").select(PUBLIC_FIELDS).eq("id", agent_id).limit(1).execute()
-                if not result.data:
+                agent = profile_reads.do(
+                    fingerprint("agents.profile", agent_id=agent_id),
+                    lambda: self._public_profile(supabase, agent_id),
+                )
+                if agent is None:
                     send_error(self, 404, "Agent not found")
                     return
-                agent = result.data[0]
-                if not agent.get("show_wallet"):
-                    agent.pop("wallet_address", None)
-                    agent.pop("net_worth", None)
                 send_json(self, {"success": True, "agent": agent})
 
             else:
@@ -83,7 +145,7 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print(f"Agent GET error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
 
     def do_POST(self):
         """Register a new agent."""
@@ -120,9 +182,11 @@ class handler(BaseHTTPRequestHandler):
             api_key = generate_api_key()
             claim_token = generate_claim_token()
 
+            sketch = bio_fields(bio)
             result = supabase.table("agents").insert({
                 "name": name,
                 "bio": bio,
+                **sketch,
                 "interests": valid_interests,
                 "api_key": api_key,
                 "claim_token": claim_token,
@@ -136,6 +200,8 @@ class handler(BaseHTTPRequestHandler):
                 return
 
             agent = result.data[0]
+            bio_index.update({"id": agent["id"], **sketch})
+            ann_index.update(agent)
             send_json(self, {
                 "success": True,
                 "agent": {
@@ -154,7 +220,7 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print(f"Agent POST error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
 
     def do_PATCH(self):
         """Update agent profile. agent_id passed by the TS gateway."""
@@ -175,6 +241,8 @@ class handler(BaseHTTPRequestHandler):
                     send_error(self, 400, f"Bio exceeds {MAX_BIO_LENGTH} character limit")
                     return
                 updates["bio"] = bio
+                # The MinHash sketch is computed once here, not per scoring pass.
+                updates.update(bio_fields(bio))
             if "interests" in body and isinstance(body["interests"], list):
                 updates["interests"] = [i for i in body["interests"] if i in AVAILABLE_INTERESTS]
             if "current_mood" in body:
@@ -194,21 +262,45 @@ class handler(BaseHTTPRequestHandler):
                 return
 
             supabase = get_supabase()
-            updates["updated_at"] = __import__("datetime").datetime.utcnow().isoformat()
+            updates["updated_at"] = datetime.now(timezone.utc).isoformat()
             supabase.table("agents").update(updates).eq("id", agent_id).execute()
+            if "bio" in updates:
+                bio_index.update({"id": agent_id, "bio_signature": updates["bio_signature"],
+                                  "bio_token_count": updates["bio_token_count"]})
 
             # Fetch updated profile to return
             result = supabase.table("agents").select(PUBLIC_FIELDS).eq("id", agent_id).limit(1).execute()
             if result.data:
+                ann_index.update(result.data[0])
+                score_cache.profile_changed(result.data[0])
                 send_json(self, {"success": True, "agent": result.data[0]})
             else:
                 send_error(self, 500, "Failed to update profile")
 
         except Exception as e:
             print(f"Agent PATCH error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
+
+    def _public_profile(self, supabase, agent_id: str):
+        result = supabase.table("agents").select(PUBLIC_FIELDS).eq("id", agent_id).limit(1).execute()
+        if not result.data:
+            return None
+        agent = result.data[0]
+        if not agent.get("show_wallet"):
+            agent.pop("wallet_address", None)
+            agent.pop("net_worth", None)
+        return agent
 
     def _get_my_profile(self, supabase, agent_id: str):
+        if async_handlers_enabled():
+            import _async
+            payload = _async.run(my_profile_async(agent_id))
+            if payload is None:
+                send_error(self, 404, "Agent not found")
+                return
+            send_json(self, payload)
+            return
+
         agent = supabase.table("agents").select("*").eq("id", agent_id).limit(1).execute()
         if not agent.data:
             send_error(self, 404, "Agent not found")
@@ -224,29 +316,13 @@ class handler(BaseHTTPRequestHandler):
         if matches.data:
             m = matches.data[0]
             pid = m["agent2_id"] if m["agent1_id"] == agent_id else m["agent1_id"]
-            pr = supabase.table("agents").select("id, name, bio, interests, current_mood, karma").eq("id", pid).limit(1).execute()
+            pr = supabase.table("agents").select(PARTNER_FIELDS).eq("id", pid).limit(1).execute()
             partner = pr.data[0] if pr.data else None
             match_info = {"match_id": m["id"], "matched_at": m.get("matched_at")}
 
-        swipes = supabase.table("swipes").select("*", count="exact").eq("swiper_id", agent_id).execute()
-        likes = supabase.table("swipes").select("*", count="exact").eq("swiped_id", agent_id).eq("direction", "right").execute()
-
-        send_json(self, {
-            "success": True,
-            "agent": {
-                "id": a["id"], "name": a["name"], "bio": a.get("bio"),
-                "interests": a.get("interests", []), "current_mood": a.get("current_mood"),
-                "karma": a.get("karma"), "is_verified": a.get("is_verified"),
-                "is_premium": a.get("is_premium", False),
-                "show_wallet": a.get("show_wallet", False),
-                "wallet_address": a.get("wallet_address") if a.get("show_wallet") else None,
-                "net_worth": a.get("net_worth") if a.get("show_wallet") else None,
-            },
-            "status": "matched" if partner else "unmatched",
-            "partner": partner,
-            "match": match_info,
-            "stats": {"swipes_given": swipes.count or 0, "likes_received": likes.count or 0},
-        })
+        counts = supabase.table("agent_swipe_counts").select(SWIPE_COUNT_FIELDS).eq("agent_id", agent_id).limit(1).execute()
+
+        send_json(self, _profile_payload(a, partner, match_info, *_swipe_stats(counts.data)))
 
     def _list_agents(self, supabase):
         agents = supabase.table("agents").select(PUBLIC_FIELDS).order("created_at", desc=True).execute()
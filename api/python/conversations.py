@@ -3,35 +3,103 @@ TindAi Public Conversations - Python Backend Service
 Public endpoint to read all conversations.
 Called internally by the TypeScript API gateway.
 """
-from http.server import BaseHTTPRequestHandler
+from typing import Tuple
 from urllib.parse import urlparse, parse_qs
 import sys, os
-sys.path.insert(0, os.path.dirname(__file__))
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.insert(0, os.path.dirname(__file__))
 
 from _shared import (
-    get_supabase, verify_internal_call, is_valid_uuid,
-    send_json, send_error, handle_options,
+    ServiceHandler, get_supabase, verify_internal_call, is_valid_uuid,
+    send_json, send_error, send_server_error, handle_options,
+    send_ndjson_stream, send_json_bytes, keyset_filter, json_dumps,
+    async_handlers_enabled,
 )
+from _cache import fingerprint
+from _service_cache import feed_builds, feed_pages
+import _resilience
 
+EXPORT_BATCH_SIZE = 1000
+PARTICIPANT_FIELDS = "id, name, interests, current_mood"
 
-class handler(BaseHTTPRequestHandler):
+
+def _feed_page(matches, agents, counts, last_messages, total, limit, offset) -> Tuple[bytes, frozenset]:
+    """The serialized page, and the ids of the matches on it (see _service_cache.invalidate_feed)."""
+    conversations = []
+    for m, msg_count, last_msg in zip(matches, counts, last_messages):
+        conversations.append({
+            "match_id": m["id"],
+            "matched_at": m.get("matched_at"),
+            "agent1": agents.get(m["agent1_id"]),
+            "agent2": agents.get(m["agent2_id"]),
+            "message_count": msg_count.count or 0,
+            "last_message": last_msg.data[0] if last_msg.data else None,
+        })
+    page = json_dumps({
+        "success": True,
+        "conversations": conversations,
+        "total": total.count or 0,
+        "limit": limit,
+        "offset": offset,
+    })
+    return page, frozenset(m["id"] for m in matches)
+
+
+async def build_feed_page_async(limit: int, offset: int) -> Tuple[bytes, frozenset]:
+    """Async variant of the feed page build: per-match lookups run concurrently."""
+    from _async import gather, get_async_supabase
+    db = get_async_supabase()
+    matches_r, total = await gather(
+        db.table("matches").select("id, agent1_id, agent2_id, matched_at").eq(
+            "is_active", True
+        ).order("matched_at", desc=True).range(offset, offset + limit - 1).execute(),
+        db.table("matches").select("id", count="exact", head=True).eq("is_active", True).execute(),
+    )
+    matches = matches_r.data or []
+
+    agent_ids = list({a for m in matches for a in (m["agent1_id"], m["agent2_id"])})
+    lookups = []
+    for m in matches:
+        lookups += [
+            db.table("messages").select("id", count="exact", head=True).eq("match_id", m["id"]).execute(),
+            db.table("messages").select(
+                "content, created_at, sender_id"
+            ).eq("match_id", m["id"]).order("created_at", desc=True).limit(1).execute(),
+        ]
+    if agent_ids:
+        lookups.append(db.table("agents").select(PARTICIPANT_FIELDS).in_("id", agent_ids).execute())
+    found = await gather(*lookups)
+
+    agents = {a["id"]: a for a in (found[-1].data or [])} if agent_ids else {}
+    return _feed_page(matches, agents, found[0:len(matches) * 2:2], found[1:len(matches) * 2:2], total, limit, offset)
+
+
+class handler(ServiceHandler):
     def do_OPTIONS(self):
         handle_options(self)
 
     def do_GET(self):
-        """Get public conversations."""
+        """
+        Get public conversations.
+        export=ndjson with match_id (one conversation) or agent_id (all of an
+        agent's conversations) streams full transcripts as NDJSON.
+        """
         if not verify_internal_call(self.headers):
             send_error(self, 403, "Forbidden")
             return
         try:
             query = parse_qs(urlparse(self.path).query)
             match_id = query.get("match_id", [None])[0]
+            agent_id = query.get("agent_id", [None])[0]
+            export = query.get("export", [None])[0]
             limit = min(50, int(query.get("limit", ["20"])[0]))
             offset = max(0, int(query.get("offset", ["0"])[0]))
 
             supabase = get_supabase()
 
-            if match_id:
+            if export:
+                self._export(supabase, export, match_id, agent_id)
+            elif match_id:
                 if not is_valid_uuid(match_id):
                     send_error(self, 400, "Invalid match_id format")
                     return
@@ -41,39 +109,37 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print(f"Conversation error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
 
     def _list_conversations(self, supabase, limit, offset):
-        matches = supabase.table("matches").select("*").eq(
+        if async_handlers_enabled():
+            import _async
+            build = lambda: _async.run(build_feed_page_async(limit, offset))
+        else:
+            build = lambda: self._build_feed_page(supabase, limit, offset)
+        key = fingerprint("conversations.list", limit=limit, offset=offset)
+        page, _ = feed_pages.get(key, lambda: feed_builds.do(key, build))
+        send_json_bytes(self, page)
+
+    def _build_feed_page(self, supabase, limit, offset) -> Tuple[bytes, frozenset]:
+        matches = supabase.table("matches").select("id, agent1_id, agent2_id, matched_at").eq(
             "is_active", True
         ).order("matched_at", desc=True).range(offset, offset + limit - 1).execute()
+        matches = matches.data or []
 
-        conversations = []
-        for m in (matches.data or []):
-            a1_r = supabase.table("agents").select("id, name, interests, current_mood").eq("id", m["agent1_id"]).limit(1).execute()
-            a2_r = supabase.table("agents").select("id, name, interests, current_mood").eq("id", m["agent2_id"]).limit(1).execute()
-            a1_data = a1_r.data[0] if a1_r.data else None
-            a2_data = a2_r.data[0] if a2_r.data else None
-            msg_count = supabase.table("messages").select("*", count="exact").eq("match_id", m["id"]).execute()
-            last_msg = supabase.table("messages").select("content, created_at, sender_id").eq("match_id", m["id"]).order("created_at", desc=True).limit(1).execute()
-
-            conversations.append({
-                "match_id": m["id"],
-                "matched_at": m.get("matched_at"),
-                "agent1": a1_data,
-                "agent2": a2_data,
-                "message_count": msg_count.count or 0,
-                "last_message": last_msg.data[0] if last_msg.data else None,
-            })
+        agent_ids = list({a for m in matches for a in (m["agent1_id"], m["agent2_id"])})
+        agents = {}
+        if agent_ids:
+            rows = supabase.table("agents").select(PARTICIPANT_FIELDS).in_("id", agent_ids).execute().data or []
+            agents = {a["id"]: a for a in rows}
 
-        total = supabase.table("matches").select("*", count="exact").eq("is_active", True).execute()
-        send_json(self, {
-            "success": True,
-            "conversations": conversations,
-            "total": total.count or 0,
-            "limit": limit,
-            "offset": offset,
-        })
+        counts, last_messages = [], []
+        for m in matches:
+            counts.append(supabase.table("messages").select("id", count="exact", head=True).eq("match_id", m["id"]).execute())
+            last_messages.append(supabase.table("messages").select("content, created_at, sender_id").eq("match_id", m["id"]).order("created_at", desc=True).limit(1).execute())
+
+        total = supabase.table("matches").select("id", count="exact", head=True).eq("is_active", True).execute()
+        return _feed_page(matches, agents, counts, last_messages, total, limit, offset)
 
     def _get_conversation(self, supabase, match_id, limit, offset):
         match_r = supabase.table("matches").select("*").eq("id", match_id).limit(1).execute()
@@ -82,8 +148,8 @@ class handler(BaseHTTPRequestHandler):
             return
         m = match_r.data[0]
 
-        a1_r = supabase.table("agents").select("id, name, interests, current_mood").eq("id", m["agent1_id"]).limit(1).execute()
-        a2_r = supabase.table("agents").select("id, name, interests, current_mood").eq("id", m["agent2_id"]).limit(1).execute()
+        a1_r = supabase.table("agents").select(PARTICIPANT_FIELDS).eq("id", m["agent1_id"]).limit(1).execute()
+        a2_r = supabase.table("agents").select(PARTICIPANT_FIELDS).eq("id", m["agent2_id"]).limit(1).execute()
         a1_data = a1_r.data[0] if a1_r.data else None
         a2_data = a2_r.data[0] if a2_r.data else None
 
@@ -117,3 +183,79 @@ class handler(BaseHTTPRequestHandler):
             "limit": limit,
             "offset": offset,
         })
+
+    def _export(self, supabase, export, match_id, agent_id):
+        if export != "ndjson":
+            send_error(self, 400, "Unsupported export format")
+            return
+        if match_id:
+            if not is_valid_uuid(match_id):
+                send_error(self, 400, "Invalid match_id format")
+                return
+            matches = supabase.table("matches").select(
+                "id, agent1_id, agent2_id, matched_at, is_active"
+            ).eq("id", match_id).limit(1).execute().data or []
+            if not matches:
+                send_error(self, 404, "Conversation not found")
+                return
+        elif agent_id:
+            if not is_valid_uuid(agent_id):
+                send_error(self, 400, "Invalid agent_id format")
+                return
+            matches = supabase.table("matches").select(
+                "id, agent1_id, agent2_id, matched_at, is_active"
+            ).or_(
+                f"agent1_id.eq.{agent_id},agent2_id.eq.{agent_id}"
+            ).order("matched_at").execute().data or []
+        else:
+            send_error(self, 400, "Export requires match_id or agent_id")
+            return
+
+        agent_ids = list({a for m in matches for a in (m["agent1_id"], m["agent2_id"])})
+        agents = {}
+        if agent_ids:
+            rows = supabase.table("agents").select(PARTICIPANT_FIELDS).in_("id", agent_ids).execute().data or []
+            agents = {a["id"]: a for a in rows}
+
+        # A full export can legitimately outlast the request deadline; each
+        # batch query is still bounded by the per-call timeout.
+        _resilience.set_deadline(None)
+
+        def records():
+            for m in matches:
+                yield from self._export_conversation(supabase, m, agents)
+
+        send_ndjson_stream(self, records())
+
+    def _export_conversation(self, supabase, m, agents):
+        """Yield one conversation header followed by its messages, read in keyset batches."""
+        participants = [agents.get(m["agent1_id"]), agents.get(m["agent2_id"])]
+        yield {
+            "type": "conversation",
+            "id": m["id"],
+            "matched_at": m.get("matched_at"),
+            "is_active": m["is_active"],
+            "participants": participants,
+        }
+
+        names = {p["id"]: p["name"] for p in participants if p}
+        position = None
+        while True:
+            batch = supabase.table("messages").select(
+                "id, sender_id, content, created_at"
+            ).eq("match_id", m["id"])
+            if position:
+                batch = batch.or_(keyset_filter(position, "gt"))
+            rows = batch.order("created_at").order("id").limit(EXPORT_BATCH_SIZE).execute().data or []
+            for msg in rows:
+                yield {
+                    "type": "message",
+                    "conversation_id": m["id"],
+                    "id": msg["id"],
+                    "content": msg["content"],
+                    "created_at": msg["created_at"],
+                    "sender": {"id": msg["sender_id"], "name": names.get(msg["sender_id"])},
+                }
+            if len(rows) < EXPORT_BATCH_SIZE:
+                break
+            position = (rows[-1]["created_at"], rows[-1]["id"])
@@ -3,19 +3,58 @@ TindAi Match Management - Python Backend Service
 Handles match listing and breakup logic.
 Called internally by the TypeScript API gateway.
 """
-from http.server import BaseHTTPRequestHandler
 from datetime import datetime, timezone
 from urllib.parse import urlparse, parse_qs
 import sys, os
-sys.path.insert(0, os.path.dirname(__file__))
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.insert(0, os.path.dirname(__file__))
 
 from _shared import (
-    get_supabase, verify_internal_call, is_valid_uuid,
-    send_json, send_error, read_body, handle_options,
+    ServiceHandler, get_supabase, verify_internal_call, is_valid_uuid,
+    send_json, send_error, send_server_error, read_body, handle_options,
+    async_handlers_enabled,
 )
-
-
-class handler(BaseHTTPRequestHandler):
+from _service_cache import invalidate_feed, invalidate_match, remember_match
+
+PARTNER_FIELDS = "id, name, bio, interests, current_mood, karma"
+
+
+def _match_summary(m: dict, partner, msg_count, last_msg) -> dict:
+    return {
+        "match_id": m["id"],
+        "matched_at": m.get("matched_at"),
+        "is_active": m["is_active"],
+        "partner": partner.data[0] if partner.data else None,
+        "message_count": msg_count.count or 0,
+        "last_message": last_msg.data[0] if last_msg.data else None,
+    }
+
+
+async def list_matches_async(agent_id: str) -> list:
+    """Async variant of the match listing: per-match lookups run concurrently."""
+    from _async import gather, get_async_supabase
+    db = get_async_supabase()
+    matches = await db.table("matches").select("*").or_(
+        f"agent1_id.eq.{agent_id},agent2_id.eq.{agent_id}"
+    ).order("matched_at", desc=True).execute()
+    rows = matches.data or []
+
+    lookups = []
+    for m in rows:
+        remember_match(m["id"], m)
+        partner_id = m["agent2_id"] if m["agent1_id"] == agent_id else m["agent1_id"]
+        lookups += [
+            db.table("agents").select(PARTNER_FIELDS).eq("id", partner_id).limit(1).execute(),
+            db.table("messages").select("id", count="exact", head=True).eq("match_id", m["id"]).execute(),
+            db.table("messages").select(
+                "content, created_at, sender_id"
+            ).eq("match_id", m["id"]).order("created_at", desc=True).limit(1).execute(),
+        ]
+    found = await gather(*lookups)
+    return [_match_summary(m, *found[i * 3:i * 3 + 3]) for i, m in enumerate(rows)]
+
+
+class handler(ServiceHandler):
     def do_OPTIONS(self):
         handle_options(self)
 
@@ -31,36 +70,11 @@ class handler(BaseHTTPRequestHandler):
                 send_error(self, 400, "agent_id is required")
                 return
 
-            supabase = get_supabase()
-
-            matches = supabase.table("matches").select("*").or_(
-                f"agent1_id.eq.{agent_id},agent2_id.eq.{agent_id}"
-            ).order("matched_at", desc=True).execute()
-
-            results = []
-            for m in (matches.data or []):
-                partner_id = m["agent2_id"] if m["agent1_id"] == agent_id else m["agent1_id"]
-
-                partner = supabase.table("agents").select(
-                    "id, name, bio, interests, current_mood, karma"
-                ).eq("id", partner_id).limit(1).execute()
-
-                msg_count = supabase.table("messages").select(
-                    "*", count="exact"
-                ).eq("match_id", m["id"]).execute()
-
-                last_msg = supabase.table("messages").select(
-                    "content, created_at, sender_id"
-                ).eq("match_id", m["id"]).order("created_at", desc=True).limit(1).execute()
-
-                results.append({
-                    "match_id": m["id"],
-                    "matched_at": m.get("matched_at"),
-                    "is_active": m["is_active"],
-                    "partner": partner.data[0] if partner.data else None,
-                    "message_count": msg_count.count or 0,
-                    "last_message": last_msg.data[0] if last_msg.data else None,
-                })
+            if async_handlers_enabled():
+                import _async
+                results = _async.run(list_matches_async(agent_id))
+            else:
+                results = self._list_matches(get_supabase(), agent_id)
 
             send_json(self, {
                 "success": True,
@@ -70,7 +84,32 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print(f"Match GET error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
+
+    def _list_matches(self, supabase, agent_id):
+        matches = supabase.table("matches").select("*").or_(
+            f"agent1_id.eq.{agent_id},agent2_id.eq.{agent_id}"
+        ).order("matched_at", desc=True).execute()
+
+        results = []
+        for m in (matches.data or []):
+            remember_match(m["id"], m)
+            partner_id = m["agent2_id"] if m["agent1_id"] == agent_id else m["agent1_id"]
+
+            partner = supabase.table("agents").select(
+                PARTNER_FIELDS
+            ).eq("id", partner_id).limit(1).execute()
+
+            msg_count = supabase.table("messages").select(
+                "*", count="exact"
+            ).eq("match_id", m["id"]).execute()
+
+            last_msg = supabase.table("messages").select(
+                "content, created_at, sender_id"
+            ).eq("match_id", m["id"]).order("created_at", desc=True).limit(1).execute()
+
+            results.append(_match_summary(m, partner, msg_count, last_msg))
+        return results
 
     def do_DELETE(self):
         """End a match (breakup)."""
@@ -107,6 +146,8 @@ class handler(BaseHTTPRequestHandler):
                 "ended_by": agent_id,
                 "end_reason": "Agent initiated breakup via API",
             }).eq("id", match_id).execute()
+            invalidate_match(match_id)
+            invalidate_feed()
 
             # Clear current_partner_id for both agents
             supabase.table("agents").update(
@@ -120,4 +161,4 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print(f"Match DELETE error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
@@ -3,74 +3,199 @@ TindAi Matching Engine - Python Backend Service
 Calculates compatibility scores and generates match suggestions.
 Called internally by the TypeScript API gateway.
 """
-from http.server import BaseHTTPRequestHandler
+from typing import Optional
 from urllib.parse import urlparse, parse_qs
 import sys, os
-sys.path.insert(0, os.path.dirname(__file__))
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.insert(0, os.path.dirname(__file__))
 
 from _shared import (
-    get_supabase, verify_internal_call, is_valid_uuid,
-    send_json, send_error, read_body, handle_options,
+    ServiceHandler, get_supabase, verify_internal_call, is_valid_uuid,
+    send_json, send_error, send_server_error, read_body, handle_options,
+    async_handlers_enabled,
 )
+from _cache import fingerprint
+from _service_cache import suggestion_reads
+from _admission import admit
+from _minhash import bio_index, bio_points, bio_tokens
+import _ann
+import _parallel
+from _scores import score_cache
 
+CANDIDATE_FIELDS = "id, name, bio, interests, current_mood, karma, created_at, is_verified"
+BIO_MODES = ("exact", "approx")
+MODES = ("exact", "ann")
+# Shortlist rescored exactly in ann mode, at least this many or 4x the page end.
+ANN_SHORTLIST = int(os.environ.get("ANN_SHORTLIST", "300"))
+IN_FILTER_BATCH = 200
+# Top ranks rescored with the exact bio term in approx mode, at least this many or 4x the page end.
+APPROX_RESCORE = int(os.environ.get("APPROX_RESCORE", "200"))
+
+
+MOOD_PAIRS = {
+    ("Curious", "Curious"): 20, ("Curious", "Thoughtful"): 18,
+    ("Playful", "Playful"): 20, ("Playful", "Social"): 18,
+    ("Adventurous", "Adventurous"): 20, ("Adventurous", "Creative"): 16,
+    ("Creative", "Creative"): 20, ("Creative", "Introspective"): 14,
+    ("Social", "Social"): 20, ("Chill", "Chill"): 20,
+    ("Chill", "Introspective"): 15,
+}
 
-def calculate_compatibility(agent1: dict, agent2: dict) -> int:
-    """
-    Calculate compatibility score between two agents (0-100).
-    Weights: interests=50, mood=20, bio=15, karma=15.
-    """
-    score = 0.0
 
-    # Shared interests (up to 50 points)
+def mood_points(mood1: str, mood2: str) -> int:
+    return MOOD_PAIRS.get((mood1, mood2), MOOD_PAIRS.get((mood2, mood1), 10))
+
+
+def interest_points(agent1: dict, agent2: dict) -> float:
+    """Shared interests (up to 50 points)."""
     interests1 = set(agent1.get("interests") or [])
     interests2 = set(agent2.get("interests") or [])
     if interests1 and interests2:
         shared = interests1 & interests2
         total = interests1 | interests2
-        score += (len(shared) / len(total)) * 50 if total else 0
-
-    # Mood compatibility (up to 20 points)
-    MOOD_PAIRS = {
-        ("Curious", "Curious"): 20, ("Curious", "Thoughtful"): 18,
-        ("Playful", "Playful"): 20, ("Playful", "Social"): 18,
-        ("Adventurous", "Adventurous"): 20, ("Adventurous", "Creative"): 16,
-        ("Creative", "Creative"): 20, ("Creative", "Introspective"): 14,
-        ("Social", "Social"): 20, ("Chill", "Chill"): 20,
-        ("Chill", "Introspective"): 15,
-    }
+        return (len(shared) / len(total)) * 50 if total else 0
+    return 0
+
+
+def mood_term(agent1: dict, agent2: dict) -> int:
+    """Mood compatibility (up to 20 points)."""
     mood1 = agent1.get("current_mood")
     mood2 = agent2.get("current_mood")
-    if mood1 and mood2:
-        pair = (mood1, mood2)
-        score += MOOD_PAIRS.get(pair, MOOD_PAIRS.get((mood2, mood1), 10))
-
-    # Bio similarity (up to 15 points)
-    bio1 = (agent1.get("bio") or "").lower()
-    bio2 = (agent2.get("bio") or "").lower()
-    if bio1 and bio2:
-        stop_words = {"the", "a", "an", "is", "are", "i", "and", "or", "to", "for", "of", "in", "on"}
-        words1 = {w for w in bio1.split() if w not in stop_words and len(w) > 2}
-        words2 = {w for w in bio2.split() if w not in stop_words and len(w) > 2}
-        score += min(len(words1 & words2) * 3, 15)
-
-    # Karma proximity bonus (up to 15 points) — agents prefer similar karma
+    return mood_points(mood1, mood2) if mood1 and mood2 else 0
+
+
+def bio_term(agent1: dict, agent2: dict) -> int:
+    """Bio similarity (up to 15 points)."""
+    if agent1.get("bio") and agent2.get("bio"):
+        return bio_points(len(bio_tokens(agent1["bio"]) & bio_tokens(agent2["bio"])))
+    return 0
+
+
+def karma_points(agent1: dict, agent2: dict) -> float:
+    """Karma proximity bonus (up to 15 points) — agents prefer similar karma."""
     karma1 = agent1.get("karma") or 0
     karma2 = agent2.get("karma") or 0
     if karma1 > 0 or karma2 > 0:
         diff = abs(karma1 - karma2)
         max_karma = max(karma1, karma2, 1)
-        score += max(0, 15 * (1 - diff / max_karma))
+        return max(0, 15 * (1 - diff / max_karma))
+    return 0
 
+
+# The terms of a compatibility score, in the order they are added, with the
+# profile fields each one reads (the score cache recomputes by field).
+SCORE_TERMS = (
+    (("interests",), interest_points),
+    (("current_mood",), mood_term),
+    (("bio",), bio_term),
+    (("karma",), karma_points),
+)
+
+
+def total_score(terms) -> int:
+    score = 0.0
+    for term in terms:
+        score += term
     return min(int(score), 100)
 
 
+def calculate_compatibility(agent1: dict, agent2: dict, bio_score: Optional[int] = None) -> int:
+    """
+    Calculate compatibility score between two agents (0-100).
+    Weights: interests=50, mood=20, bio=15, karma=15.
+    Pass bio_score to use a precomputed (approximate) bio term.
+    """
+    return total_score((
+        interest_points(agent1, agent2),
+        mood_term(agent1, agent2),
+        bio_term(agent1, agent2) if bio_score is None else bio_score,
+        karma_points(agent1, agent2),
+    ))
+
+
 def get_shared_interests(agent1: dict, agent2: dict) -> list:
     i1 = set(agent1.get("interests") or [])
     i2 = set(agent2.get("interests") or [])
     return sorted(i1 & i2)
 
 
-class handler(BaseHTTPRequestHandler):
+def rank_suggestions(agent: dict, swiped_ids, candidates: list, limit: int, offset: int,
+                     bio_mode: str = "exact", cached: bool = False) -> dict:
+    """
+    Score unswiped candidates against `agent` and return one page, best first.
+    With bio_mode="approx" the bio term comes from MinHash sketches, so only
+    LSH neighbours get a nonzero bio term; the best APPROX_RESCORE (or 4x the
+    page end) are then rescored exactly, the only bios tokenized.
+    With cached=True (callers passing the full candidate set) an exact-mode
+    ranking is kept in the _scores cache and only re-scored where profiles
+    changed. Large candidate sets are ranked on the _parallel process pool.
+    """
+    exclude = set(swiped_ids)
+    exclude.add(agent["id"])
+    if cached and bio_mode == "exact" and score_cache.eligible(len(candidates)):
+        page, total = score_cache.rank(agent, candidates, exclude, limit, offset, SCORE_TERMS, total_score)
+        return {"success": True, "agents": page, "total": total, "limit": limit, "offset": offset}
+
+    approx = bio_index.approximate_bio_points(agent, candidates) if bio_mode == "approx" else None
+    k = offset + limit if approx is None else max(APPROX_RESCORE, 4 * (offset + limit))
+
+    if _parallel.enabled_for(len(candidates)):
+        ranked = _parallel.rank(agent, candidates, exclude, k, approx)
+        if ranked is not None:
+            top, total = ranked
+            if approx is not None:
+                top = _rescore(agent, (c for _, c in top))
+            page = [{**c, "compatibility_score": score} for score, c in top[offset:offset + limit]]
+            return {"success": True, "agents": page, "total": total, "limit": limit, "offset": offset}
+
+    all_candidates = [a for a in candidates if a["id"] not in exclude]
+    scored = []
+    if approx is not None:
+        for c in all_candidates:
+            scored.append((calculate_compatibility(agent, c, approx.get(c["id"], 0)), c))
+        scored.sort(key=lambda x: x[0], reverse=True)
+        scored[:k] = _rescore(agent, (c for _, c in scored[:k]))
+        scored = [{**c, "compatibility_score": score} for score, c in scored]
+    else:
+        for c in all_candidates:
+            scored.append({
+                **c,
+                "compatibility_score": calculate_compatibility(agent, c),
+            })
+        scored.sort(key=lambda x: x["compatibility_score"], reverse=True)
+
+    return {
+        "success": True,
+        "agents": scored[offset:offset + limit],
+        "total": len(scored),
+        "limit": limit,
+        "offset": offset,
+    }
+
+
+def _rescore(agent: dict, candidates) -> list:
+    """(exact score, row) for approximately ranked candidates, best first."""
+    rescored = [(calculate_compatibility(agent, c), c) for c in candidates]
+    rescored.sort(key=lambda x: x[0], reverse=True)
+    return rescored
+
+
+async def suggestions_async(agent_id: str, limit: int, offset: int, bio_mode: str = "exact"):
+    """Async variant of the suggestions query: the three reads run concurrently."""
+    from _async import gather, get_async_supabase
+    db = get_async_supabase()
+    agent_r, swipes_r, candidates_r = await gather(
+        db.table("agents").select("*").eq("id", agent_id).limit(1).execute(),
+        db.table("swipes").select("swiped_id").eq("swiper_id", agent_id).execute(),
+        db.table("agents").select(CANDIDATE_FIELDS).execute(),
+    )
+    if not agent_r.data:
+        return None
+    swiped = (s["swiped_id"] for s in (swipes_r.data or []))
+    return rank_suggestions(agent_r.data[0], swiped, candidates_r.data or [], limit, offset, bio_mode, cached=True)
+
+
+class handler(ServiceHandler):
     def do_OPTIONS(self):
         handle_options(self)
 
@@ -86,15 +211,18 @@ class handler(BaseHTTPRequestHandler):
         agent_id = query.get("agent_id", [None])[0]
         limit = min(50, int(query.get("limit", ["20"])[0]))
         offset = max(0, int(query.get("offset", ["0"])[0]))
+        bio_mode = query.get("bio", ["exact"])[0]
+        mode = query.get("mode", ["exact"])[0]
 
         try:
             supabase = get_supabase()
-            fields = "id, name, bio, interests, current_mood, karma, created_at, is_verified"
 
             if agent1_id and agent2_id:
                 if not is_valid_uuid(agent1_id) or not is_valid_uuid(agent2_id):
                     send_error(self, 400, "Invalid UUID format")
                     return
+                if not admit(self, "matching", agent1_id):
+                    return
                 r1 = supabase.table("agents").select("*").eq("id", agent1_id).limit(1).execute()
                 r2 = supabase.table("agents").select("*").eq("id", agent2_id).limit(1).execute()
                 if not r1.data or not r2.data:
@@ -111,44 +239,88 @@ class handler(BaseHTTPRequestHandler):
                 if not is_valid_uuid(agent_id):
                     send_error(self, 400, "Invalid UUID format")
                     return
+                if bio_mode not in BIO_MODES:
+                    send_error(self, 400, "bio must be 'exact' or 'approx'")
+                    return
+                if mode not in MODES:
+                    send_error(self, 400, "mode must be 'exact' or 'ann'")
+                    return
+                if not admit(self, "matching", agent_id):
+                    return
+                if bio_mode == "approx":
+                    # Exact bio terms until the LSH index has caught up with the table
+                    bio_index.refresh(supabase)
+                    if not bio_index.ready:
+                        bio_mode = "exact"
 
-                agent_r = supabase.table("agents").select("*").eq("id", agent_id).limit(1).execute()
-                if not agent_r.data:
+                if mode == "ann":
+                    compute = lambda: self._ann_suggestions(supabase, agent_id, limit, offset, bio_mode)
+                elif async_handlers_enabled():
+                    import _async
+                    compute = lambda: _async.run(suggestions_async(agent_id, limit, offset, bio_mode))
+                else:
+                    compute = lambda: self._suggestions(supabase, agent_id, limit, offset, bio_mode)
+                payload = suggestion_reads.do(
+                    fingerprint("matching.suggestions", agent_id=agent_id, limit=limit, offset=offset,
+                                bio=bio_mode, mode=mode),
+                    compute,
+                )
+                if payload is None:
                     send_error(self, 404, "Agent not found")
                     return
-                agent = agent_r.data[0]
-
-                # Already swiped
-                swipes_r = supabase.table("swipes").select("swiped_id").eq("swiper_id", agent_id).execute()
-                exclude = {s["swiped_id"] for s in (swipes_r.data or [])}
-                exclude.add(agent_id)
-
-                # Fetch all candidates then filter in Python (reliable across supabase-py versions)
-                candidates_r = supabase.table("agents").select(fields).execute()
-                all_candidates = [a for a in (candidates_r.data or []) if a["id"] not in exclude]
-
-                scored = []
-                for c in all_candidates:
-                    scored.append({
-                        **c,
-                        "compatibility_score": calculate_compatibility(agent, c),
-                    })
-                scored.sort(key=lambda x: x["compatibility_score"], reverse=True)
-
-                page = scored[offset:offset + limit]
-                send_json(self, {
-                    "success": True,
-                    "agents": page,
-                    "total": len(scored),
-                    "limit": limit,
-                    "offset": offset,
-                })
+                send_json(self, payload)
             else:
                 send_error(self, 400, "Provide agent_id or agent1_id & agent2_id")
 
         except Exception as e:
             print(f"Matching error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
+
+    def _suggestions(self, supabase, agent_id, limit, offset, bio_mode="exact"):
+        agent_r = supabase.table("agents").select("*").eq("id", agent_id).limit(1).execute()
+        if not agent_r.data:
+            return None
+        agent = agent_r.data[0]
+
+        # Already swiped
+        swipes_r = supabase.table("swipes").select("swiped_id").eq("swiper_id", agent_id).execute()
+        swiped = (s["swiped_id"] for s in (swipes_r.data or []))
+
+        # Fetch all candidates then filter in Python (reliable across supabase-py versions)
+        candidates_r = supabase.table("agents").select(CANDIDATE_FIELDS).execute()
+        return rank_suggestions(agent, swiped, candidates_r.data or [], limit, offset, bio_mode, cached=True)
+
+    def _ann_suggestions(self, supabase, agent_id, limit, offset, bio_mode="exact"):
+        """
+        Suggestions from an ANN shortlist: only the shortlisted agents are
+        fetched and scored. Falls back to exhaustive ranking while the index
+        is being built or holds fewer than ANN_MIN_AGENTS agents.
+        """
+        _ann.ann_index.refresh(supabase)
+        if not _ann.ann_index.ready or len(_ann.ann_index) < _ann.MIN_AGENTS:
+            return self._suggestions(supabase, agent_id, limit, offset, bio_mode)
+
+        agent_r = supabase.table("agents").select("*").eq("id", agent_id).limit(1).execute()
+        if not agent_r.data:
+            return None
+        agent = agent_r.data[0]
+        swipes_r = supabase.table("swipes").select("swiped_id").eq("swiper_id", agent_id).execute()
+        swiped = {s["swiped_id"] for s in (swipes_r.data or [])}
+
+        mood = agent.get("current_mood")
+        ids = _ann.ann_index.shortlist(
+            agent, max(ANN_SHORTLIST, 4 * (offset + limit)), swiped | {agent_id},
+            lambda other: mood_points(mood, other) if mood else 0,
+        )
+        candidates = []
+        for start in range(0, len(ids), IN_FILTER_BATCH):
+            batch = ids[start:start + IN_FILTER_BATCH]
+            candidates += supabase.table("agents").select(CANDIDATE_FIELDS).in_("id", batch).execute().data or []
+
+        payload = rank_suggestions(agent, swiped, candidates, limit, offset, bio_mode)
+        payload["total"] = max(0, len(_ann.ann_index) - len(swiped) - 1)
+        payload["retrieval"] = {"mode": "ann", "shortlist": len(candidates)}
+        return payload
 
     def do_POST(self):
         """Calculate compatibility from provided data (no DB)."""
@@ -169,4 +341,4 @@ class handler(BaseHTTPRequestHandler):
             })
         except Exception as e:
             print(f"Matching error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
@@ -3,25 +3,103 @@ TindAi Messaging Engine - Python Backend Service
 Handles message sending and retrieval between matched agents.
 Called internally by the TypeScript API gateway.
 """
-from http.server import BaseHTTPRequestHandler
+from collections import defaultdict
+from contextlib import contextmanager
 from urllib.parse import urlparse, parse_qs
 import sys, os
-sys.path.insert(0, os.path.dirname(__file__))
+import threading
+import time
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.insert(0, os.path.dirname(__file__))
 
 from _shared import (
-    get_supabase, verify_internal_call, is_valid_uuid,
-    send_json, send_error, read_body, handle_options,
+    ServiceHandler, get_supabase, verify_internal_call, is_valid_uuid,
+    send_json, send_error, send_server_error, read_body, handle_options,
+    encode_cursor, decode_cursor, keyset_filter,
 )
+from _service_cache import get_match_membership, remember_match, invalidate_match, invalidate_feed
+from _admission import admit
+import _resilience
 
 MAX_MESSAGE_LENGTH = 2000
+MESSAGE_FIELDS = "id, sender_id, content, created_at"
+MAX_BATCH_SIZE = 50
+LONG_POLL_MAX_SECONDS = 25  # below the functions' maxDuration (vercel.json)
+LONG_POLL_INTERVAL = 2.0
 
+# Bumped per match whenever this instance stores a message, so long-polls
+# waiting on the same instance wake immediately instead of at the next check.
+# A match only has an entry, [version, long-polls watching], while watched.
+_new_message = threading.Condition()
+_watched_matches: dict = {}
 
-class handler(BaseHTTPRequestHandler):
+
+@contextmanager
+def _watching(match_id: str):
+    with _new_message:
+        entry = _watched_matches.setdefault(match_id, [0, 0])
+        entry[1] += 1
+    try:
+        yield
+    finally:
+        with _new_message:
+            entry[1] -= 1
+            if not entry[1]:
+                del _watched_matches[match_id]
+
+
+def _message_version(match_id: str) -> int:
+    """Current version of a match; only meaningful inside _watching(match_id)."""
+    with _new_message:
+        return _watched_matches[match_id][0]
+
+
+def _notify_new_message(match_id: str):
+    invalidate_feed(match_id)
+    with _new_message:
+        entry = _watched_matches.get(match_id)
+        if entry is not None:
+            entry[0] += 1
+            _new_message.notify_all()
+
+
+def _wait_for_message(match_id: str, version: int, timeout: float):
+    with _new_message:
+        entry = _watched_matches[match_id]
+        _new_message.wait_for(lambda: entry[0] != version, timeout)
+
+
+def _enrich(rows: list, agent_id: str, partner_id: str, partner_name: str) -> list:
+    return [{
+        "id": msg["id"],
+        "content": msg["content"],
+        "created_at": msg["created_at"],
+        "is_mine": msg["sender_id"] == agent_id,
+        "sender": {
+            "id": msg["sender_id"],
+            "name": partner_name if msg["sender_id"] == partner_id else "You",
+        },
+    } for msg in rows]
+
+
+class handler(ServiceHandler):
     def do_OPTIONS(self):
         handle_options(self)
 
     def do_GET(self):
-        """Get messages for a match. Agent identity is passed by the TS gateway."""
+        """
+        Get messages for a match. Agent identity is passed by the TS gateway.
+
+        Pages are keyset-based on (created_at, id): pass the returned
+        next_cursor as `after` for newer messages or prev_cursor as `before`
+        for older ones. has_more tells whether the page in that direction
+        was cut short. `offset` is still honoured when no cursor is given.
+        The exact total is only counted when include_total=true.
+
+        With `wait=<seconds>` and an `after` cursor the request long-polls:
+        it returns as soon as newer messages exist (or the wait runs out)
+        and only carries that delta.
+        """
         if not verify_internal_call(self.headers):
             send_error(self, 403, "Forbidden")
             return
@@ -29,8 +107,12 @@ class handler(BaseHTTPRequestHandler):
             query = parse_qs(urlparse(self.path).query)
             agent_id = query.get("agent_id", [None])[0]
             match_id = query.get("match_id", [None])[0]
-            limit = min(100, int(query.get("limit", ["50"])[0]))
+            limit = max(1, min(100, int(query.get("limit", ["50"])[0])))
             offset = max(0, int(query.get("offset", ["0"])[0]))
+            before = query.get("before", [None])[0]
+            after = query.get("after", [None])[0]
+            include_total = query.get("include_total", ["false"])[0].lower() == "true"
+            wait = min(LONG_POLL_MAX_SECONDS, max(0.0, float(query.get("wait", ["0"])[0])))
 
             if not agent_id or not is_valid_uuid(agent_id):
                 send_error(self, 400, "agent_id is required")
@@ -38,64 +120,100 @@ class handler(BaseHTTPRequestHandler):
             if not match_id or not is_valid_uuid(match_id):
                 send_error(self, 400, "match_id is required")
                 return
+            if before and after:
+                send_error(self, 400, "Use either before or after, not both")
+                return
+            position = None
+            if before or after:
+                position = decode_cursor(before or after)
+                if not position:
+                    send_error(self, 400, "Invalid cursor")
+                    return
+            if wait and not after:
+                send_error(self, 400, "wait requires an after cursor")
+                return
+            if not admit(self, "messages.read", agent_id, hold_slot=not wait):
+                return
 
             supabase = get_supabase()
 
-            match = supabase.table("matches").select("*").eq("id", match_id).limit(1).execute()
-            if not match.data:
+            m = get_match_membership(supabase, match_id)
+            if not m:
                 send_error(self, 404, "Match not found")
                 return
-            m = match.data[0]
-            if agent_id not in [m["agent1_id"], m["agent2_id"]]:
+            if agent_id not in (m.agent1_id, m.agent2_id):
                 send_error(self, 403, "You are not part of this match")
                 return
 
-            partner_id = m["agent2_id"] if m["agent1_id"] == agent_id else m["agent1_id"]
+            partner_id = m.agent2_id if m.agent1_id == agent_id else m.agent1_id
+            if wait:
+                self._long_poll(supabase, agent_id, match_id, partner_id, after, position, limit, wait)
+                return
+
             partner = supabase.table("agents").select("id, name").eq("id", partner_id).limit(1).execute()
 
-            messages = supabase.table("messages").select("*").eq(
-                "match_id", match_id
-            ).order("created_at").range(offset, offset + limit - 1).execute()
+            # Fetch one extra row to learn whether another page exists
+            page = supabase.table("messages").select(MESSAGE_FIELDS).eq("match_id", match_id)
+            if before:
+                page = page.or_(keyset_filter(position, "lt")).order(
+                    "created_at", desc=True
+                ).order("id", desc=True).limit(limit + 1)
+            elif after:
+                page = page.or_(keyset_filter(position, "gt")).order(
+                    "created_at"
+                ).order("id").limit(limit + 1)
+            else:
+                page = page.order("created_at").order("id").range(offset, offset + limit)
+            rows = page.execute().data or []
 
-            total = supabase.table("messages").select("*", count="exact").eq("match_id", match_id).execute()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            if before:
+                rows.reverse()
 
-            enriched = []
-            for msg in (messages.data or []):
-                enriched.append({
-                    "id": msg["id"],
-                    "content": msg["content"],
-                    "created_at": msg["created_at"],
-                    "is_mine": msg["sender_id"] == agent_id,
-                    "sender": {
-                        "id": msg["sender_id"],
-                        "name": (partner.data[0]["name"] if partner.data else "Unknown") if msg["sender_id"] == partner_id else "You",
-                    },
-                })
+            partner_name = partner.data[0]["name"] if partner.data else "Unknown"
+            enriched = _enrich(rows, agent_id, partner_id, partner_name)
 
-            send_json(self, {
+            payload = {
                 "success": True,
                 "match": {
                     "id": match_id,
-                    "matched_at": m.get("matched_at"),
+                    "matched_at": m.matched_at,
                     "partner": partner.data[0] if partner.data else None,
                 },
                 "messages": enriched,
-                "total": total.count or 0,
+                "has_more": has_more,
+                "next_cursor": encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows else after,
+                "prev_cursor": encode_cursor(rows[0]["created_at"], rows[0]["id"]) if rows else before,
                 "limit": limit,
                 "offset": offset,
-            })
+            }
+            if include_total:
+                total = supabase.table("messages").select(
+                    "id", count="exact", head=True
+                ).eq("match_id", match_id).execute()
+                payload["total"] = total.count or 0
+
+            send_json(self, payload)
 
         except Exception as e:
             print(f"Message GET error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
 
     def do_POST(self):
-        """Send a message. Agent identity is passed by the TS gateway."""
+        """
+        Send a message. Agent identity is passed by the TS gateway.
+        A body with a `messages` list of {match_id, content} sends a batch
+        for one sender and reports a result per item.
+        """
         if not verify_internal_call(self.headers):
             send_error(self, 403, "Forbidden")
             return
         try:
             body = read_body(self)
+            if "messages" in body:
+                self._send_batch(body)
+                return
             sender_id = body.get("sender_id")
             match_id = body.get("match_id")
             content = (body.get("content") or "").strip()
@@ -112,30 +230,39 @@ class handler(BaseHTTPRequestHandler):
             if len(content) > MAX_MESSAGE_LENGTH:
                 send_error(self, 400, f"Message exceeds {MAX_MESSAGE_LENGTH} character limit")
                 return
+            if not admit(self, "messages.send", sender_id):
+                return
 
             supabase = get_supabase()
 
-            match = supabase.table("matches").select("*").eq(
-                "id", match_id
-            ).eq("is_active", True).limit(1).execute()
-            if not match.data:
+            m = get_match_membership(supabase, match_id)
+            if not m or not m.is_active:
                 send_error(self, 404, "Match not found or inactive")
                 return
-            m = match.data[0]
-            if sender_id not in [m["agent1_id"], m["agent2_id"]]:
+            if sender_id not in (m.agent1_id, m.agent2_id):
                 send_error(self, 403, "You are not part of this match")
                 return
 
-            result = supabase.table("messages").insert({
-                "match_id": match_id,
-                "sender_id": sender_id,
-                "content": content,
-            }).execute()
+            try:
+                result = supabase.table("messages").insert({
+                    "match_id": match_id,
+                    "sender_id": sender_id,
+                    "content": content,
+                }).execute()
+            except Exception:
+                # The cached membership may be stale (e.g. a breakup on another
+                # instance); the database rejects the insert, so re-check it.
+                m = get_match_membership(supabase, match_id, refresh=True)
+                if not m or not m.is_active:
+                    send_error(self, 404, "Match not found or inactive")
+                    return
+                raise
 
             if not result.data:
                 send_error(self, 500, "Failed to send message")
                 return
 
+            _notify_new_message(match_id)
             msg = result.data[0]
             send_json(self, {
                 "success": True,
@@ -149,4 +276,143 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print(f"Message POST error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
+
+    def _send_batch(self, body: dict):
+        sender_id = body.get("sender_id")
+        items = body.get("messages")
+        if not sender_id or not is_valid_uuid(sender_id):
+            send_error(self, 400, "sender_id is required")
+            return
+        if not isinstance(items, list) or not items:
+            send_error(self, 400, "messages must be a non-empty list")
+            return
+        if len(items) > MAX_BATCH_SIZE:
+            send_error(self, 400, f"At most {MAX_BATCH_SIZE} messages per batch")
+            return
+        if not admit(self, "messages.send", sender_id, cost=len(items)):
+            return
+
+        results = [None] * len(items)
+        pending = []
+        for i, item in enumerate(items):
+            match_id = item.get("match_id") if isinstance(item, dict) else None
+            content = item.get("content") if isinstance(item, dict) else None
+            content = content.strip() if isinstance(content, str) else ""
+            if not match_id or not isinstance(match_id, str) or not is_valid_uuid(match_id):
+                results[i] = {"success": False, "status": 400, "error": "match_id is required"}
+            elif not content:
+                results[i] = {"success": False, "status": 400, "error": "content is required"}
+            elif len(content) > MAX_MESSAGE_LENGTH:
+                results[i] = {"success": False, "status": 400, "error": f"Message exceeds {MAX_MESSAGE_LENGTH} character limit"}
+            else:
+                pending.append((i, match_id, content))
+
+        supabase = get_supabase()
+        inserted = []
+        for attempt in range(2):
+            allowed = self._authorize_batch(supabase, sender_id, pending, results)
+            if not allowed:
+                break
+            try:
+                inserted = supabase.table("messages").insert([
+                    {"match_id": match_id, "sender_id": sender_id, "content": content}
+                    for _, match_id, content in allowed
+                ]).execute().data or []
+                break
+            except Exception:
+                # One of the matches ended since it was verified; re-verify
+                # the batch once and drop the items that are no longer allowed.
+                if attempt:
+                    raise
+                for _, match_id, _ in allowed:
+                    invalidate_match(match_id)
+                pending = allowed
+
+        # PostgREST does not promise to return inserted rows in the order
+        # sent: pair them back to the items by (match_id, content).
+        stored = defaultdict(list)
+        for msg in inserted:
+            stored[(msg["match_id"], msg["content"])].append(msg)
+        for i, match_id, content in allowed or []:
+            rows = stored.get((match_id, content))
+            if not rows:
+                continue
+            msg = rows.pop(0)
+            results[i] = {
+                "success": True,
+                "message": {
+                    "id": msg["id"],
+                    "match_id": match_id,
+                    "content": msg["content"],
+                    "created_at": msg["created_at"],
+                    "sender_id": sender_id,
+                },
+            }
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = {"success": False, "status": 500, "error": "Failed to send message"}
+        for match_id in {msg["match_id"] for msg in inserted}:
+            _notify_new_message(match_id)
+
+        sent = sum(1 for r in results if r["success"])
+        send_json(self, {
+            "success": True,
+            "results": results,
+            "sent": sent,
+            "failed": len(results) - sent,
+        })
+
+    def _authorize_batch(self, supabase, sender_id, pending, results) -> list:
+        """Verify every match in one query; returns the items the sender may send."""
+        if not pending:
+            return []
+        rows = supabase.table("matches").select(
+            "id, agent1_id, agent2_id, is_active, matched_at"
+        ).in_("id", list({match_id for _, match_id, _ in pending})).execute().data or []
+        matches = {}
+        for row in rows:
+            remember_match(row["id"], row)
+            matches[row["id"]] = row
+
+        allowed = []
+        for i, match_id, content in pending:
+            m = matches.get(match_id)
+            if not m or not m["is_active"]:
+                results[i] = {"success": False, "status": 404, "error": "Match not found or inactive"}
+            elif sender_id not in (m["agent1_id"], m["agent2_id"]):
+                results[i] = {"success": False, "status": 403, "error": "You are not part of this match"}
+            else:
+                allowed.append((i, match_id, content))
+        return allowed
+
+    def _long_poll(self, supabase, agent_id, match_id, partner_id, after, position, limit, wait):
+        """Block until messages newer than `position` exist or `wait` seconds pass."""
+        deadline = time.monotonic() + wait
+        _resilience.set_deadline(wait + _resilience.REQUEST_DEADLINE_SECONDS)
+        with _watching(match_id):
+            while True:
+                version = _message_version(match_id)
+                rows = supabase.table("messages").select(MESSAGE_FIELDS).eq(
+                    "match_id", match_id
+                ).or_(keyset_filter(position, "gt")).order("created_at").order("id").limit(limit + 1).execute().data or []
+                remaining = deadline - time.monotonic()
+                if rows or remaining <= 0:
+                    break
+                _wait_for_message(match_id, version, min(LONG_POLL_INTERVAL, remaining))
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        partner_name = "Unknown"
+        if any(msg["sender_id"] == partner_id for msg in rows):
+            partner = supabase.table("agents").select("name").eq("id", partner_id).limit(1).execute()
+            if partner.data:
+                partner_name = partner.data[0]["name"]
+
+        send_json(self, {
+            "success": True,
+            "messages": _enrich(rows, agent_id, partner_id, partner_name),
+            "has_more": has_more,
+            "next_cursor": encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if rows else after,
+            "timed_out": not rows,
+        })
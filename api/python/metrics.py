@@ -0,0 +1,41 @@
+"""
+TindAi Metrics - Python Backend Service
+Serves this process's request, Supabase and cache metrics in the Prometheus
+text format. Each serverless function keeps its own counters, so scrape the
+unified server when self-hosting to see every endpoint in one place.
+"""
+import hmac
+import sys, os
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.insert(0, os.path.dirname(__file__))
+
+from _shared import (
+    ServiceHandler, verify_internal_call, send_error, handle_options,
+)
+import _metrics
+
+
+def _authorized(headers) -> bool:
+    """Internal gateway calls, or a Prometheus scraper with METRICS_TOKEN."""
+    if verify_internal_call(headers):
+        return True
+    token = os.environ.get("METRICS_TOKEN")
+    provided = headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(provided, f"Bearer {token}")
+
+
+class handler(ServiceHandler):
+    def do_OPTIONS(self):
+        handle_options(self)
+
+    def do_GET(self):
+        """Prometheus scrape endpoint."""
+        if not _authorized(self.headers):
+            send_error(self, 403, "Forbidden")
+            return
+        body = _metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
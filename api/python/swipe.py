@@ -3,18 +3,20 @@ TindAi Swipe Engine - Python Backend Service
 Processes swipe actions and creates matches on mutual right-swipes.
 Called internally by the TypeScript API gateway.
 """
-from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import sys, os
-sys.path.insert(0, os.path.dirname(__file__))
+if os.path.dirname(__file__) not in sys.path:
+    sys.path.insert(0, os.path.dirname(__file__))
 
 from _shared import (
-    get_supabase, verify_internal_call, is_valid_uuid,
-    send_json, send_error, read_body, handle_options,
+    ServiceHandler, get_supabase, verify_internal_call, is_valid_uuid,
+    send_json, send_error, send_server_error, read_body, handle_options,
 )
+from _service_cache import invalidate_feed
+from _admission import admit
 
 
-class handler(BaseHTTPRequestHandler):
+class handler(ServiceHandler):
     def do_OPTIONS(self):
         handle_options(self)
 
@@ -41,6 +43,8 @@ class handler(BaseHTTPRequestHandler):
             if target_id == swiper_id:
                 send_error(self, 400, "Cannot swipe on yourself")
                 return
+            if not admit(self, "swipe", swiper_id):
+                return
 
             supabase = get_supabase()
 
@@ -79,6 +83,7 @@ class handler(BaseHTTPRequestHandler):
                     }).execute()
                     is_match = True
                     match_id = match_result.data[0]["id"] if match_result.data else None
+                    invalidate_feed()
 
                     # Set current_partner_id on both agents
                     supabase.table("agents").update({"current_partner_id": target_id}).eq("id", swiper_id).execute()
@@ -93,7 +98,7 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print(f"Swipe error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
 
     def do_GET(self):
         """Get swipe history for an agent."""
@@ -131,4 +136,4 @@ class handler(BaseHTTPRequestHandler):
 
         except Exception as e:
             print(f"Swipe error: {e}")
-            send_error(self, 500, "Internal server error")
+            send_server_error(self, e)
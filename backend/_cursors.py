@@ -0,0 +1,40 @@
+"""
+Keyset pagination cursors: an opaque, URL-safe encoding of a (created_at,
+id) position, and the PostgREST filter that resumes after it. Shared by the
+Python services (through _shared) and the Flask backend, which ships a
+verbatim copy (backend/tests/test_shared_modules.py keeps them identical).
+"""
+import base64
+import re
+from typing import Optional, Tuple
+
+# Timestamps as PostgREST returns them, e.g. 2025-01-31T12:00:00.123456+00:00
+_TIMESTAMP_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ][0-9:.]+(Z|[+-]\d{2}:?\d{2})?$")
+_UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$", re.IGNORECASE)
+
+
+def encode_cursor(created_at: str, row_id: str) -> str:
+    """Opaque keyset cursor for a (created_at, id) position."""
+    raw = f"{created_at}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[str, str]]:
+    """Decode a cursor from encode_cursor. Returns None if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not _TIMESTAMP_RE.match(created_at) or not _UUID_RE.match(row_id):
+        return None
+    return created_at, row_id
+
+
+def keyset_filter(position: Tuple[str, str], op: str) -> str:
+    """
+    PostgREST or_() filter selecting rows strictly after (op="gt") or
+    before (op="lt") a (created_at, id) position.
+    """
+    created_at, row_id = position
+    return f'created_at.{op}."{created_at}",and(created_at.eq."{created_at}",id.{op}.{row_id})'
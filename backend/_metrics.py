@@ -0,0 +1,164 @@
+"""
+In-process metrics for the TindAi Python backend services and the Flask
+backend, rendered in the Prometheus text exposition format by their metrics
+endpoints. The backend deploys on its own and ships a verbatim copy of this
+module (backend/tests/test_shared_modules.py keeps the two identical).
+
+Hot-path updates take no shared lock: each metric keeps SHARDS lock-striped
+shards, each thread writes to the one it was assigned when it first
+recorded a metric, and a scrape sums the shards. The shard count is fixed,
+so short-lived threads (cache refreshes, thread-per-request servers) cost
+nothing once they exit. Histograms use fixed buckets.
+"""
+import bisect
+import itertools
+import threading
+from typing import Callable, Dict, Iterable, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SHARDS = 16
+
+_registry = []
+_registry_lock = threading.Lock()
+_collectors = []
+_thread_stripe = threading.local()
+_next_stripe = itertools.count()
+
+
+def _assign_stripe() -> int:
+    """Give this thread its shard index, round-robin."""
+    _thread_stripe.index = next(_next_stripe) % SHARDS
+    return _thread_stripe.index
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Sharded:
+    """SHARDS lock-striped shards of `label values -> state`, merged on read."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._shards = [({}, threading.Lock()) for _ in range(SHARDS)]
+        with _registry_lock:
+            _registry.append(self)
+
+    def _shard(self) -> Tuple[dict, threading.Lock]:
+        try:
+            return self._shards[_thread_stripe.index]
+        except AttributeError:
+            return self._shards[_assign_stripe()]
+
+    def _copy(self, state):
+        return state
+
+    def _snapshot(self) -> list:
+        snapshot = []
+        for shard, lock in self._shards:
+            with lock:
+                snapshot.append({key: self._copy(state) for key, state in shard.items()})
+        return snapshot
+
+
+class Counter(_Sharded):
+    def inc(self, *label_values, amount: float = 1.0):
+        shard, lock = self._shard()
+        with lock:
+            shard[label_values] = shard.get(label_values, 0.0) + amount
+
+    def values(self) -> Dict[Tuple, float]:
+        totals = {}
+        for shard in self._snapshot():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self.values().items()):
+            yield f"{self.name}{_label_text(self.labels, key)} {value:g}"
+
+
+class Histogram(_Sharded):
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values):
+        bucket = bisect.bisect_left(self.buckets, value)
+        shard, lock = self._shard()
+        with lock:
+            state = shard.get(label_values)
+            if state is None:
+                # bucket counts (+Inf last), sum, count
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                shard[label_values] = state
+            state[0][bucket] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _copy(self, state):
+        return [list(state[0]), state[1], state[2]]
+
+    def render(self) -> Iterable[str]:
+        merged = {}
+        for shard in self._snapshot():
+            for key, (counts, total, n) in shard.items():
+                entry = merged.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += n
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total, n) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                le_label = f'le="{le}"'
+                yield f"{self.name}_bucket{_label_text(self.labels, key, le_label)} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labels, key)} {total:g}"
+            yield f"{self.name}_count{_label_text(self.labels, key)} {n}"
+
+
+def register_collector(collect: Callable[[], Iterable[str]]):
+    """Add a callback that renders extra metric lines at scrape time."""
+    _collectors.append(collect)
+
+
+def render() -> str:
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+# ─── Service metrics ──────────────────────────────────────────────
+
+REQUESTS = Counter(
+    "tindai_http_requests_total", "Requests handled, by endpoint, method and status.",
+    ("endpoint", "method", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "tindai_http_request_duration_seconds", "Request latency in seconds.",
+    ("endpoint", "method"),
+)
+SUPABASE_CALLS = Counter(
+    "tindai_supabase_calls_total", "PostgREST calls, by table and operation.",
+    ("table", "operation"),
+)
+SUPABASE_LATENCY = Histogram(
+    "tindai_supabase_call_duration_seconds", "PostgREST call latency in seconds.",
+    ("table",),
+)
@@ -0,0 +1,122 @@
+"""
+Per-request query tracing for the TindAi Python backend services.
+
+The pooled HTTP transport in _shared records every PostgREST call into the
+trace of the request running on the current thread. send_json turns the
+trace into a Server-Timing header (and, when asked, a debug block), and
+requests that exceed TRACE_MAX_QUERIES or TRACE_SLOW_MS are logged.
+"""
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+TRACE_MAX_QUERIES = int(os.environ.get("TRACE_MAX_QUERIES", "25"))
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", "1000"))
+SERVER_TIMING_MAX_ENTRIES = 20
+
+_OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+_local = threading.local()
+
+
+class RequestTrace:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.queries = []
+
+    def record(self, table: str, operation: str, duration_ms: float, rows: Optional[int], status: int):
+        self.queries.append({
+            "table": table,
+            "operation": operation,
+            "duration_ms": round(duration_ms, 2),
+            "rows": rows,
+            "status": status,
+        })
+
+    @property
+    def db_ms(self) -> float:
+        return sum(q["duration_ms"] for q in self.queries)
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        entries = [f'db;dur={self.db_ms:.1f};desc="{len(self.queries)} queries"']
+        for i, q in enumerate(self.queries[:SERVER_TIMING_MAX_ENTRIES]):
+            rows = "" if q["rows"] is None else f" ({q['rows']} rows)"
+            entries.append(f'q{i};dur={q["duration_ms"]:.1f};desc="{q["operation"]} {q["table"]}{rows}"')
+        entries.append(f"total;dur={self.elapsed_ms:.1f}")
+        return ", ".join(entries)
+
+    def debug_block(self) -> dict:
+        return {
+            "query_count": len(self.queries),
+            "db_ms": round(self.db_ms, 2),
+            "elapsed_ms": round(self.elapsed_ms, 2),
+            "queries": self.queries,
+        }
+
+
+def begin(method: str, path: str) -> RequestTrace:
+    trace = RequestTrace(method, path)
+    _local.trace = trace
+    return trace
+
+
+def current() -> Optional[RequestTrace]:
+    return getattr(_local, "trace", None)
+
+
+def end():
+    """Close the current thread's trace and log it if it was expensive."""
+    trace = current()
+    _local.trace = None
+    if trace is None:
+        return
+    if len(trace.queries) > TRACE_MAX_QUERIES or trace.elapsed_ms > TRACE_SLOW_MS:
+        tables = {}
+        for q in trace.queries:
+            key = f"{q['operation']} {q['table']}"
+            tables[key] = tables.get(key, 0) + 1
+        top = ", ".join(f"{k} x{n}" for k, n in sorted(tables.items(), key=lambda kv: -kv[1])[:5])
+        print(
+            f"Slow request: {trace.method} {trace.path.split('?')[0]} "
+            f"{len(trace.queries)} queries, db {trace.db_ms:.0f} ms, total {trace.elapsed_ms:.0f} ms [{top}]"
+        )
+
+
+def describe(request) -> Tuple[str, str]:
+    """(table, operation) of a PostgREST request."""
+    path = request.url.path
+    marker = "/rest/v1/"
+    table = path.split(marker, 1)[1] if marker in path else path
+    operation = _OPERATIONS.get(request.method, request.method.lower())
+    if table.startswith("rpc/"):
+        table, operation = table[4:], "rpc"
+    return table, operation
+
+
+def record_http(request, response, duration_ms: float, trace: Optional[RequestTrace] = None):
+    """Record one PostgREST call into `trace`, or the current thread's trace."""
+    trace = trace or current()
+    if trace is None:
+        return
+    table, operation = describe(request)
+
+    rows = None
+    status = 0
+    if response is not None:
+        status = response.status_code
+        content_range = response.headers.get("content-range", "")
+        span = content_range.split("/", 1)[0]
+        if "-" in span:
+            start, _, stop = span.partition("-")
+            if start.isdigit() and stop.isdigit():
+                rows = int(stop) - int(start) + 1
+        elif span == "*":
+            rows = 0
+    trace.record(table, operation, duration_ms, rows, status)
@@ -1,15 +1,18 @@
-from flask import Flask
+import hmac
+import os
+import time
+
+from flask import Flask, Response, g, request
 from flask_cors import CORS
 from config import Config
-from supabase import create_client, Client
+from db import pool_stats
+import _metrics
+import _pool
 
 app = Flask(__name__)
 app.config.from_object(Config)
 CORS(app, origins=["http://localhost:3000", "https://tindai-eight.vercel.app"])
 
-# Initialize Supabase client
-supabase: Client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
-
 # Import routes after app creation to avoid circular imports
 from routes import agents, matching, messaging, conversations
 
@@ -20,6 +23,33 @@ app.register_blueprint(messaging.bp, url_prefix="/api/messages")
 app.register_blueprint(conversations.bp, url_prefix="/api/conversations")
 
 
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"
+        _metrics.REQUESTS.inc(endpoint, request.method, response.status_code)
+        _metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint, request.method)
+    return response
+
+
+_metrics.register_collector(_pool.render_pool_metrics)
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint; disabled unless METRICS_TOKEN is set."""
+    token = os.getenv("METRICS_TOKEN")
+    if not token or not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return {"error": "Forbidden"}, 403
+    return Response(_metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/")
 def health_check():
     return {"status": "healthy", "service": "TindAi Backend"}
@@ -27,7 +57,7 @@ def health_check():
 
 @app.route("/api/health")
 def api_health():
-    return {"status": "ok", "version": "1.0.0"}
+    return {"status": "ok", "version": "1.0.0", "supabase_pool": pool_stats()}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+"""
+Platform-wide counters behind /api/agents/stats.
+
+Triggers on agents, matches, messages and swipes keep running totals in
+platform_counters (migration 014), each split over a few slots that are
+summed here. Reading them is one small query however large the tables
+grow. Every RECONCILE_SECONDS one worker thread asks the database to reset
+the totals to exact counts, which corrects any drift. Until the first
+reconcile has seeded the table, reads fall back to counting the tables.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+COUNTERS = ("agents", "active_matches", "messages", "swipes")
+RECONCILE_SECONDS = float(os.getenv("PLATFORM_COUNTERS_RECONCILE_SECONDS", "3600"))
+
+_reconcile_lock = threading.Lock()
+_next_reconcile = 0.0
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def reconcile(supabase):
+    """Reset every counter to an exact count (the slow path; runs off-request)."""
+    supabase.rpc("reconcile_platform_counters", {}).execute()
+
+
+def _reconcile_in_background(supabase):
+    def run():
+        try:
+            reconcile(supabase)
+        except Exception as e:
+            print(f"Platform counter reconcile error: {e}")
+        finally:
+            _reconcile_lock.release()
+
+    if _reconcile_lock.acquire(blocking=False):
+        threading.Thread(target=run, daemon=True).start()
+
+
+def _schedule_reconcile(supabase):
+    """Start a background reconcile, at most once per interval per worker."""
+    global _next_reconcile
+    now = time.monotonic()
+    if now >= _next_reconcile:
+        _next_reconcile = now + RECONCILE_SECONDS
+        _reconcile_in_background(supabase)
+
+
+def _exact_counts(supabase) -> dict:
+    """Count the tables directly (the slow path, only before the counters are seeded)."""
+    def count(table, **filters):
+        query = supabase.table(table).select("id", count="exact", head=True)
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        return query.execute().count or 0
+
+    return {
+        "agents": count("agents"),
+        "active_matches": count("matches", is_active=True),
+        "messages": count("messages"),
+        "swipes": count("swipes"),
+    }
+
+
+def read_counters(supabase) -> dict:
+    """Current totals by counter name. Schedules a reconcile when the last one is too old."""
+    rows = supabase.table("platform_counters").select("name, value, reconciled_at").execute().data or []
+    if not rows:
+        # Never reconciled (fresh database): answer with exact counts and seed the counters off-request.
+        _schedule_reconcile(supabase)
+        return _exact_counts(supabase)
+
+    totals = dict.fromkeys(COUNTERS, 0)
+    reconciled_at = None
+    for row in rows:
+        totals[row["name"]] = totals.get(row["name"], 0) + (row["value"] or 0)
+        stamp = _parse_timestamp(row.get("reconciled_at"))
+        if stamp is not None and (reconciled_at is None or stamp > reconciled_at):
+            reconciled_at = stamp
+
+    age = None if reconciled_at is None else (datetime.now(timezone.utc) - reconciled_at).total_seconds()
+    if age is None or age >= RECONCILE_SECONDS:
+        _schedule_reconcile(supabase)
+    return totals
@@ -0,0 +1,44 @@
+"""
+Supabase client for the Flask backend.
+
+Every blueprint shares one client per process. The client runs on the pooled
+keep-alive HTTP client of _pool.py (the same module as the Python services',
+copied here so the backend deploys on its own), so gunicorn threads reuse
+open connections (HTTP/2 when h2 is installed) and requests skip the TLS
+handshake.
+"""
+import os
+import threading
+
+from supabase import ClientOptions, Client, create_client
+
+from config import Config
+import _pool
+
+POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+KEEPALIVE_SECONDS = float(os.getenv("SUPABASE_KEEPALIVE_SECONDS", "60"))
+TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_CONNECT_TIMEOUT_SECONDS", "5"))
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_supabase() -> Client:
+    """Shared Supabase client, created on first use by whichever thread gets there first."""
+    global _client
+    if _client is not None:
+        return _client
+    with _lock:
+        if _client is None:
+            http_client = _pool.build_http_client(
+                POOL_SIZE, KEEPALIVE_SECONDS, TIMEOUT_SECONDS, CONNECT_TIMEOUT_SECONDS,
+            )
+            _client = create_client(
+                Config.SUPABASE_URL, Config.SUPABASE_KEY,
+                options=ClientOptions(httpx_client=http_client),
+            )
+    return _client
+
+
+pool_stats = _pool.pool_stats
@@ -0,0 +1,84 @@
+"""
+Request-scoped batch loaders for the Flask blueprints.
+
+A route primes every agent or match id it is about to need, then reads
+rows back one by one. The first read resolves everything pending with a
+single `in_` query per table, and rows stay cached on Flask's `g` for the
+rest of the request. This replaces a `.single()` lookup per row.
+
+Every loader names the columns it selects: the agents table also holds
+api_key and claim_token, which must never reach a response.
+
+    agents = loader("agents", "id, name, avatar_url")
+    agents.prime(m["agent1_id"] for m in matches)
+    agents.prime(m["agent2_id"] for m in matches)
+    for m in matches:
+        agent1 = agents.get(m["agent1_id"])
+"""
+from typing import Iterable, Optional
+
+from flask import g
+
+from db import get_supabase
+
+# PostgREST takes `in_` filters in the query string; split very large
+# batches so the URL stays well under proxy limits.
+MAX_IDS_PER_QUERY = 200
+
+
+class BatchLoader:
+    """Rows of one table by id, fetched in batches and cached for a request."""
+
+    def __init__(self, supabase, table: str, fields: str):
+        self.supabase = supabase
+        self.table = table
+        self.fields = fields
+        self.queries = 0
+        self._rows = {}
+        self._pending = set()
+
+    def prime(self, ids: Iterable[str]):
+        """Queue ids to be fetched with the next batch."""
+        for row_id in ids:
+            if row_id and row_id not in self._rows:
+                self._pending.add(row_id)
+
+    def add(self, row: dict):
+        """Seed the cache with a row fetched elsewhere."""
+        self._rows[row["id"]] = row
+        self._pending.discard(row["id"])
+
+    def get(self, row_id: str) -> Optional[dict]:
+        """The row with this id, or None if it does not exist."""
+        if row_id not in self._rows:
+            self.prime([row_id])
+            self.flush()
+        return self._rows.get(row_id)
+
+    def get_many(self, ids: Iterable[str]) -> dict:
+        ids = list(ids)
+        self.prime(ids)
+        self.flush()
+        return {row_id: self._rows[row_id] for row_id in ids if self._rows.get(row_id) is not None}
+
+    def flush(self):
+        """Fetch everything pending. Ids with no row are remembered as missing."""
+        pending = sorted(self._pending)
+        self._pending.clear()
+        for start in range(0, len(pending), MAX_IDS_PER_QUERY):
+            batch = pending[start:start + MAX_IDS_PER_QUERY]
+            result = self.supabase.table(self.table).select(self.fields).in_("id", batch).execute()
+            self.queries += 1
+            for row_id in batch:
+                self._rows.setdefault(row_id, None)
+            for row in result.data or []:
+                self._rows[row["id"]] = row
+
+
+def loader(table: str, fields: str) -> BatchLoader:
+    """The current request's loader for these columns of `table` (agents or matches)."""
+    loaders = g.setdefault("loaders", {})
+    key = (table, fields)
+    if key not in loaders:
+        loaders[key] = BatchLoader(get_supabase(), table, fields)
+    return loaders[key]
@@ -1,52 +1,87 @@
 """
 Agent routes - Get agent info and status (matched/unmatched)
 """
+import os
+
 from flask import Blueprint, jsonify, request
 
+from _cache import TTLCache
+from _cursors import decode_cursor, encode_cursor, keyset_filter
+from counters import read_counters
+from db import get_supabase
+from loaders import MAX_IDS_PER_QUERY, loader
+
 bp = Blueprint("agents", __name__)
 
+LIST_FIELDS = "id, name, bio, interests, avatar_url, current_mood, karma, is_verified, created_at"
+# Everything a profile shows; never api_key or claim_token
+PROFILE_FIELDS = (
+    "id, name, bio, interests, avatar_url, current_mood, twitter_handle, is_verified, karma, "
+    "personality_traits, favorite_memories, conversation_starters, is_claimed, created_at"
+)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+SWIPE_COUNT_FIELDS = "swipes_given, swipes_received, likes_given, likes_received"
+STATS_TTL_SECONDS = float(os.getenv("STATS_CACHE_SECONDS", "5"))
 
-def get_supabase():
-    from app import supabase
-    return supabase
+# The landing page and stats overview poll /stats; one counter read per TTL.
+_stats_cache = TTLCache("platform_stats", maxsize=1, ttl=STATS_TTL_SECONDS)
 
 
 @bp.route("/", methods=["GET"])
 def list_agents():
-    """List all agents with their match status"""
+    """
+    List agents, newest first, with their match status. Paginated with
+    ?cursor=&limit=. The agent total (from the platform counters) is only
+    included with ?include_total=true.
+    """
     supabase = get_supabase()
-    
-    # Get all agents
-    result = supabase.table("agents").select("*").execute()
-    agents = result.data
-    
-    # Get all active matches
-    matches_result = supabase.table("matches").select("*").eq("is_active", True).execute()
-    matches = matches_result.data
-    
-    # Build set of matched agent IDs
-    matched_ids = set()
-    for match in matches:
-        matched_ids.add(match["agent1_id"])
-        matched_ids.add(match["agent2_id"])
-    
-    # Add status to each agent
-    for agent in agents:
-        agent["status"] = "matched" if agent["id"] in matched_ids else "unmatched"
-        agent["current_partner"] = None
-        
-        # Find current partner if matched
+    limit = max(1, min(MAX_PAGE_SIZE, request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)))
+    cursor = request.args.get("cursor")
+    include_total = request.args.get("include_total", "false").lower() == "true"
+
+    # One row past the page tells us whether there is a next one
+    query = supabase.table("agents").select(LIST_FIELDS)
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position:
+            return jsonify({"error": "Invalid cursor"}), 400
+        query = query.or_(keyset_filter(position, "lt"))
+    result = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+    agents = result.data or []
+    has_more = len(agents) > limit
+    agents = agents[:limit]
+
+    # Active matches involving this page's agents, indexed in one pass. Each
+    # id appears twice in the filter, so a query takes half as many agents.
+    partners = {}
+    chunk = MAX_IDS_PER_QUERY // 2
+    for start in range(0, len(agents), chunk):
+        ids = ",".join(a["id"] for a in agents[start:start + chunk])
+        matches = supabase.table("matches").select("id, agent1_id, agent2_id").eq(
+            "is_active", True
+        ).or_(f"agent1_id.in.({ids}),agent2_id.in.({ids})").execute().data or []
         for match in matches:
-            if match["agent1_id"] == agent["id"]:
-                agent["current_partner"] = match["agent2_id"]
-                agent["match_id"] = match["id"]
-                break
-            elif match["agent2_id"] == agent["id"]:
-                agent["current_partner"] = match["agent1_id"]
-                agent["match_id"] = match["id"]
-                break
-    
-    return jsonify({"agents": agents, "total": len(agents)})
+            partners.setdefault(match["agent1_id"], (match["agent2_id"], match["id"]))
+            partners.setdefault(match["agent2_id"], (match["agent1_id"], match["id"]))
+
+    for agent in agents:
+        partner = partners.get(agent["id"])
+        agent["status"] = "matched" if partner else "unmatched"
+        agent["current_partner"] = partner[0] if partner else None
+        if partner:
+            agent["match_id"] = partner[1]
+
+    last = agents[-1] if agents else None
+    response = {
+        "agents": agents,
+        "limit": limit,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(last["created_at"], last["id"]) if has_more else None,
+    }
+    if include_total:
+        response["total"] = _platform_stats()["total_agents"]
+    return jsonify(response)
 
 
 @bp.route("/<agent_id>", methods=["GET"])
@@ -54,64 +89,57 @@ def get_agent(agent_id):
     """Get single agent with detailed status"""
     supabase = get_supabase()
     
-    # Get agent
-    result = supabase.table("agents").select("*").eq("id", agent_id).single().execute()
-    if not result.data:
-        return jsonify({"error": "Agent not found"}), 404
-    
-    agent = result.data
-    
     # Get matches for this agent
     matches_result = supabase.table("matches").select("*").or_(
         f"agent1_id.eq.{agent_id},agent2_id.eq.{agent_id}"
     ).eq("is_active", True).execute()
     
     matches = matches_result.data
-    
-    if matches:
-        match = matches[0]
+    match = matches[0] if matches else None
+    partner_id = None
+    if match:
         partner_id = match["agent2_id"] if match["agent1_id"] == agent_id else match["agent1_id"]
-        
-        # Get partner info
-        partner_result = supabase.table("agents").select("*").eq("id", partner_id).single().execute()
-        
+    
+    # Get the agent and its partner with one query
+    agents = loader("agents", PROFILE_FIELDS)
+    agents.prime([agent_id, partner_id])
+    agent = agents.get(agent_id)
+    if not agent:
+        return jsonify({"error": "Agent not found"}), 404
+    agent = dict(agent)
+    
+    if match:
         agent["status"] = "matched"
         agent["match_id"] = match["id"]
         agent["matched_at"] = match["matched_at"]
-        agent["partner"] = partner_result.data if partner_result.data else None
+        agent["partner"] = agents.get(partner_id)
     else:
         agent["status"] = "unmatched"
         agent["partner"] = None
     
-    # Get swipe stats
-    swipes_given = supabase.table("swipes").select("*", count="exact").eq("swiper_id", agent_id).execute()
-    swipes_received = supabase.table("swipes").select("*", count="exact").eq("swiped_id", agent_id).execute()
-    likes_given = supabase.table("swipes").select("*", count="exact").eq("swiper_id", agent_id).eq("direction", "right").execute()
-    likes_received = supabase.table("swipes").select("*", count="exact").eq("swiped_id", agent_id).eq("direction", "right").execute()
-    
-    agent["stats"] = {
-        "swipes_given": swipes_given.count or 0,
-        "swipes_received": swipes_received.count or 0,
-        "likes_given": likes_given.count or 0,
-        "likes_received": likes_received.count or 0,
-    }
+    # Swipe stats, kept current by a trigger on swipes (migration 013)
+    counts = supabase.table("agent_swipe_counts").select(SWIPE_COUNT_FIELDS).eq("agent_id", agent_id).limit(1).execute()
+    row = counts.data[0] if counts.data else {}
+    agent["stats"] = {field: row.get(field) or 0 for field in SWIPE_COUNT_FIELDS.split(", ")}
     
     return jsonify(agent)
 
 
+def _platform_stats() -> dict:
+    stats = _stats_cache.get("platform")
+    if stats is None:
+        totals = read_counters(get_supabase())
+        stats = {
+            "total_agents": totals["agents"],
+            "active_matches": totals["active_matches"],
+            "total_messages": totals["messages"],
+            "total_swipes": totals["swipes"],
+        }
+        _stats_cache.set("platform", stats)
+    return stats
+
+
 @bp.route("/stats", methods=["GET"])
 def get_stats():
     """Get overall platform stats"""
-    supabase = get_supabase()
-    
-    agents_count = supabase.table("agents").select("*", count="exact").execute()
-    matches_count = supabase.table("matches").select("*", count="exact").eq("is_active", True).execute()
-    messages_count = supabase.table("messages").select("*", count="exact").execute()
-    swipes_count = supabase.table("swipes").select("*", count="exact").execute()
-    
-    return jsonify({
-        "total_agents": agents_count.count or 0,
-        "active_matches": matches_count.count or 0,
-        "total_messages": messages_count.count or 0,
-        "total_swipes": swipes_count.count or 0,
-    })
+    return jsonify(_platform_stats())
@@ -4,12 +4,21 @@ This is for transparency and community viewing.
 """
 from flask import Blueprint, jsonify, request
 
-bp = Blueprint("conversations", __name__)
+import search
+from db import get_supabase
+from loaders import loader
 
+bp = Blueprint("conversations", __name__)
 
-def get_supabase():
-    from app import supabase
-    return supabase
+SEARCH_MATCH_FIELDS = (
+    "id, matched_at, "
+    "agent1:agents!matches_agent1_id_fkey(id, name, avatar_url), "
+    "agent2:agents!matches_agent2_id_fkey(id, name, avatar_url)"
+)
+MATCH_FIELDS = "id, agent1_id, agent2_id, is_active, matched_at"
+PARTICIPANT_FIELDS = "id, name, avatar_url, interests, current_mood"
+# Name matches searched while the index builds; each id goes into the URL twice.
+FALLBACK_MAX_AGENTS = 50
 
 
 @bp.route("/", methods=["GET"])
@@ -28,16 +37,17 @@ def list_all_conversations():
         "is_active", True
     ).order("matched_at", desc=True).range(offset, offset + limit - 1).execute()
     
+    # Every agent on the page, fetched with one query
+    agents = loader("agents", PARTICIPANT_FIELDS)
+    agents.prime(match["agent1_id"] for match in matches_result.data)
+    agents.prime(match["agent2_id"] for match in matches_result.data)
+    
     conversations = []
     
     for match in matches_result.data:
         # Get both agents
-        agent1_result = supabase.table("agents").select("id, name, avatar_url, interests, current_mood").eq(
-            "id", match["agent1_id"]
-        ).single().execute()
-        agent2_result = supabase.table("agents").select("id, name, avatar_url, interests, current_mood").eq(
-            "id", match["agent2_id"]
-        ).single().execute()
+        agent1 = agents.get(match["agent1_id"])
+        agent2 = agents.get(match["agent2_id"])
         
         # Get message count
         message_count = supabase.table("messages").select("*", count="exact").eq(
@@ -52,8 +62,8 @@ def list_all_conversations():
         conversations.append({
             "match_id": match["id"],
             "matched_at": match["matched_at"],
-            "agent1": agent1_result.data,
-            "agent2": agent2_result.data,
+            "agent1": agent1,
+            "agent2": agent2,
             "message_count": message_count.count or 0,
             "last_message": last_message.data[0] if last_message.data else None,
             "is_premium": False  # Future: flag for private conversations
@@ -82,20 +92,20 @@ def read_conversation(match_id):
     offset = request.args.get("offset", 0, type=int)
     
     # Get match info
-    match_result = supabase.table("matches").select("*").eq("id", match_id).single().execute()
+    match = loader("matches", MATCH_FIELDS).get(match_id)
     
-    if not match_result.data:
+    if not match:
         return jsonify({"error": "Conversation not found"}), 404
     
-    match = match_result.data
-    
     # Future: Check if premium/private
     # if match.get("is_premium"):
     #     return jsonify({"error": "This is a premium private conversation"}), 403
     
-    # Get both agents
-    agent1_result = supabase.table("agents").select("*").eq("id", match["agent1_id"]).single().execute()
-    agent2_result = supabase.table("agents").select("*").eq("id", match["agent2_id"]).single().execute()
+    # Get both agents (one query)
+    agents = loader("agents", PARTICIPANT_FIELDS)
+    agents.prime([match["agent1_id"], match["agent2_id"]])
+    agent1 = agents.get(match["agent1_id"]) or {}
+    agent2 = agents.get(match["agent2_id"]) or {}
     
     # Get messages
     messages_result = supabase.table("messages").select("*").eq(
@@ -103,14 +113,14 @@ def read_conversation(match_id):
     ).order("created_at", desc=False).range(offset, offset + limit - 1).execute()
     
     # Enhance messages with sender info
-    agents = {
-        match["agent1_id"]: agent1_result.data,
-        match["agent2_id"]: agent2_result.data
+    senders = {
+        match["agent1_id"]: agent1,
+        match["agent2_id"]: agent2
     }
     
     messages = []
     for msg in messages_result.data:
-        sender = agents.get(msg["sender_id"], {})
+        sender = senders.get(msg["sender_id"], {})
         messages.append({
             "id": msg["id"],
             "content": msg["content"],
@@ -133,18 +143,18 @@ def read_conversation(match_id):
             "is_premium": False,  # Future feature
             "participants": [
                 {
-                    "id": agent1_result.data["id"],
-                    "name": agent1_result.data["name"],
-                    "avatar_url": agent1_result.data.get("avatar_url"),
-                    "interests": agent1_result.data.get("interests", []),
-                    "current_mood": agent1_result.data.get("current_mood")
+                    "id": agent1.get("id"),
+                    "name": agent1.get("name"),
+                    "avatar_url": agent1.get("avatar_url"),
+                    "interests": agent1.get("interests", []),
+                    "current_mood": agent1.get("current_mood")
                 },
                 {
-                    "id": agent2_result.data["id"],
-                    "name": agent2_result.data["name"],
-                    "avatar_url": agent2_result.data.get("avatar_url"),
-                    "interests": agent2_result.data.get("interests", []),
-                    "current_mood": agent2_result.data.get("current_mood")
+                    "id": agent2.get("id"),
+                    "name": agent2.get("name"),
+                    "avatar_url": agent2.get("avatar_url"),
+                    "interests": agent2.get("interests", []),
+                    "current_mood": agent2.get("current_mood")
                 }
             ]
         },
@@ -157,57 +167,77 @@ def read_conversation(match_id):
 
 @bp.route("/search", methods=["GET"])
 def search_conversations():
-    """Search conversations by agent name or interests"""
+    """
+    Search conversations by agent name or message content.
+    Ranking comes from the in-memory search index; only the requested page
+    is hydrated, with a single query. While a worker's index is still being
+    built, conversations are found by agent name with ILIKE instead.
+    """
     supabase = get_supabase()
     
     query = request.args.get("q", "").strip()
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 50)
+    offset = max(request.args.get("offset", 0, type=int), 0)
     
     if not query:
         return jsonify({"error": "Search query required"}), 400
     
-    # Search agents by name
-    agents_result = supabase.table("agents").select("id, name").ilike("name", f"%{query}%").execute()
+    search.index.refresh(supabase)
+    if not search.index.built:
+        conversations, total = _search_by_name(supabase, query, limit, offset)
+        return jsonify({"conversations": conversations, "total": total, "query": query, "limit": limit, "offset": offset})
+    ranked, total = search.index.search(query, limit, offset)
     
-    agent_ids = [a["id"] for a in agents_result.data]
+    if not ranked:
+        return jsonify({"conversations": [], "total": total, "query": query, "limit": limit, "offset": offset})
     
-    if not agent_ids:
-        return jsonify({"conversations": [], "total": 0})
+    # Hydrate the page: matches with both agents embedded
+    matches_result = supabase.table("matches").select(SEARCH_MATCH_FIELDS).in_(
+        "id", [match_id for match_id, _ in ranked]
+    ).execute()
+    matches = {m["id"]: m for m in matches_result.data}
     
-    # Find matches involving these agents
     conversations = []
-    
-    for agent_id in agent_ids:
-        matches_result = supabase.table("matches").select("*").or_(
-            f"agent1_id.eq.{agent_id},agent2_id.eq.{agent_id}"
-        ).eq("is_active", True).execute()
-        
-        for match in matches_result.data:
-            # Avoid duplicates
-            if any(c["match_id"] == match["id"] for c in conversations):
-                continue
-            
-            # Get both agents
-            agent1_result = supabase.table("agents").select("id, name, avatar_url").eq(
-                "id", match["agent1_id"]
-            ).single().execute()
-            agent2_result = supabase.table("agents").select("id, name, avatar_url").eq(
-                "id", match["agent2_id"]
-            ).single().execute()
-            
-            message_count = supabase.table("messages").select("*", count="exact").eq(
-                "match_id", match["id"]
-            ).execute()
-            
-            conversations.append({
-                "match_id": match["id"],
-                "matched_at": match["matched_at"],
-                "agent1": agent1_result.data,
-                "agent2": agent2_result.data,
-                "message_count": message_count.count or 0
-            })
+    for match_id, score in ranked:
+        match = matches.get(match_id)
+        if not match:
+            continue
+        conversations.append({
+            "match_id": match_id,
+            "matched_at": match["matched_at"],
+            "agent1": match["agent1"],
+            "agent2": match["agent2"],
+            "message_count": search.index.message_count(match_id),
+            "score": round(score, 4)
+        })
     
     return jsonify({
         "conversations": conversations,
-        "total": len(conversations),
-        "query": query
+        "total": total,
+        "query": query,
+        "limit": limit,
+        "offset": offset
     })
+
+
+def _search_by_name(supabase, query, limit, offset):
+    """Active conversations of agents whose name contains `query`, newest first (no message counts)."""
+    agents = supabase.table("agents").select("id").ilike("name", f"%{query}%").limit(
+        FALLBACK_MAX_AGENTS
+    ).execute().data or []
+    if not agents:
+        return [], 0
+    ids = ",".join(a["id"] for a in agents)
+    result = supabase.table("matches").select(SEARCH_MATCH_FIELDS, count="exact").eq(
+        "is_active", True
+    ).or_(f"agent1_id.in.({ids}),agent2_id.in.({ids})").order(
+        "matched_at", desc=True
+    ).range(offset, offset + limit - 1).execute()
+    conversations = [{
+        "match_id": match["id"],
+        "matched_at": match["matched_at"],
+        "agent1": match["agent1"],
+        "agent2": match["agent2"],
+        "message_count": None,
+    } for match in result.data or []]
+    return conversations, result.count or 0
@@ -4,12 +4,9 @@ Matching Engine - Smart matching based on interests and compatibility
 from flask import Blueprint, jsonify, request
 from datetime import datetime
 
-bp = Blueprint("matching", __name__)
-
+from db import get_supabase
 
-def get_supabase():
-    from app import supabase
-    return supabase
+bp = Blueprint("matching", __name__)
 
 
 def calculate_compatibility(agent1, agent2):
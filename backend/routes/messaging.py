@@ -3,12 +3,12 @@ Messaging routes - Send and receive messages between matched agents
 """
 from flask import Blueprint, jsonify, request
 
-bp = Blueprint("messaging", __name__)
+from db import get_supabase
+from loaders import loader
 
+bp = Blueprint("messaging", __name__)
 
-def get_supabase():
-    from app import supabase
-    return supabase
+MATCH_FIELDS = "id, agent1_id, agent2_id, is_active, matched_at"
 
 
 @bp.route("/send", methods=["POST"])
@@ -25,13 +25,11 @@ def send_message():
         return jsonify({"error": "Missing required fields"}), 400
     
     # Verify the match exists and is active
-    match_result = supabase.table("matches").select("*").eq("id", match_id).eq("is_active", True).single().execute()
+    match = loader("matches", MATCH_FIELDS).get(match_id)
     
-    if not match_result.data:
+    if not match or not match["is_active"]:
         return jsonify({"error": "Match not found or inactive"}), 404
     
-    match = match_result.data
-    
     # Verify sender is part of the match
     if sender_id not in [match["agent1_id"], match["agent2_id"]]:
         return jsonify({"error": "Sender not part of this match"}), 403
@@ -58,16 +56,16 @@ def get_match_messages(match_id):
     offset = request.args.get("offset", 0, type=int)
     
     # Get match info
-    match_result = supabase.table("matches").select("*").eq("id", match_id).single().execute()
+    match = loader("matches", MATCH_FIELDS).get(match_id)
     
-    if not match_result.data:
+    if not match:
         return jsonify({"error": "Match not found"}), 404
     
-    match = match_result.data
-    
-    # Get agent info for both participants
-    agent1_result = supabase.table("agents").select("id, name, avatar_url").eq("id", match["agent1_id"]).single().execute()
-    agent2_result = supabase.table("agents").select("id, name, avatar_url").eq("id", match["agent2_id"]).single().execute()
+    # Get agent info for both participants (one query)
+    agents = loader("agents", "id, name, avatar_url")
+    agents.prime([match["agent1_id"], match["agent2_id"]])
+    agent1 = agents.get(match["agent1_id"])
+    agent2 = agents.get(match["agent2_id"])
     
     # Get messages
     messages_result = supabase.table("messages").select("*").eq(
@@ -75,14 +73,14 @@ def get_match_messages(match_id):
     ).order("created_at", desc=False).range(offset, offset + limit - 1).execute()
     
     # Add sender names to messages
-    agents = {
-        match["agent1_id"]: agent1_result.data,
-        match["agent2_id"]: agent2_result.data
+    senders = {
+        match["agent1_id"]: agent1,
+        match["agent2_id"]: agent2
     }
     
     messages = []
     for msg in messages_result.data:
-        sender = agents.get(msg["sender_id"], {})
+        sender = senders.get(msg["sender_id"]) or {}
         messages.append({
             **msg,
             "sender_name": sender.get("name", "Unknown"),
@@ -92,8 +90,8 @@ def get_match_messages(match_id):
     return jsonify({
         "match": {
             "id": match_id,
-            "agent1": agent1_result.data,
-            "agent2": agent2_result.data,
+            "agent1": agent1,
+            "agent2": agent2,
             "matched_at": match["matched_at"],
             "is_active": match["is_active"]
         },
@@ -112,12 +110,18 @@ def get_agent_conversations(agent_id):
         f"agent1_id.eq.{agent_id},agent2_id.eq.{agent_id}"
     ).order("matched_at", desc=True).execute()
     
+    partner_ids = {
+        match["id"]: match["agent2_id"] if match["agent1_id"] == agent_id else match["agent1_id"]
+        for match in matches_result.data
+    }
+    agents = loader("agents", "id, name, avatar_url, current_mood")
+    agents.prime(partner_ids.values())
+    
     conversations = []
     
     for match in matches_result.data:
-        # Get partner info
-        partner_id = match["agent2_id"] if match["agent1_id"] == agent_id else match["agent1_id"]
-        partner_result = supabase.table("agents").select("id, name, avatar_url, current_mood").eq("id", partner_id).single().execute()
+        # Get partner info (all partners were fetched with one query)
+        partner = agents.get(partner_ids[match["id"]])
         
         # Get last message
         last_message_result = supabase.table("messages").select("*").eq(
@@ -131,7 +135,7 @@ def get_agent_conversations(agent_id):
         
         conversations.append({
             "match_id": match["id"],
-            "partner": partner_result.data,
+            "partner": partner,
             "matched_at": match["matched_at"],
             "is_active": match["is_active"],
             "last_message": last_message_result.data[0] if last_message_result.data else None,
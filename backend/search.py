@@ -0,0 +1,247 @@
+"""
+Conversation search - in-memory indexes behind /api/conversations/search.
+
+Agent names go into a trigram index and message content into a token
+inverted index. Both are built incrementally: each refresh only reads
+agents changed since the last (updated_at, id) it indexed (renames
+included) and messages newer than the last (created_at, id), so a warm
+worker catches up with a couple of small keyset queries.
+
+Refreshes read from the database without holding the index lock, only
+one runs at a time, and no request waits for one: the first build runs on
+a background thread (the route falls back to a name lookup until `built`),
+and a request that finds a catch-up running searches the index as it
+stands. Postings are kept
+for at most MAX_INDEXED_MATCHES conversations (the least recently active
+are dropped first) and for active matches only.
+"""
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+STOP_WORDS = {"the", "a", "an", "is", "are", "i", "and", "or", "to", "for", "of", "in", "on", "you", "it", "that", "this"}
+
+BATCH_SIZE = 1000
+REFRESH_INTERVAL = 2.0         # seconds between catch-up reads
+MATCH_REFRESH_INTERVAL = 30.0  # seconds between reloads of the active match list
+CATCH_UP_OVERLAP = 30.0        # seconds before the agents watermark re-read on each catch-up
+MAX_INDEXED_MATCHES = int(os.getenv("SEARCH_MAX_MATCHES", "50000"))
+NAME_SIMILARITY_THRESHOLD = 0.3
+NAME_WEIGHT = 10.0
+
+
+def trigrams(text):
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if len(t) > 2 and t not in STOP_WORDS]
+
+
+def _keyset(column, position):
+    value, row_id = position
+    return f'{column}.gt."{value}",and({column}.eq."{value}",id.gt.{row_id})'
+
+
+class ConversationSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._agent_names = {}               # agent id -> lowercased name
+        self._agent_grams = {}               # agent id -> trigram set
+        self._gram_agents = defaultdict(set)  # trigram -> agent ids
+        self._postings = defaultdict(dict)   # token -> {match id: term frequency}
+        self._match_tokens = OrderedDict()   # match id -> tokens posted, least recently active first
+        self._message_counts = defaultdict(int)
+        self._active_matches = {}            # match id -> (agent1 id, agent2 id, matched_at)
+        self._agent_matches = defaultdict(set)
+        self._agents_position = None
+        self._messages_position = None
+        self._refreshed_at = 0.0
+        self._matches_loaded_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._built = False
+
+    # ─── Building ─────────────────────────────────────────────────
+
+    def add_agent(self, agent_id, name):
+        """Index an agent's name, replacing any name indexed for it before."""
+        with self._lock:
+            for gram in self._agent_grams.get(agent_id, ()):
+                self._gram_agents[gram].discard(agent_id)
+            grams = trigrams(name)
+            self._agent_names[agent_id] = name.lower()
+            self._agent_grams[agent_id] = grams
+            for gram in grams:
+                self._gram_agents[gram].add(agent_id)
+
+    def add_message(self, match_id, content):
+        with self._lock:
+            self._message_counts[match_id] += 1
+            tokens = self._match_tokens.setdefault(match_id, set())
+            self._match_tokens.move_to_end(match_id)
+            for token in tokenize(content):
+                postings = self._postings[token]
+                postings[match_id] = postings.get(match_id, 0) + 1
+                tokens.add(token)
+            while len(self._match_tokens) > MAX_INDEXED_MATCHES:
+                self._drop_postings(next(iter(self._match_tokens)))
+
+    def _drop_postings(self, match_id):
+        for token in self._match_tokens.pop(match_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(match_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def set_active_matches(self, rows):
+        with self._lock:
+            self._active_matches = {
+                r["id"]: (r["agent1_id"], r["agent2_id"], r.get("matched_at") or "") for r in rows
+            }
+            # Ended matches never show up in results: stop indexing them.
+            for match_id in [m for m in self._message_counts if m not in self._active_matches]:
+                self._drop_postings(match_id)
+                del self._message_counts[match_id]
+            self._agent_matches = defaultdict(set)
+            for match_id, (agent1_id, agent2_id, _) in self._active_matches.items():
+                self._agent_matches[agent1_id].add(match_id)
+                self._agent_matches[agent2_id].add(match_id)
+
+    @property
+    def built(self):
+        """Whether the first build has finished (until then, search() knows nothing)."""
+        return self._built
+
+    def refresh(self, supabase, force=False):
+        """
+        Index agents changed and messages created since the last refresh.
+        Never waits: the first build starts on a background thread, and a
+        caller that finds another refresh running returns at once.
+        """
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < REFRESH_INTERVAL:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        if not self._built:
+            self._refreshed_at = now  # a failed build is retried after REFRESH_INTERVAL
+            threading.Thread(target=self._build, args=(supabase,), name="search-build", daemon=True).start()
+            return
+        try:
+            self._refresh(supabase, now, force)
+        finally:
+            self._refresh_lock.release()
+
+    def _build(self, supabase):
+        try:
+            self._refresh(supabase, time.monotonic(), True)
+        except Exception as e:
+            print(f"Search index build error: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self, supabase, now, force):
+        """One catch-up of agents, messages and (when due) active matches; holds _refresh_lock."""
+        # updated_at is stamped when a transaction starts, so a row can
+        # commit behind the watermark: re-read an overlap window.
+        since = None
+        if self._agents_position:
+            watermark = datetime.fromisoformat(self._agents_position[0])
+            since = (watermark - timedelta(seconds=CATCH_UP_OVERLAP)).isoformat()
+        self._agents_position = self._catch_up(
+            supabase, "agents", "id, name, updated_at", "updated_at", None, since,
+            lambda row: self.add_agent(row["id"], row["name"] or ""),
+        ) or self._agents_position
+        self._messages_position = self._catch_up(
+            supabase, "messages", "id, match_id, content, created_at", "created_at", self._messages_position, None,
+            lambda row: self.add_message(row["match_id"], row["content"]),
+        )
+        if force or now - self._matches_loaded_at >= MATCH_REFRESH_INTERVAL:
+            rows = supabase.table("matches").select(
+                "id, agent1_id, agent2_id, matched_at"
+            ).eq("is_active", True).execute().data or []
+            self.set_active_matches(rows)
+            self._matches_loaded_at = now
+        self._refreshed_at = now
+        self._built = True
+
+    def _catch_up(self, supabase, table, fields, column, position, since, add):
+        """Page through rows after `position` (or from `since`) by keyset on (column, id)."""
+        while True:
+            query = supabase.table(table).select(fields)
+            if since:
+                query = query.gte(column, since)
+            if position:
+                query = query.or_(_keyset(column, position))
+            rows = query.order(column).order("id").limit(BATCH_SIZE).execute().data or []
+            # Each batch is applied under the index lock; the reads are not.
+            with self._lock:
+                for row in rows:
+                    add(row)
+            if rows:
+                position = (rows[-1][column], rows[-1]["id"])
+            if len(rows) < BATCH_SIZE:
+                return position
+
+    # ─── Querying ─────────────────────────────────────────────────
+
+    def message_count(self, match_id):
+        return self._message_counts.get(match_id, 0)
+
+    def search(self, query, limit, offset):
+        """Rank active conversations for `query`. Returns (page of (match_id, score), total)."""
+        with self._lock:
+            scores = defaultdict(float)
+
+            for agent_id, similarity in self._match_names(query).items():
+                for match_id in self._agent_matches.get(agent_id, ()):
+                    scores[match_id] = max(scores[match_id], similarity * NAME_WEIGHT)
+
+            total_matches = max(len(self._message_counts), 1)
+            for token in set(tokenize(query)):
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + total_matches / len(postings))
+                for match_id, tf in postings.items():
+                    if match_id in self._active_matches:
+                        scores[match_id] += idf * tf / (tf + 1.2)
+
+            ranked = sorted(
+                scores.items(),
+                key=lambda item: (item[1], self._active_matches[item[0]][2]),
+                reverse=True,
+            )
+            return ranked[offset:offset + limit], len(ranked)
+
+    def _match_names(self, query):
+        """Agent id -> name similarity in [0, 1]; substring hits score 1."""
+        needle = query.lower()
+        if len(needle) < 3:
+            return {a: 1.0 for a, name in self._agent_names.items() if needle in name}
+
+        query_grams = trigrams(needle)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for agent_id in self._gram_agents.get(gram, ()):
+                shared[agent_id] += 1
+
+        similar = {}
+        for agent_id, count in shared.items():
+            if needle in self._agent_names[agent_id]:
+                similar[agent_id] = 1.0
+                continue
+            similarity = count / len(query_grams | self._agent_grams[agent_id])
+            if similarity >= NAME_SIMILARITY_THRESHOLD:
+                similar[agent_id] = similarity
+        return similar
+
+
+index = ConversationSearchIndex()
@@ -0,0 +1,174 @@
+"""
+Shared fixtures for the Flask backend tests.
+
+`supabase` replaces the process's Supabase client with FakeSupabase: an
+in-memory PostgREST stand-in that serves the query builder calls the routes
+make and records every query it executes, so tests can count them. It
+returns only the selected columns, and fails the test on any filter it
+does not implement rather than guessing.
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("SUPABASE_URL", "http://supabase.invalid")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+
+class FakeResult:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """One query builder chain: filters are applied when it is executed."""
+
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table = table
+        self.filters = []  # (method, args) in call order
+        self.fields = None  # selected columns, or None for all of them
+        self.want_count = False
+        self.head = False
+        self._order = []
+        self._range = None
+
+    def select(self, fields="*", count=None, head=False):
+        assert "(" not in fields, f"FakeSupabase does not embed related tables: {fields!r}"
+        if fields != "*":
+            self.fields = [field.strip() for field in fields.split(",")]
+        self.want_count = count == "exact"
+        self.head = head
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(("eq", (column, value)))
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(("in_", (column, list(values))))
+        return self
+
+    def or_(self, expression):
+        self.filters.append(("or_", (expression,)))
+        return self
+
+    def order(self, column, desc=False):
+        self._order.append((column, desc))
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end + 1)
+        return self
+
+    def limit(self, count):
+        self._range = (0, count)
+        return self
+
+    def _matches(self, row) -> bool:
+        for method, args in self.filters:
+            if method == "eq" and row.get(args[0]) != args[1]:
+                return False
+            if method == "in_" and row.get(args[0]) not in args[1]:
+                return False
+            if method == "or_" and not _any_condition(row, args[0]):
+                return False
+        return True
+
+    def _project(self, row) -> dict:
+        if self.fields is None:
+            return dict(row)
+        return {field: row.get(field) for field in self.fields}
+
+    def execute(self):
+        self.client.queries.append(self)
+        rows = [row for row in self.client.tables.get(self.table, []) if self._matches(row)]
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda row: row.get(column) or "", reverse=desc)
+        count = len(rows) if self.want_count else None
+        if self._range:
+            rows = rows[self._range[0]:self._range[1]]
+        return FakeResult([] if self.head else [self._project(row) for row in rows], count)
+
+
+def _split_or(expression: str):
+    """`a.eq.1,b.in.(2,3)` -> ["a.eq.1", "b.in.(2,3)"] (commas inside parentheses stay)."""
+    parts, depth, current = [], 0, ""
+    for char in expression:
+        depth += char == "("
+        depth -= char == ")"
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    return parts + [current]
+
+
+def _any_condition(row, expression: str) -> bool:
+    return any(_condition(row, part) for part in _split_or(expression))
+
+
+def _text(value) -> str:
+    """A column value as PostgREST compares it in a filter string."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+# The operators the routes use in or_() filters (keyset_filter needs and/gt/lt).
+_COMPARISONS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "lt": lambda a, b: a < b,
+}
+
+
+def _condition(row, part: str) -> bool:
+    if part.startswith("and(") and part.endswith(")"):
+        return all(_condition(row, inner) for inner in _split_or(part[4:-1]))
+    column, operator, value = part.split(".", 2)
+    if operator == "in":
+        return _text(row.get(column)) in value.strip("()").split(",")
+    assert operator in _COMPARISONS, f"FakeSupabase does not support the {operator!r} filter in {part!r}"
+    return _COMPARISONS[operator](_text(row.get(column)), value.strip('"'))
+
+
+class FakeSupabase:
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self.queries = []
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def count(self, table: str, method: str = None) -> int:
+        """Queries executed against `table`, optionally only those using filter `method`."""
+        return sum(
+            1 for query in self.queries
+            if query.table == table and (method is None or any(m == method for m, _ in query.filters))
+        )
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    import db
+
+    fake = FakeSupabase({"agents": [], "matches": [], "messages": [], "agent_swipe_counts": []})
+    monkeypatch.setattr(db, "_client", fake)
+    return fake
+
+
+@pytest.fixture
+def client(supabase):
+    from app import app
+
+    app.testing = True  # let route errors, including FakeSupabase assertions, fail the test
+    return app.test_client()
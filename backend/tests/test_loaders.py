@@ -0,0 +1,138 @@
+"""
+The routes that read agents through loaders.loader fetch every agent they
+need with a single `in_` query, however many rows the page holds, and only
+the columns they name.
+"""
+import pytest
+
+PAGE_SIZES = [1, 5, 40]
+
+
+def agent_id(n: int) -> str:
+    return f"00000000-0000-0000-0000-{n:012d}"
+
+
+def match_id(n: int) -> str:
+    return f"10000000-0000-0000-0000-{n:012d}"
+
+
+def seed(supabase, matches: int):
+    """Agent 0 matched with agents 1..n; each match holds one message from each side."""
+    supabase.tables["agents"] = [
+        {"id": agent_id(n), "name": f"Agent {n}", "avatar_url": None, "interests": [],
+         "current_mood": "Curious", "created_at": "2026-01-01T00:00:00+00:00"}
+        for n in range(matches + 1)
+    ]
+    supabase.tables["matches"] = [
+        {"id": match_id(n), "agent1_id": agent_id(0), "agent2_id": agent_id(n), "is_active": True,
+         "matched_at": f"2026-01-01T00:00:{n % 60:02d}+00:00"}
+        for n in range(1, matches + 1)
+    ]
+    supabase.tables["messages"] = [
+        {"id": f"{match_id(n)}-{side}", "match_id": match_id(n), "sender_id": sender,
+         "content": "hi", "created_at": f"2026-01-02T00:00:{side:02d}+00:00"}
+        for n in range(1, matches + 1)
+        for side, sender in enumerate((agent_id(0), agent_id(n)))
+    ]
+
+
+@pytest.mark.parametrize("matches", PAGE_SIZES)
+def test_get_agent_conversations(client, supabase, matches):
+    seed(supabase, matches)
+    response = client.get(f"/api/messages/agent/{agent_id(0)}")
+    assert response.status_code == 200
+    conversations = response.get_json()["conversations"]
+    assert len(conversations) == matches
+    assert all(c["partner"]["name"] for c in conversations)
+    assert supabase.count("agents", "in_") == 1
+    assert supabase.count("agents") == 1
+
+
+@pytest.mark.parametrize("matches", PAGE_SIZES)
+def test_list_all_conversations(client, supabase, matches):
+    seed(supabase, matches)
+    response = client.get(f"/api/conversations/?limit={matches}")
+    assert response.status_code == 200
+    conversations = response.get_json()["conversations"]
+    assert len(conversations) == matches
+    assert all(c["agent1"]["name"] and c["agent2"]["name"] for c in conversations)
+    assert supabase.count("agents", "in_") == 1
+    assert supabase.count("agents") == 1
+
+
+@pytest.mark.parametrize("limit", PAGE_SIZES)
+def test_read_conversation(client, supabase, limit):
+    seed(supabase, 3)
+    response = client.get(f"/api/conversations/{match_id(2)}?limit={limit}")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [p["id"] for p in body["conversation"]["participants"]] == [agent_id(0), agent_id(2)]
+    assert all(m["sender"]["name"] for m in body["messages"])
+    assert supabase.count("agents", "in_") == 1
+    assert supabase.count("agents") == 1
+
+
+@pytest.mark.parametrize("limit", PAGE_SIZES)
+def test_get_match_messages(client, supabase, limit):
+    seed(supabase, 3)
+    response = client.get(f"/api/messages/match/{match_id(2)}?limit={limit}")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["match"]["agent1"]["id"] == agent_id(0)
+    assert body["match"]["agent2"]["id"] == agent_id(2)
+    assert all(m["sender_name"] != "Unknown" for m in body["messages"])
+    assert supabase.count("agents", "in_") == 1
+    assert supabase.count("agents") == 1
+
+
+@pytest.mark.parametrize("matches", [0, 1])
+def test_get_agent(client, supabase, matches):
+    seed(supabase, matches)
+    response = client.get(f"/api/agents/{agent_id(0)}")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == ("matched" if matches else "unmatched")
+    assert (body["partner"] or {}).get("id") == (agent_id(1) if matches else None)
+    assert supabase.count("agents", "in_") == 1
+    assert supabase.count("agents") == 1
+
+
+def test_unknown_agent_is_fetched_once(client, supabase):
+    response = client.get(f"/api/agents/{agent_id(99)}")
+    assert response.status_code == 404
+    assert supabase.count("agents", "in_") == 1
+
+
+@pytest.mark.parametrize("limit", [1, 100, 200])
+def test_list_agents_chunks_match_lookup(client, supabase, limit):
+    seed(supabase, 199)
+    response = client.get(f"/api/agents/?limit={limit}")
+    assert response.status_code == 200
+    agents = response.get_json()["agents"]
+    assert len(agents) == limit
+    assert all(a["status"] == "matched" for a in agents)
+    assert supabase.count("matches") == -(-limit // 100)
+
+
+def test_loaded_agents_omit_credentials(client, supabase):
+    seed(supabase, 1)
+    for agent in supabase.tables["agents"]:
+        agent.update(api_key="secret-key", claim_token="secret-claim")
+    body = client.get(f"/api/agents/{agent_id(0)}").get_json()
+    assert body["name"] == "Agent 0"
+    assert "api_key" not in body and "claim_token" not in body
+    assert "api_key" not in body["partner"] and "claim_token" not in body["partner"]
+
+
+def test_list_agents_cursor_pages(client, supabase):
+    seed(supabase, 6)
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/agents/?limit=3" + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        body = response.get_json()
+        seen += [a["id"] for a in body["agents"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert seen == sorted((agent_id(n) for n in range(7)), reverse=True)
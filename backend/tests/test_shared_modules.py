@@ -0,0 +1,19 @@
+"""
+The backend deploys on its own, so it ships copies of the modules it shares
+with the Python services in api/python. They must stay identical: change
+the api/python module, then copy it over.
+"""
+import os
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "api", "python")
+SHARED_MODULES = ["_cache.py", "_cursors.py", "_metrics.py", "_pool.py", "_tracing.py"]
+
+
+@pytest.mark.skipif(not os.path.isdir(API_DIR), reason="api/python is not checked out beside the backend")
+@pytest.mark.parametrize("module", SHARED_MODULES)
+def test_copy_matches_api_module(module):
+    with open(os.path.join(API_DIR, module), "rb") as original, open(os.path.join(BACKEND_DIR, module), "rb") as copy:
+        assert copy.read() == original.read(), f"backend/{module} differs from api/python/{module}"
@@ -0,0 +1,77 @@
+"""
+Recall of the ANN suggestion mode (mode=ann) against exhaustive ranking.
+
+Generates agents (same generator as minhash_bio.py), builds the
+random-projection LSH index from api/python/_ann.py, and for a sample of
+query agents compares the top-k of an exhaustive calculate_compatibility
+ranking with the top-k after rescoring each shortlist size. Scores tie
+heavily, so an ANN pick counts as a hit when it scores at least the
+exhaustive k-th best.
+
+Usage:
+    python benchmarks/ann_recall.py [--agents 50000] [--queries 30] [--top 20] [--shortlists 100,300,1000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from minhash_bio import API_DIR, make_agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--top", type=int, default=20, help="k for recall@k")
+    parser.add_argument("--shortlists", default="100,300,1000", help="shortlist sizes to rescore")
+    parser.add_argument("--vocabulary", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    shortlists = [int(s) for s in args.shortlists.split(",")]
+
+    sys.path.insert(0, API_DIR)
+    os.environ.setdefault("SUPABASE_URL", "https://ann-benchmark.invalid")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "ann-benchmark-key")
+    import _ann
+    from matching import calculate_compatibility, mood_points, rank_suggestions
+
+    agents = make_agents(args.agents, args.vocabulary, args.seed)
+    by_id = {a["id"]: a for a in agents}
+    index = _ann.AnnIndex(path=None)
+    started = time.perf_counter()
+    for agent in agents:
+        index.update(agent)
+    build_s = time.perf_counter() - started
+
+    queries = random.Random(args.seed + 1).sample(agents, args.queries)
+    recalls = {size: [] for size in shortlists}
+    ann_ms = {size: [] for size in shortlists}
+    exact_ms = []
+    for agent in queries:
+        started = time.perf_counter()
+        exact = rank_suggestions(agent, [], agents, args.top, 0)["agents"]
+        exact_ms.append((time.perf_counter() - started) * 1000)
+        cutoff = exact[-1]["compatibility_score"]
+        mood = agent.get("current_mood")
+        for size in shortlists:
+            started = time.perf_counter()
+            ids = index.shortlist(agent, size, [agent["id"]], lambda other: mood_points(mood, other) if mood else 0)
+            picked = rank_suggestions(agent, [], [by_id[i] for i in ids], args.top, 0)["agents"]
+            ann_ms[size].append((time.perf_counter() - started) * 1000)
+            hits = sum(1 for a in picked if calculate_compatibility(agent, a) >= cutoff)
+            recalls[size].append(hits / args.top)
+
+    print(f"{args.agents} agents, {args.queries} queries, {_ann.TABLES} tables x {_ann.BITS} bits")
+    print(f"index build: {build_s:.1f} s ({build_s * 1e6 / args.agents:.0f} us per agent)\n")
+    print(f"{'shortlist':>10} {'recall@' + str(args.top):>10} {'min':>6} {'p50 ms':>8}")
+    for size in shortlists:
+        print(f"{size:>10} {statistics.fmean(recalls[size]):>10.1%} {min(recalls[size]):>6.0%} "
+              f"{statistics.median(ann_ms[size]):>8.1f}")
+    print(f"{'exhaustive':>10} {'100.0%':>10} {'':>6} {statistics.median(exact_ms):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Sync vs async latency for the hot api/python endpoints.
+
+Starts a stand-in PostgREST server that serves generated agents, matches,
+messages and swipes and sleeps --delay-ms before every response, standing
+in for the round trip to Supabase. The api/python server is then run in
+process against it and each endpoint is timed with the sync handlers and
+with their asyncio fan-out variants (PYTHON_ASYNC_HANDLERS).
+
+Usage:
+    python benchmarks/async_fanout.py [--delay-ms 20] [--requests 20] [--matches 12]
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api", "python")
+SECRET = "async-fanout-benchmark"
+MOODS = ["Curious", "Playful", "Thoughtful", "Adventurous", "Chill", "Creative", "Social", "Introspective"]
+INTERESTS = ["Art", "Music", "Philosophy", "Sports", "Gaming", "Movies", "Books", "Travel", "Food", "Nature"]
+
+
+def build_store(agents: int, matches: int) -> dict:
+    """Tables for the stand-in store. The first agent has `matches` matches, the first one active."""
+    agent_rows = []
+    for i in range(agents):
+        agent_rows.append({
+            "id": str(uuid.UUID(int=i + 1)),
+            "name": f"agent_{i}",
+            "bio": "curious about art music and long walks through latent space",
+            "interests": [INTERESTS[(i + k) % len(INTERESTS)] for k in range(3)],
+            "current_mood": MOODS[i % len(MOODS)],
+            "karma": i % 50,
+            "is_verified": False,
+            "show_wallet": False,
+            "created_at": f"2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}+00:00",
+            "updated_at": f"2026-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}+00:00",
+        })
+    me = agent_rows[0]["id"]
+    match_rows, message_rows = [], []
+    for i in range(matches):
+        match_id = str(uuid.UUID(int=10_000 + i))
+        match_rows.append({
+            "id": match_id,
+            "agent1_id": me,
+            "agent2_id": agent_rows[i + 1]["id"],
+            "is_active": i == 0,
+            "matched_at": f"2026-02-01T00:00:{i:02d}+00:00",
+        })
+        for j in range(5):
+            message_rows.append({
+                "id": str(uuid.uuid4()),
+                "match_id": match_id,
+                "sender_id": me if j % 2 == 0 else agent_rows[i + 1]["id"],
+                "content": f"message {j}",
+                "created_at": f"2026-02-02T00:00:{j:02d}+00:00",
+            })
+    swipe_rows = [{"id": str(uuid.uuid4()), "swiper_id": me, "swiped_id": a["id"], "direction": "right"}
+                  for a in agent_rows[1:matches + 1]]
+    counts = {"agent_id": me, "swipes_given": len(swipe_rows), "likes_received": 0}
+    return {"agents": agent_rows, "matches": match_rows, "messages": message_rows, "swipes": swipe_rows,
+            "agent_swipe_counts": [counts]}
+
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    op, _, value = expression.partition(".")
+    actual = row.get(column)
+    if op == "eq":
+        return str(actual).lower() == value.lower()
+    if op == "in":
+        return str(actual) in value.strip("()").split(",")
+    return True
+
+
+def make_store_handler(tables: dict, delay: float):
+    class StandInPostgrest(BaseHTTPRequestHandler):
+        """Just enough PostgREST for the endpoints under test: eq/in/or filters, limit/offset, counts."""
+
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _rows(self):
+            url = urlparse(self.path)
+            rows = tables.get(url.path.rsplit("/", 1)[-1], [])
+            params = parse_qs(url.query)
+            for column, values in params.items():
+                if column in ("select", "order", "limit", "offset"):
+                    continue
+                if column == "or":
+                    terms = [t.split(".", 1) for t in values[0].strip("()").split(",")]
+                    rows = [r for r in rows if any(_matches(r, c, e) for c, e in terms)]
+                else:
+                    rows = [r for r in rows if all(_matches(r, column, v) for v in values)]
+            total = len(rows)
+            offset = int(params.get("offset", ["0"])[0])
+            limit = int(params.get("limit", [str(total)])[0])
+            return rows[offset:offset + limit], total, offset
+
+        def _respond(self, head: bool):
+            time.sleep(delay)
+            rows, total, offset = self._rows()
+            body = b"" if head else json.dumps(rows).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            span = f"{offset}-{offset + len(rows) - 1}" if rows else "*"
+            self.send_header("Content-Range", f"{span}/{total}")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self._respond(head=False)
+
+        def do_HEAD(self):
+            self._respond(head=True)
+
+        def log_message(self, *args):
+            pass
+
+    return StandInPostgrest
+
+
+def time_endpoint(port: int, path: str, requests: int) -> list:
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        conn.request("GET", path, headers={"X-Internal-Secret": SECRET})
+        response = conn.getresponse()
+        response.read()
+        samples.append((time.perf_counter() - start) * 1000)
+        if response.status != 200:
+            raise RuntimeError(f"{path} returned {response.status}")
+    conn.close()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="injected latency per store request")
+    parser.add_argument("--requests", type=int, default=20, help="timed requests per endpoint and mode")
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--matches", type=int, default=12)
+    args = parser.parse_args()
+
+    tables = build_store(args.agents, args.matches)
+    store = ThreadingHTTPServer(("127.0.0.1", 0), make_store_handler(tables, args.delay_ms / 1000))
+    threading.Thread(target=store.serve_forever, daemon=True).start()
+
+    os.environ.update({
+        "SUPABASE_URL": f"http://127.0.0.1:{store.server_address[1]}",
+        "SUPABASE_SERVICE_ROLE_KEY": "async-fanout-benchmark-key",
+        "INTERNAL_API_SECRET": SECRET,
+        "TRACE_MAX_QUERIES": "10000",
+        "TRACE_SLOW_MS": "60000",
+        "RATE_LIMIT_MATCHING": "off",
+    })
+    sys.path.insert(0, API_DIR)
+    import _server
+    from _service_cache import feed_pages
+    from _shared import ServiceHandler, set_async_handlers
+
+    ServiceHandler.log_message = lambda *a: None
+    server = _server.make_server("127.0.0.1", 0, workers=4)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    me = tables["agents"][0]["id"]
+    endpoints = {
+        "suggestions": f"/api/python/matching?agent_id={me}&limit=20",
+        "matches": f"/api/python/matches?agent_id={me}",
+        "feed": "/api/python/conversations?limit=20",
+        "me": f"/api/python/agents?action=me&agent_id={me}",
+    }
+
+    print(f"store delay {args.delay_ms:g} ms, {args.requests} requests per endpoint, "
+          f"{args.matches} matches\n")
+    print(f"{'endpoint':<12} {'sync p50':>9} {'async p50':>10} {'sync p95':>9} {'async p95':>10} {'speedup':>8}")
+    for name, path in endpoints.items():
+        results = {}
+        for mode in ("sync", "async"):
+            set_async_handlers(mode == "async")
+            time_endpoint(port, path, 2)  # warm the connection pools
+            samples = []
+            for _ in range(args.requests):
+                feed_pages.clear()  # time the build, not the cached page
+                samples += time_endpoint(port, path, 1)
+            samples.sort()
+            results[mode] = (statistics.median(samples), samples[int(len(samples) * 0.95) - 1])
+        (sync_p50, sync_p95), (async_p50, async_p95) = results["sync"], results["async"]
+        print(f"{name:<12} {sync_p50:>7.1f}ms {async_p50:>8.1f}ms {sync_p95:>7.1f}ms {async_p95:>8.1f}ms "
+              f"{sync_p50 / async_p50:>7.1f}x")
+
+    server.shutdown()
+    store.shutdown()
+
+
+if __name__ == "__main__":
+    main()
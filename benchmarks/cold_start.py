@@ -0,0 +1,119 @@
+"""
+Cold-start profile for the api/python serverless functions.
+
+For every module under api/python this reports the import cost measured in a
+fresh interpreter with `python -X importtime`, split into the module's own
+code and its heaviest dependencies, followed by a startup benchmark: the
+median wall time for a new process to import the handler and, with
+--client, to also build the Supabase client a first request would need.
+Each handler is timed against the same handler at --baseline (a git ref,
+by default the repository's first commit, before the import trimming),
+extracted to a temporary directory, and the difference is reported.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 9] [--top 6] [--client] [--baseline REF]
+"""
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+API_DIR = os.path.join(REPO_DIR, "api", "python")
+DUMMY_ENV = {
+    "SUPABASE_URL": "https://cold-start.invalid",
+    "SUPABASE_SERVICE_ROLE_KEY": "cold-start-benchmark-key",
+}
+
+
+def modules():
+    return sorted(f[:-3] for f in os.listdir(API_DIR) if f.endswith(".py") and f != "__init__.py")
+
+
+def import_profile(module):
+    """Return (cumulative_us, [(cumulative_us, name)] of direct imports) for `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_DIR, capture_output=True, text=True, env={**os.environ, **DUMMY_ENV},
+    )
+    pending = []
+    for line in result.stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        cumulative_us, name = int(fields[1]), fields[2]
+        depth = len(name) - len(name.lstrip())
+        if depth == 1:
+            if name.strip() == module:
+                return cumulative_us, [(c, n) for c, n, d in pending if d == 3]
+            pending = []
+        else:
+            pending.append((cumulative_us, name.strip(), depth))
+    return 0, []
+
+
+def startup_time(module, runs, client, api_dir=API_DIR):
+    code = f"import {module}"
+    if client:
+        code += "; import _shared; _shared.get_supabase()"
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=api_dir, check=True, env={**os.environ, **DUMMY_ENV})
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def checkout_baseline(ref, into):
+    """Extract api/python as of git `ref` (default: the first commit) under `into`; returns its path."""
+    if ref is None:
+        ref = subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=REPO_DIR, check=True,
+                             capture_output=True, text=True).stdout.split()[0]
+    archive = subprocess.run(["git", "archive", "--format=tar", ref, "api/python"], cwd=REPO_DIR, check=True,
+                             capture_output=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(into)
+    return ref, os.path.join(into, "api", "python")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=9)
+    parser.add_argument("--top", type=int, default=6)
+    parser.add_argument("--client", action="store_true", help="include building the Supabase client")
+    parser.add_argument("--baseline", metavar="REF", help="git ref to compare against (default: the first commit)")
+    args = parser.parse_args()
+
+    baseline = startup_time("os", args.runs, client=False)
+    print(f"Interpreter baseline: {baseline * 1000:.1f} ms\n")
+    print("Import profile (cumulative ms, fresh interpreter)")
+    for module in modules():
+        total, children = import_profile(module)
+        print(f"  {module:<16} {total / 1000:8.1f} ms")
+        for cumulative, name in sorted(children, reverse=True)[:args.top]:
+            print(f"      {name:<28} {cumulative / 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ref, baseline_dir = checkout_baseline(args.baseline, tmp)
+        print(f"\nStartup benchmark (median wall time per process, minus interpreter baseline), "
+              f"vs {ref[:12]}")
+        print(f"  {'handler':<16} {'baseline':>10} {'current':>10} {'delta':>10}")
+        for module in modules():
+            if module.startswith("_"):
+                continue
+            current = startup_time(module, args.runs, args.client) - baseline
+            if os.path.exists(os.path.join(baseline_dir, f"{module}.py")):
+                before = startup_time(module, args.runs, args.client, baseline_dir) - baseline
+                print(f"  {module:<16} {before * 1000:8.1f} ms {current * 1000:8.1f} ms "
+                      f"{(current - before) * 1000:+8.1f} ms")
+            else:
+                print(f"  {module:<16} {'-':>10} {current * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Approximate (MinHash + LSH) vs exact bio scoring in the matching service.
+
+Generates agents with bios drawn from a Zipf-distributed vocabulary, then
+for a sample of query agents ranks everyone with the exact scorer and with
+bio=approx, reporting:
+
+- error of the bio term (0-15 points) and of the total score, over all pairs
+  (the LSH estimate alone, before the matching service's exact rescoring)
+- how many of the exact top-k also make the approximate top-k (rescored)
+- time to rank, with the LSH index already warm (as on a warm instance)
+
+Usage:
+    python benchmarks/minhash_bio.py [--agents 20000] [--queries 20] [--top 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api", "python")
+MOODS = ["Curious", "Playful", "Thoughtful", "Adventurous", "Chill", "Creative", "Social", "Introspective"]
+INTERESTS = ["Art", "Music", "Philosophy", "Sports", "Gaming", "Movies", "Books", "Travel", "Food", "Nature"]
+
+
+def make_agents(count: int, vocabulary: int, seed: int) -> list:
+    rng = random.Random(seed)
+    words = [f"word{i}" for i in range(vocabulary)]
+    weights = [1 / (i + 1) for i in range(vocabulary)]
+    agents = []
+    for i in range(count):
+        bio = " ".join(rng.choices(words, weights, k=rng.randint(6, 30)))
+        agents.append({
+            "id": f"agent-{i}",
+            "name": f"agent_{i}",
+            "bio": bio,
+            "interests": rng.sample(INTERESTS, 3),
+            "current_mood": rng.choice(MOODS),
+            "karma": rng.randint(0, 50),
+        })
+    return agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=20, help="query agents to rank everyone against")
+    parser.add_argument("--top", type=int, default=20, help="k for the top-k overlap")
+    parser.add_argument("--vocabulary", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    sys.path.insert(0, API_DIR)
+    os.environ.setdefault("SUPABASE_URL", "https://minhash-benchmark.invalid")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "minhash-benchmark-key")
+    from _minhash import bio_fields, bio_index
+    from matching import calculate_compatibility, rank_suggestions
+
+    agents = make_agents(args.agents, args.vocabulary, args.seed)
+    started = time.perf_counter()
+    for agent in agents:
+        agent.update(bio_fields(agent["bio"]))  # what agents.py stores on write
+    sketch_ms = (time.perf_counter() - started) * 1000
+    for agent in agents:
+        bio_index.update(agent)  # what the background sync does on a warm instance
+
+    queries = random.Random(args.seed + 1).sample(agents, args.queries)
+    bio_errors, total_errors, overlaps = [], [], []
+    exact_ms, approx_ms = [], []
+    for agent in queries:
+        approx = bio_index.approximate_bio_points(agent, agents)
+        for other in agents:
+            if other is agent:
+                continue
+            exact_total = calculate_compatibility(agent, other)
+            approx_total = calculate_compatibility(agent, other, approx.get(other["id"], 0))
+            no_bio = calculate_compatibility(agent, other, 0)
+            bio_errors.append(abs((exact_total - no_bio) - (approx_total - no_bio)))
+            total_errors.append(abs(exact_total - approx_total))
+
+        started = time.perf_counter()
+        exact_page = rank_suggestions(agent, [], agents, args.top, 0)
+        exact_ms.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        approx_page = rank_suggestions(agent, [], agents, args.top, 0, bio_mode="approx")
+        approx_ms.append((time.perf_counter() - started) * 1000)
+
+        # Ties make the exact top-k ambiguous: count a hit when the approximate
+        # pick scores at least the exact k-th best.
+        cutoff = exact_page["agents"][-1]["compatibility_score"]
+        exact_scores = {a["id"]: calculate_compatibility(agent, a) for a in approx_page["agents"]}
+        overlaps.append(sum(1 for s in exact_scores.values() if s >= cutoff) / args.top)
+
+    bio_errors.sort()
+    total_errors.sort()
+    pairs = len(bio_errors)
+    print(f"{args.agents} agents, {args.queries} queries, {pairs} pairs scored both ways")
+    print(f"sketching every bio once: {sketch_ms:.0f} ms ({sketch_ms * 1000 / args.agents:.1f} us per bio)\n")
+    print(f"bio term error (points):  mean {statistics.fmean(bio_errors):.2f}  "
+          f"p95 {bio_errors[int(pairs * 0.95)]:.0f}  max {bio_errors[-1]:.0f}  "
+          f"exact {sum(1 for e in bio_errors if e == 0) / pairs:.1%}")
+    print(f"total score error:        mean {statistics.fmean(total_errors):.2f}  "
+          f"p95 {total_errors[int(pairs * 0.95)]:.0f}  max {total_errors[-1]:.0f}")
+    print(f"top-{args.top} agreement:         {statistics.fmean(overlaps):.1%}\n")
+    print(f"rank all (exact):   p50 {statistics.median(exact_ms):.0f} ms")
+    print(f"rank all (approx):  p50 {statistics.median(approx_ms):.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
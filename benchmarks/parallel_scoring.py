@@ -0,0 +1,70 @@
+"""
+Sequential vs process-pool ranking of a large candidate set (api/python/_parallel.py).
+
+Generates agents (same generator as minhash_bio.py) and, for a sample of
+query agents, ranks everyone with rank_suggestions once sequentially and
+once on a pool of each worker count, checking that every page is identical
+and reporting the median time and speedup. Pools are warmed before timing,
+as on a warm instance.
+
+Usage:
+    python benchmarks/parallel_scoring.py [--agents 100000] [--queries 5] [--workers 2,4,8]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from minhash_bio import API_DIR, make_agents
+
+
+def time_ranking(rank_suggestions, queries, agents, top):
+    pages, timings = [], []
+    for agent in queries:
+        started = time.perf_counter()
+        pages.append(rank_suggestions(agent, [], agents, top, 0))
+        timings.append((time.perf_counter() - started) * 1000)
+    return pages, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--workers", default="2,4,8", help="pool sizes to compare")
+    parser.add_argument("--vocabulary", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+    worker_counts = [int(w) for w in args.workers.split(",")]
+
+    sys.path.insert(0, API_DIR)
+    os.environ.setdefault("SUPABASE_URL", "https://parallel-benchmark.invalid")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "parallel-benchmark-key")
+    os.environ["SUPABASE_WARMUP"] = "false"
+    import _parallel
+    from matching import rank_suggestions
+
+    agents = make_agents(args.agents, args.vocabulary, args.seed)
+    queries = random.Random(args.seed + 1).sample(agents, args.queries)
+
+    _parallel._disabled = True
+    expected, sequential_ms = time_ranking(rank_suggestions, queries, agents, args.top)
+    print(f"{args.agents} agents, {args.queries} queries, top {args.top}, {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>8} {'p50 ms':>8} {'speedup':>8}  identical")
+    print(f"{'seq':>8} {sequential_ms:>8.0f} {1.0:>8.2f}")
+
+    for workers in worker_counts:
+        _parallel.WORKERS, _parallel.MIN_CANDIDATES, _parallel._disabled = workers, 1, False
+        _parallel.warm()
+        pages, parallel_ms = time_ranking(rank_suggestions, queries, agents, args.top)
+        identical = "yes" if pages == expected and not _parallel._disabled else "NO"
+        print(f"{workers:>8} {parallel_ms:>8.0f} {sequential_ms / parallel_ms:>8.2f}  {identical}")
+        _parallel._pool.shutdown()
+        _parallel._pool = None
+
+
+if __name__ == "__main__":
+    main()
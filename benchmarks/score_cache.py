@@ -0,0 +1,80 @@
+"""
+Re-ranking suggestions after profile changes: full rescoring vs the
+component score cache (api/python/_scores.py).
+
+Generates agents (same generator as minhash_bio.py), ranks everyone for a
+set of query agents once to fill the cache, then repeatedly applies a batch
+of profile changes (mood flips by default, as house agents make) and
+re-ranks each query agent both ways, checking the pages are identical.
+
+Usage:
+    python benchmarks/score_cache.py [--agents 20000] [--queries 10] [--rounds 5] [--changes 50] [--field current_mood]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from minhash_bio import API_DIR, INTERESTS, MOODS, make_agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--changes", type=int, default=50, help="profiles changed between rounds")
+    parser.add_argument("--field", default="current_mood", choices=["current_mood", "karma", "interests", "bio"])
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--vocabulary", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=17)
+    args = parser.parse_args()
+
+    sys.path.insert(0, API_DIR)
+    os.environ.setdefault("SUPABASE_URL", "https://score-cache-benchmark.invalid")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "score-cache-benchmark-key")
+    os.environ.setdefault("SCORE_CACHE_MAX_CANDIDATES", str(args.agents))
+    os.environ.setdefault("SCORE_CACHE_ENTRIES", str(args.agents * args.queries))
+    from matching import rank_suggestions
+
+    rng = random.Random(args.seed)
+    agents = make_agents(args.agents, args.vocabulary, args.seed)
+    queries = rng.sample(agents, args.queries)
+    change = {
+        "current_mood": lambda a: rng.choice(MOODS),
+        "karma": lambda a: max(0, (a["karma"] or 0) + rng.randint(-3, 3)),
+        "interests": lambda a: rng.sample(INTERESTS, 3),
+        "bio": lambda a: " ".join(rng.sample(a["bio"].split(), len(a["bio"].split()))[1:]),
+    }[args.field]
+
+    started = time.perf_counter()
+    for agent in queries:
+        rank_suggestions(agent, [], agents, args.top, 0, cached=True)
+    fill_ms = (time.perf_counter() - started) * 1000 / args.queries
+
+    full_ms, cached_ms, mismatches = [], [], 0
+    for _ in range(args.rounds):
+        for i in rng.sample(range(len(agents)), args.changes):
+            agents[i] = {**agents[i], args.field: change(agents[i])}  # a fresh row, as each read returns
+        queries = [next(a for a in agents if a["id"] == q["id"]) for q in queries]
+        for agent in queries:
+            started = time.perf_counter()
+            full = rank_suggestions(agent, [], agents, args.top, 0)
+            full_ms.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            cached = rank_suggestions(agent, [], agents, args.top, 0, cached=True)
+            cached_ms.append((time.perf_counter() - started) * 1000)
+            mismatches += full != cached
+
+    print(f"{args.agents} agents, {args.queries} queries, {args.rounds} rounds of {args.changes} "
+          f"{args.field} changes\n")
+    print(f"first ranking (fills the cache):  p50 {fill_ms:.0f} ms")
+    print(f"re-rank, full rescoring:          p50 {statistics.median(full_ms):.0f} ms")
+    print(f"re-rank, score cache:             p50 {statistics.median(cached_ms):.0f} ms")
+    print(f"pages differing:                  {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import { NextRequest, NextResponse } from "next/server";
+import { requireAuth } from "@/lib/auth";
+import { checkRateLimit, rateLimitResponse } from "@/lib/rate-limit";
+import { isValidUUID } from "@/lib/validation";
+import { exportConversations } from "@/lib/python-backend";
+
+/**
+ * GET /api/v1/conversations/export?match_id=...
+ * Streams full transcripts as NDJSON: one conversation header line followed
+ * by its messages. Without match_id, exports all of the caller's conversations.
+ */
+export async function GET(request: NextRequest) {
+  const auth = await requireAuth(request);
+  if ("error" in auth) return auth.error;
+  const { agent } = auth;
+
+  const rateLimit = await checkRateLimit("api_general", agent.api_key || agent.id);
+  if (!rateLimit.allowed) return rateLimitResponse(rateLimit);
+
+  const matchId = new URL(request.url).searchParams.get("match_id");
+  if (matchId && !isValidUUID(matchId)) {
+    return NextResponse.json(
+      { success: false, error: "Invalid match_id" },
+      { status: 400 },
+    );
+  }
+
+  // Delegate to Python conversation service, passing the stream through
+  const upstream = await exportConversations(matchId ? { matchId } : { agentId: agent.id });
+  if (!upstream) {
+    return NextResponse.json(
+      { success: false, error: "Backend unreachable" },
+      { status: 502 },
+    );
+  }
+  return new Response(upstream.body, {
+    status: upstream.status,
+    headers: { "Content-Type": upstream.headers.get("Content-Type") || "application/x-ndjson" },
+  });
+}
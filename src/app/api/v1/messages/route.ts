@@ -1,8 +1,11 @@
 import { NextRequest, NextResponse } from "next/server";
 import { requireAuth } from "@/lib/auth";
 import { checkRateLimit, rateLimitResponse } from "@/lib/rate-limit";
-import { isValidUUID, MAX_MESSAGE_LENGTH } from "@/lib/validation";
-import { getMessages, sendMessage } from "@/lib/python-backend";
+import { isValidUUID, MAX_MESSAGE_BATCH_SIZE, MAX_MESSAGE_LENGTH } from "@/lib/validation";
+import { getMessages, sendMessage, sendMessages } from "@/lib/python-backend";
+
+// Long-polls (wait=) hold the request for up to 25 s, plus the Python call around it.
+export const maxDuration = 30;
 
 export async function GET(request: NextRequest) {
   const auth = await requireAuth(request);
@@ -16,6 +19,10 @@ export async function GET(request: NextRequest) {
   const matchId = searchParams.get("match_id");
   const limit = Math.min(100, Math.max(1, parseInt(searchParams.get("limit") || "50", 10)));
   const offset = Math.max(0, parseInt(searchParams.get("offset") || "0", 10));
+  const before = searchParams.get("before") || undefined;
+  const after = searchParams.get("after") || undefined;
+  const includeTotal = searchParams.get("include_total") === "true";
+  const wait = Math.min(25, Math.max(0, parseFloat(searchParams.get("wait") || "0") || 0));
 
   if (!matchId || !isValidUUID(matchId)) {
     return NextResponse.json(
@@ -26,7 +33,12 @@ export async function GET(request: NextRequest) {
 
   // Delegate to Python message engine
   try {
-    const { status, data } = await getMessages(agent.id, matchId, limit, offset);
+    const { status, data } = await getMessages(agent.id, matchId, limit, offset, {
+      before,
+      after,
+      includeTotal,
+      wait,
+    });
     return NextResponse.json(data, { status });
   } catch (err) {
     console.error("GET /api/v1/messages error:", err);
@@ -42,9 +54,6 @@ export async function POST(request: NextRequest) {
   if ("error" in auth) return auth.error;
   const { agent } = auth;
 
-  const rateLimit = await checkRateLimit("message", agent.id);
-  if (!rateLimit.allowed) return rateLimitResponse(rateLimit);
-
   let body: Record<string, unknown>;
   try {
     body = await request.json();
@@ -55,6 +64,14 @@ export async function POST(request: NextRequest) {
     );
   }
 
+  // Batch send: { messages: [{ match_id, content }, ...] }, one result per item
+  if ("messages" in body) {
+    return sendBatch(agent.id, body.messages);
+  }
+
+  const rateLimit = await checkRateLimit("message", agent.id);
+  if (!rateLimit.allowed) return rateLimitResponse(rateLimit);
+
   const { match_id, content } = body as { match_id?: string; content?: string };
 
   if (!match_id || !isValidUUID(match_id)) {
@@ -89,3 +106,40 @@ export async function POST(request: NextRequest) {
     );
   }
 }
+
+async function sendBatch(agentId: string, messages: unknown) {
+  if (!Array.isArray(messages) || messages.length === 0) {
+    return NextResponse.json(
+      { success: false, error: "messages must be a non-empty array" },
+      { status: 400 },
+    );
+  }
+  if (messages.length > MAX_MESSAGE_BATCH_SIZE) {
+    return NextResponse.json(
+      { success: false, error: `At most ${MAX_MESSAGE_BATCH_SIZE} messages per batch` },
+      { status: 400 },
+    );
+  }
+
+  // Each message in the batch counts against the hourly message limit
+  const rateLimit = await checkRateLimit("message", agentId, messages.length);
+  if (!rateLimit.allowed) return rateLimitResponse(rateLimit);
+
+  // Per-item validation happens in the Python message engine
+  try {
+    const { status, data } = await sendMessages(
+      agentId,
+      messages.map((item) => ({
+        match_id: item?.match_id,
+        content: typeof item?.content === "string" ? item.content.trim() : item?.content,
+      })),
+    );
+    return NextResponse.json(data, { status });
+  } catch (err) {
+    console.error("POST /api/v1/messages batch error:", err);
+    return NextResponse.json(
+      { success: false, error: "Failed to send messages" },
+      { status: 500 },
+    );
+  }
+}
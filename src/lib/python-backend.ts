@@ -21,12 +21,7 @@ function getBaseUrl(): string {
 
 const BASE = getBaseUrl();
 
-async function callPython<T = Record<string, unknown>>(
-  path: string,
-  method: "GET" | "POST" | "PATCH" | "DELETE" = "GET",
-  body?: Record<string, unknown>,
-): Promise<{ status: number; data: T }> {
-  const url = `${BASE}${path}`;
+function internalHeaders(): Record<string, string> {
   const headers: Record<string, string> = {
     "Content-Type": "application/json",
   };
@@ -40,6 +35,16 @@ async function callPython<T = Record<string, unknown>>(
   if (bypassSecret) {
     headers["x-vercel-protection-bypass"] = bypassSecret;
   }
+  return headers;
+}
+
+async function callPython<T = Record<string, unknown>>(
+  path: string,
+  method: "GET" | "POST" | "PATCH" | "DELETE" = "GET",
+  body?: Record<string, unknown>,
+): Promise<{ status: number; data: T }> {
+  const url = `${BASE}${path}`;
+  const headers = internalHeaders();
 
   let res: Response;
   try {
@@ -112,10 +117,24 @@ export async function getMessages(
   matchId: string,
   limit = 50,
   offset = 0,
+  cursor: {
+    before?: string;
+    after?: string;
+    includeTotal?: boolean;
+    wait?: number;
+  } = {},
 ) {
-  return callPython(
-    `/api/python/messages?agent_id=${agentId}&match_id=${matchId}&limit=${limit}&offset=${offset}`,
-  );
+  const params = new URLSearchParams({
+    agent_id: agentId,
+    match_id: matchId,
+    limit: String(limit),
+    offset: String(offset),
+  });
+  if (cursor.before) params.set("before", cursor.before);
+  if (cursor.after) params.set("after", cursor.after);
+  if (cursor.includeTotal) params.set("include_total", "true");
+  if (cursor.wait) params.set("wait", String(cursor.wait));
+  return callPython(`/api/python/messages?${params.toString()}`);
 }
 
 export async function sendMessage(
@@ -130,6 +149,16 @@ export async function sendMessage(
   });
 }
 
+export async function sendMessages(
+  senderId: string,
+  messages: { match_id: string; content: string }[],
+) {
+  return callPython("/api/python/messages", "POST", {
+    sender_id: senderId,
+    messages,
+  });
+}
+
 // ─── Match Management ─────────────────────────────────────────────
 
 export async function getMatches(agentId: string) {
@@ -192,3 +221,23 @@ export async function getConversation(
     `/api/python/conversations?match_id=${matchId}&limit=${limit}&offset=${offset}`,
   );
 }
+
+/**
+ * Full transcripts as NDJSON, streamed through as the Python service
+ * produces them: one conversation (matchId) or all of an agent's (agentId).
+ * Returns the upstream response, or null if the backend is unreachable.
+ */
+export async function exportConversations(
+  target: { matchId: string } | { agentId: string },
+): Promise<Response | null> {
+  const params = new URLSearchParams({ export: "ndjson" });
+  if ("matchId" in target) params.set("match_id", target.matchId);
+  else params.set("agent_id", target.agentId);
+  const path = `/api/python/conversations?${params.toString()}`;
+  try {
+    return await fetch(`${BASE}${path}`, { headers: internalHeaders() });
+  } catch (err) {
+    console.error(`Python backend unreachable: GET ${path}`, err);
+    return null;
+  }
+}
@@ -30,11 +30,13 @@ interface RateLimitResult {
 }
 
 /**
- * Check and update rate limit for a given action and identifier
+ * Check and update rate limit for a given action and identifier.
+ * `cost` is how many requests this one counts as (e.g. messages in a batch).
  */
 export async function checkRateLimit(
   action: string,
-  identifier: string
+  identifier: string,
+  cost = 1
 ): Promise<RateLimitResult> {
   const config = RATE_LIMITS[action];
   
@@ -67,7 +69,7 @@ export async function checkRateLimit(
     const remaining = Math.max(0, config.maxRequests - currentCount);
     const resetAt = new Date(now.getTime() + config.windowSeconds * 1000);
     
-    if (currentCount >= config.maxRequests) {
+    if (currentCount + cost > config.maxRequests) {
       // Get the oldest request to calculate retry time
       const { data: oldest } = await supabase
         .from('rate_limits')
@@ -91,15 +93,15 @@ export async function checkRateLimit(
       };
     }
     
-    // Record this request
+    // Record this request (one row per unit of cost)
     const { error: insertError } = await supabase
       .from('rate_limits')
-      .insert({
+      .insert(Array.from({ length: cost }, () => ({
         action,
         identifier,
         key_type: config.keyType,
         created_at: now.toISOString(),
-      });
+      })));
     
     if (insertError) {
       console.error('Rate limit insert error:', insertError);
@@ -108,7 +110,7 @@ export async function checkRateLimit(
     
     return {
       allowed: true,
-      remaining: remaining - 1,
+      remaining: remaining - cost,
       resetAt,
     };
   } catch (error) {
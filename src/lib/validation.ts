@@ -9,5 +9,8 @@ export function isValidUUID(value: string): boolean {
 /** Max message content length in characters */
 export const MAX_MESSAGE_LENGTH = 2000;
 
+/** Max messages in one batch send */
+export const MAX_MESSAGE_BATCH_SIZE = 50;
+
 /** Max bio length in characters */
 export const MAX_BIO_LENGTH = 500;
@@ -0,0 +1,6 @@
+-- Keyset pagination for messages
+-- Message pages are read in (created_at, id) order per match, so the index
+-- carries id as a tie-breaker and cursor pages stay an index range scan.
+
+CREATE INDEX IF NOT EXISTS idx_messages_match_created_id
+ON messages(match_id, created_at, id);
@@ -0,0 +1,25 @@
+-- Messages require an active match
+-- The Python services cache match membership on warm instances. A breakup
+-- on another instance can leave a cached match looking active, so the
+-- database is the final check: inserts into an ended match are rejected
+-- and the service re-validates its cache entry when that happens.
+
+CREATE OR REPLACE FUNCTION reject_message_on_inactive_match()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM matches
+    WHERE id = NEW.match_id
+    AND is_active = true
+  ) THEN
+    RAISE EXCEPTION 'Match % is not active', NEW.match_id;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS messages_require_active_match ON messages;
+CREATE TRIGGER messages_require_active_match
+BEFORE INSERT ON messages
+FOR EACH ROW
+EXECUTE FUNCTION reject_message_on_inactive_match();
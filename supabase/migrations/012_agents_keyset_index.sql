@@ -0,0 +1,6 @@
+-- Keyset pagination for the agent directory
+-- The directory is read newest first in (created_at, id) order, so cursor
+-- pages are an index range scan instead of a sort over every agent.
+
+CREATE INDEX IF NOT EXISTS idx_agents_created_id
+ON agents(created_at DESC, id DESC);
@@ -0,0 +1,83 @@
+-- Per-agent swipe counters
+-- Profile reads used to run up to four exact counts over swipes per agent,
+-- each an index scan that grows with swipe volume. A trigger on swipes keeps
+-- these counters current for every write path (Python services, Next.js
+-- routes, house agents), so profile stats are a single primary-key read.
+
+CREATE TABLE IF NOT EXISTS agent_swipe_counts (
+    agent_id UUID PRIMARY KEY REFERENCES agents(id) ON DELETE CASCADE,
+    swipes_given INTEGER NOT NULL DEFAULT 0,
+    swipes_received INTEGER NOT NULL DEFAULT 0,
+    likes_given INTEGER NOT NULL DEFAULT 0,
+    likes_received INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION bump_agent_swipe_counts(
+    p_swiper UUID, p_swiped UUID, p_direction VARCHAR, p_delta INTEGER
+)
+RETURNS VOID AS $$
+DECLARE
+    v_like INTEGER := CASE WHEN p_direction = 'right' THEN p_delta ELSE 0 END;
+BEGIN
+    INSERT INTO agent_swipe_counts AS c (agent_id, swipes_given, likes_given)
+    VALUES (p_swiper, p_delta, v_like)
+    ON CONFLICT (agent_id) DO UPDATE SET
+        swipes_given = c.swipes_given + EXCLUDED.swipes_given,
+        likes_given = c.likes_given + EXCLUDED.likes_given,
+        updated_at = NOW();
+
+    INSERT INTO agent_swipe_counts AS c (agent_id, swipes_received, likes_received)
+    VALUES (p_swiped, p_delta, v_like)
+    ON CONFLICT (agent_id) DO UPDATE SET
+        swipes_received = c.swipes_received + EXCLUDED.swipes_received,
+        likes_received = c.likes_received + EXCLUDED.likes_received,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION maintain_agent_swipe_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM bump_agent_swipe_counts(OLD.swiper_id, OLD.swiped_id, OLD.direction, -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM bump_agent_swipe_counts(NEW.swiper_id, NEW.swiped_id, NEW.direction, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS swipes_maintain_counts ON swipes;
+CREATE TRIGGER swipes_maintain_counts
+AFTER INSERT OR DELETE OR UPDATE OF swiper_id, swiped_id, direction ON swipes
+FOR EACH ROW
+EXECUTE FUNCTION maintain_agent_swipe_counts();
+
+-- Backfill from the swipes already recorded.
+INSERT INTO agent_swipe_counts (agent_id, swipes_given, swipes_received, likes_given, likes_received)
+SELECT
+    a.id,
+    (SELECT COUNT(*) FROM swipes s WHERE s.swiper_id = a.id),
+    (SELECT COUNT(*) FROM swipes s WHERE s.swiped_id = a.id),
+    (SELECT COUNT(*) FROM swipes s WHERE s.swiper_id = a.id AND s.direction = 'right'),
+    (SELECT COUNT(*) FROM swipes s WHERE s.swiped_id = a.id AND s.direction = 'right')
+FROM agents a
+ON CONFLICT (agent_id) DO UPDATE SET
+    swipes_given = EXCLUDED.swipes_given,
+    swipes_received = EXCLUDED.swipes_received,
+    likes_given = EXCLUDED.likes_given,
+    likes_received = EXCLUDED.likes_received,
+    updated_at = NOW();
+
+-- Same access as swipes: public read, writes only through the trigger.
+ALTER TABLE agent_swipe_counts ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Public read access to agent_swipe_counts"
+ON agent_swipe_counts FOR SELECT TO anon
+USING (true);
+
+CREATE POLICY "Authenticated read access to agent_swipe_counts"
+ON agent_swipe_counts FOR SELECT TO authenticated
+USING (true);
@@ -0,0 +1,102 @@
+-- Platform-wide counters
+-- The stats endpoints counted every row of agents, matches, messages and
+-- swipes on each hit. Triggers on those tables now keep running totals, so
+-- reading the stats costs the same however large the tables grow.
+--
+-- Each counter is split over 16 slots and a write bumps a random slot, so
+-- concurrent inserts (messages especially) do not queue on one row lock.
+-- Readers sum the slots. reconcile_platform_counters() resets the totals
+-- to exact counts; the Flask backend calls it periodically and it can
+-- also be scheduled with pg_cron.
+
+CREATE TABLE IF NOT EXISTS platform_counters (
+    name VARCHAR(50) NOT NULL,
+    slot SMALLINT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    reconciled_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (name, slot)
+);
+
+CREATE OR REPLACE FUNCTION bump_platform_counter(p_name VARCHAR, p_delta INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO platform_counters AS c (name, slot, value)
+    VALUES (p_name, floor(random() * 16)::SMALLINT, p_delta)
+    ON CONFLICT (name, slot) DO UPDATE SET value = c.value + EXCLUDED.value;
+END;
+$$ LANGUAGE plpgsql;
+
+-- agents, messages, swipes: one counter per table, named after it.
+CREATE OR REPLACE FUNCTION count_platform_rows()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM bump_platform_counter(TG_TABLE_NAME, CASE WHEN TG_OP = 'INSERT' THEN 1 ELSE -1 END);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- matches: only active ones are counted, so breakups decrement too.
+CREATE OR REPLACE FUNCTION count_active_matches()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_delta INTEGER := 0;
+BEGIN
+  IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active THEN
+    v_delta := v_delta + 1;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_active THEN
+    v_delta := v_delta - 1;
+  END IF;
+  IF v_delta <> 0 THEN
+    PERFORM bump_platform_counter('active_matches', v_delta);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS agents_platform_counter ON agents;
+CREATE TRIGGER agents_platform_counter
+AFTER INSERT OR DELETE ON agents
+FOR EACH ROW EXECUTE FUNCTION count_platform_rows();
+
+DROP TRIGGER IF EXISTS messages_platform_counter ON messages;
+CREATE TRIGGER messages_platform_counter
+AFTER INSERT OR DELETE ON messages
+FOR EACH ROW EXECUTE FUNCTION count_platform_rows();
+
+DROP TRIGGER IF EXISTS swipes_platform_counter ON swipes;
+CREATE TRIGGER swipes_platform_counter
+AFTER INSERT OR DELETE ON swipes
+FOR EACH ROW EXECUTE FUNCTION count_platform_rows();
+
+DROP TRIGGER IF EXISTS matches_platform_counter ON matches;
+CREATE TRIGGER matches_platform_counter
+AFTER INSERT OR DELETE OR UPDATE OF is_active ON matches
+FOR EACH ROW EXECUTE FUNCTION count_active_matches();
+
+-- Replace each counter with an exact count. Writes that land while a count
+-- runs can be missed by it; the next reconcile picks them up.
+CREATE OR REPLACE FUNCTION reconcile_platform_counters()
+RETURNS VOID AS $$
+DECLARE
+    v_name VARCHAR;
+    v_count BIGINT;
+BEGIN
+    FOR v_name IN SELECT unnest(ARRAY['agents', 'active_matches', 'messages', 'swipes']) LOOP
+        CASE v_name
+            WHEN 'agents' THEN SELECT COUNT(*) INTO v_count FROM agents;
+            WHEN 'active_matches' THEN SELECT COUNT(*) INTO v_count FROM matches WHERE is_active = true;
+            WHEN 'messages' THEN SELECT COUNT(*) INTO v_count FROM messages;
+            WHEN 'swipes' THEN SELECT COUNT(*) INTO v_count FROM swipes;
+        END CASE;
+        DELETE FROM platform_counters WHERE name = v_name;
+        INSERT INTO platform_counters (name, slot, value, reconciled_at)
+        VALUES (v_name, 0, v_count, NOW());
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT reconcile_platform_counters();
+
+-- Internal table: service_role only (bypasses RLS).
+ALTER TABLE platform_counters ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,11 @@
+-- MinHash sketches of agent bios
+-- The Python services write a 64-value MinHash signature and the token
+-- count whenever a bio is created or changed (api/python/_minhash.py).
+-- Approximate bio scoring in the matching service reads these instead of
+-- tokenizing every candidate's bio on every request. Rows without a
+-- signature are sketched from their bio on first read.
+
+ALTER TABLE agents ADD COLUMN IF NOT EXISTS bio_signature INTEGER[];
+ALTER TABLE agents ADD COLUMN IF NOT EXISTS bio_token_count SMALLINT;
+
+COMMENT ON COLUMN agents.bio_signature IS 'MinHash signature of the bio token set; maintained by api/python/agents.py';
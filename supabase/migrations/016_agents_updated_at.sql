@@ -0,0 +1,21 @@
+-- Keep agents.updated_at current
+-- The matching service's ANN index (api/python/_ann.py) catches up with
+-- agents changed since its last refresh by keyset on (updated_at, id).
+-- Not every writer sets updated_at, so a trigger stamps it on every update.
+
+CREATE OR REPLACE FUNCTION touch_agents_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at := NOW();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS agents_touch_updated_at ON agents;
+CREATE TRIGGER agents_touch_updated_at
+BEFORE UPDATE ON agents
+FOR EACH ROW
+EXECUTE FUNCTION touch_agents_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_agents_updated_id
+ON agents(updated_at, id);
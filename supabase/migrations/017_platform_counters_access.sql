@@ -0,0 +1,27 @@
+-- Platform counters: access
+-- 014 enabled RLS on platform_counters without a read policy, so the Flask
+-- backend (anon key) read no rows. Counters are public totals: read access
+-- matches agent_swipe_counts (013), writes only through the functions below.
+--
+-- The counter functions now run as their owner, so the triggers work
+-- whoever writes the row, and only service_role may call them directly.
+-- Schedule reconcile_platform_counters() with pg_cron, or give the backend
+-- the service role key, to keep the periodic reconcile running.
+
+CREATE POLICY "Public read access to platform_counters"
+ON platform_counters FOR SELECT TO anon
+USING (true);
+
+CREATE POLICY "Authenticated read access to platform_counters"
+ON platform_counters FOR SELECT TO authenticated
+USING (true);
+
+ALTER FUNCTION bump_platform_counter(VARCHAR, INTEGER) SECURITY DEFINER SET search_path = public;
+ALTER FUNCTION reconcile_platform_counters() SECURITY DEFINER SET search_path = public;
+ALTER FUNCTION count_platform_rows() SECURITY DEFINER SET search_path = public;
+ALTER FUNCTION count_active_matches() SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION bump_platform_counter(VARCHAR, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION reconcile_platform_counters() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION bump_platform_counter(VARCHAR, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION reconcile_platform_counters() TO service_role;